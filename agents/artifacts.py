@@ -0,0 +1,110 @@
+import json
+import os
+import re
+from datetime import datetime
+
+from .summary_model import MedicalSummary
+
+# kind -> (folder, title, section heading) of the saved Markdown files
+ARTIFACTS = {
+    'transcription': ("transcriptions", "Transcription", "## Content\n\n"),
+    'conversation': ("conversations", "Conversation", "## Dialogue\n\n"),
+    'summary': ("summaries", "Medical Summary", "## Summary\n\n")
+}
+
+# Hidden line recording which input (and prompt/model) an artifact was generated from
+SOURCE_KEY = re.compile(r"^<!-- source: ([0-9a-f]+) -->$", re.MULTILINE)
+
+def artifact_path(kind, original_filename, timestamp):
+    """Where a recording's transcription, conversation or summary is saved"""
+    # Files are named with just the date (not time)
+    date_only = timestamp.split('_')[0]  # Get YYYYMMDD part
+    return os.path.join(ARTIFACTS[kind][0], f"{original_filename}_{date_only}.md")
+
+def save_artifact(kind, text, original_filename, timestamp, source_key=None):
+    """Save a derived text as Markdown with a title and date header
+
+    A source_key is stored as an HTML comment, which Markdown renders as
+    nothing, so load_artifact can tell whether the file is still current.
+    """
+    folder, title, section = ARTIFACTS[kind]
+    # Create the folder if it doesn't exist
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+
+    file_path = artifact_path(kind, original_filename, timestamp)
+    date_only = timestamp.split('_')[0]
+
+    # Save the text with metadata
+    with open(file_path, "w", encoding='utf-8') as f:
+        f.write(f"# {title}: {original_filename}\n")
+        f.write(f"Date: {datetime.strptime(date_only, '%Y%m%d').strftime('%B %d, %Y')}\n\n")
+        if source_key:
+            f.write(f"<!-- source: {source_key} -->\n\n")
+        f.write(section)
+        f.write(text)
+
+    return file_path
+
+def save_transcription(transcription, original_filename, timestamp):
+    """Save transcription to transcriptions folder"""
+    return save_artifact('transcription', transcription, original_filename, timestamp)
+
+def save_conversation(conversation, original_filename, timestamp):
+    """Save conversation to conversations folder"""
+    return save_artifact('conversation', conversation, original_filename, timestamp)
+
+def save_summary(summary, original_filename, timestamp, source_key=None):
+    """Save medical summary to summaries folder"""
+    return save_artifact('summary', summary, original_filename, timestamp, source_key)
+
+def summary_record_path(original_filename, timestamp):
+    """Where the typed summary is saved, as JSON next to the Markdown summary"""
+    return os.path.splitext(artifact_path('summary', original_filename, timestamp))[0] + ".json"
+
+def save_summary_record(summary, original_filename, timestamp, source_key=None):
+    """Save a MedicalSummary as JSON for exports and analytics"""
+    file_path = summary_record_path(original_filename, timestamp)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "w", encoding='utf-8') as f:
+        json.dump({'source': source_key, 'summary': summary.to_dict()}, f, indent=2)
+    return file_path
+
+def load_summary_record(filepath, source_key=None):
+    """Load a saved MedicalSummary; None if missing or (with source_key) stale"""
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if source_key is not None and data.get('source') != source_key:
+        return None
+    return MedicalSummary.from_dict(data.get('summary'))
+
+def load_markdown_file(filepath):
+    """Load and return contents of a markdown file"""
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return f.read()
+    except Exception as e:
+        return None
+
+def load_artifact(kind, filepath, source_key=None):
+    """Load a saved artifact and return just its text, without the header
+
+    With a source_key (or a tuple of acceptable keys), a file saved from a
+    different source (or without a key) counts as stale and None is returned.
+    """
+    content = load_markdown_file(filepath)
+    if content is None:
+        return None
+    # The first section heading ends our header; the model's text may repeat it
+    header, found, text = content.partition(ARTIFACTS[kind][2])
+    if not found:
+        header, text = "", content
+    if source_key is not None:
+        keys = (source_key,) if isinstance(source_key, str) else tuple(source_key)
+        match = SOURCE_KEY.search(header)
+        if match is None or match.group(1) not in keys:
+            return None
+    return text
@@ -0,0 +1,96 @@
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from .transcription_agent import TranscriptionAgent
+from .conversation_agent import ConversationAgent
+from .medical_summary_agent import MedicalSummaryAgent, summary_cache_key
+from .context import AgentContext
+from .telemetry import telemetry
+
+def create_async_client(api_key=None, max_connections=20, scheduler=None, **kwargs):
+    """One AsyncOpenAI client whose HTTP connection pool is shared by every request
+
+    Create it once per process (and event loop) and pass it to each
+    AsyncOrchestrator; clients derived with with_options() reuse the same
+    pool. With a RateLimitScheduler, calls are admitted within its budgets.
+    """
+    http_client = DefaultAsyncHttpxClient(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    )
+    client = AsyncOpenAI(api_key=api_key, http_client=http_client, **kwargs)
+    if scheduler is not None:
+        client = scheduler.client(client)
+    return client
+
+class AsyncOrchestrator:
+    """Orchestrator for AsyncOpenAI clients
+
+    Stages are coroutines, so many recordings can be processed concurrently
+    on one event loop without a thread per in-flight request. Results and
+    context are the same as the thread-based Orchestrator's.
+    """
+
+    def __init__(self, client, transcription_workers=4, transcription_cache=None,
+                 context_max_bytes=5 * 1024 * 1024, context_ttl_seconds=60 * 60,
+                 transcription_checkpoints=None, transcription_backend=None,
+                 transcription_upload_format=None):
+        self.client = client
+        self.transcription_agent = TranscriptionAgent(
+            client,
+            max_workers=transcription_workers,
+            cache=transcription_cache,
+            checkpoints=transcription_checkpoints,
+            backend=transcription_backend,
+            upload_format=transcription_upload_format
+        )
+        self.conversation_agent = ConversationAgent(client)
+        self.summary_agent = MedicalSummaryAgent(client)
+        self.context = AgentContext(max_bytes=context_max_bytes, ttl_seconds=context_ttl_seconds)
+
+    def reset_context(self):
+        """Forget everything from the previous recording"""
+        self.context.clear()
+
+    async def process_transcription(self, audio_bytes, progress_callback):
+        """Coordinate transcription of audio using the transcription agent"""
+        with telemetry.span("stage.transcription"):
+            return await self.transcription_agent.atranscribe(audio_bytes, progress_callback, self.context)
+
+    async def process_conversation(self, transcription_text, progress_callback):
+        """Coordinate conversation generation using the conversation agent"""
+        self.context['transcription'] = transcription_text
+        with telemetry.span("stage.conversation"):
+            return await self.conversation_agent.agenerate_conversation(
+                transcription_text, progress_callback, self.context)
+
+    async def process_summary(self, text, progress_callback):
+        """Coordinate medical summary generation using the summary agent"""
+        if callable(progress_callback):
+            progress_callback(0.2, "Generating medical summary...")
+        with telemetry.span("stage.summary"):
+            summary = await self.summary_agent.agenerate_summary(text, progress_callback, self.context)
+        if not summary.startswith("Error"):
+            self.context['summary'] = summary
+            self.context['summary_key'] = summary_cache_key(text, self.summary_agent.model)
+        if callable(progress_callback):
+            progress_callback(1.0, "Medical summary generated")
+        return summary
+
+    async def process_recording(self, audio_bytes, progress_callback=None):
+        """Run transcription, conversation and summary in turn
+
+        Returns (transcription, conversation, summary); stages after a
+        failed one are None.
+        """
+        def stage_progress(name):
+            if not callable(progress_callback):
+                return lambda progress, text: None
+            return lambda progress, text: progress_callback(name, progress, text)
+
+        transcription = await self.process_transcription(audio_bytes, stage_progress('transcription'))
+        if transcription.startswith("Error"):
+            return transcription, None, None
+        conversation = await self.process_conversation(transcription, stage_progress('conversation'))
+        if conversation.startswith("Error"):
+            return transcription, conversation, None
+        summary = await self.process_summary(conversation, stage_progress('summary'))
+        return transcription, conversation, summary
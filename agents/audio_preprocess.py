@@ -0,0 +1,104 @@
+try:
+    import audioop
+except ImportError:
+    import pyaudioop as audioop
+
+from fractions import Fraction
+
+try:
+    import numpy as np
+    from numpy.lib.stride_tricks import as_strided
+except ImportError:
+    np = None
+
+from .audio_stream import SAMPLE_RATE, SAMPLE_WIDTH
+
+def frame_levels(pcm, frame_bytes, frame_count):
+    """RMS level of each of the first frame_count frames of 16-bit mono PCM"""
+    if np is not None:
+        # One vectorized pass over a zero-copy view of the buffer
+        samples = np.frombuffer(pcm, dtype="<i2", count=frame_count * frame_bytes // SAMPLE_WIDTH)
+        frames = samples.reshape(frame_count, frame_bytes // SAMPLE_WIDTH).astype(np.float32)
+        return np.sqrt(np.mean(frames * frames, axis=1)).tolist()
+
+    view = memoryview(pcm)
+    try:
+        return [
+            audioop.rms(view[i * frame_bytes:(i + 1) * frame_bytes], SAMPLE_WIDTH)
+            for i in range(frame_count)
+        ]
+    finally:
+        view.release()
+
+def _downmix(frames):
+    """Average the channels of a (frames, channels) int16 array into float32 mono"""
+    mono = frames[:, 0].astype(np.float32)
+    for channel in range(1, frames.shape[1]):
+        mono += frames[:, channel]
+    if frames.shape[1] > 1:
+        mono *= 1.0 / frames.shape[1]
+    return mono
+
+def resample_blocks(samples, channels, frame_rate, target_rate=SAMPLE_RATE, block_seconds=10):
+    """Downmix and resample interleaved int16 samples, yielding int16 mono blocks
+
+    Works block by block so only one block of float intermediates exists at a
+    time. When no conversion is needed the blocks are zero-copy views.
+    """
+    frames = samples.reshape(-1, channels)
+
+    if channels == 1 and frame_rate == target_rate:
+        block_out = int(block_seconds * target_rate)
+        for start in range(0, len(samples), block_out):
+            yield samples[start:start + block_out]
+        return
+
+    # Linear interpolation weights repeat every period_in input samples
+    # (e.g. 441 in -> 160 out for 44.1 kHz), so compute them once
+    step = Fraction(frame_rate, target_rate).limit_denominator(1000)
+    period_in, period_out = step.numerator, step.denominator
+    positions = np.arange(period_out) * (period_in / period_out)
+    index = positions.astype(np.intp)
+    weight = (positions - index).astype(np.float32)
+
+    # Box filter wide enough to suppress aliasing when downsampling
+    width = max(1, int(round(frame_rate / target_rate)))
+    kernel = np.full(width, 1.0 / width, dtype=np.float32)
+
+    periods = max(1, int(block_seconds * target_rate) // period_out)
+    block_in = periods * period_in
+    for start in range(0, len(frames) - 1, block_in):
+        first = max(0, start - width)
+        last = min(len(frames), start + block_in + 1 + width)
+        mono = _downmix(frames[first:last])
+        if width > 1:
+            mono = np.convolve(mono, kernel, mode="same")
+        mono = mono[start - first:]
+
+        rows = min(periods, (len(mono) - 1) // period_in)
+        if rows == 0:
+            break
+        # Overlapping zero-copy windows of period_in + 1 samples, one per period
+        stride = mono.strides[0]
+        windows = as_strided(mono, shape=(rows, period_in + 1), strides=(period_in * stride, stride))
+        head = windows[:, index]
+        block = head + weight * (windows[:, index + 1] - head)
+        yield np.clip(np.rint(block.ravel()), -32768, 32767).astype("<i2")
+
+def segment_blocks(segment, block_seconds=10):
+    """Convert a decoded AudioSegment into 16 kHz mono PCM blocks"""
+    if segment.sample_width != SAMPLE_WIDTH:
+        segment = segment.set_sample_width(SAMPLE_WIDTH)
+
+    if np is None:
+        # Plain pydub conversion when NumPy isn't available
+        pcm = memoryview(segment.set_channels(1).set_frame_rate(SAMPLE_RATE).raw_data)
+        block_bytes = int(block_seconds * SAMPLE_RATE) * SAMPLE_WIDTH
+        for start in range(0, len(pcm), block_bytes):
+            yield pcm[start:start + block_bytes]
+        return
+
+    samples = np.frombuffer(segment.raw_data, dtype="<i2")
+    for block in resample_blocks(samples, segment.channels, segment.frame_rate,
+                                 block_seconds=block_seconds):
+        yield memoryview(block).cast("B")
@@ -0,0 +1,167 @@
+import subprocess
+import threading
+import math
+import struct
+import io
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2  # 16-bit PCM
+CHANNELS = 1
+
+# Upload format -> (ffmpeg encoder arguments, file extension, content type).
+# 16 kHz mono WAV is 256 kbit/s; speech codecs need a small fraction of that.
+UPLOAD_FORMATS = {
+    "wav": (None, "wav", "audio/wav"),
+    "flac": (["-c:a", "flac", "-compression_level", "8", "-f", "flac"], "flac", "audio/flac"),
+    "ogg": (["-c:a", "libopus", "-b:a", "24k", "-application", "voip", "-f", "ogg"], "ogg", "audio/ogg"),
+    "mp3": (["-c:a", "libmp3lame", "-b:a", "32k", "-f", "mp3"], "mp3", "audio/mpeg")
+}
+
+class EncoderUnavailable(RuntimeError):
+    """ffmpeg (or the encoder an upload format needs) isn't installed"""
+
+def _is_buffer(source):
+    """Check whether the source is in-memory audio rather than a file path"""
+    return isinstance(source, (bytes, bytearray, memoryview))
+
+def _ffmpeg_input(source):
+    """Return ffmpeg input arguments for a file path or raw bytes"""
+    if _is_buffer(source):
+        return ["-i", "pipe:0"]
+    return ["-nostdin", "-i", str(source)]
+
+def _feed_stdin(pipe, data):
+    """Write the encoded audio to ffmpeg's stdin from a background thread"""
+    try:
+        view = memoryview(data)
+        # Write in slices so ffmpeg can start decoding before the whole upload is sent
+        for start in range(0, len(view), 1 << 16):
+            pipe.write(view[start:start + (1 << 16)])
+    except (BrokenPipeError, ValueError):
+        # ffmpeg exited early (bad input or consumer stopped reading)
+        pass
+    finally:
+        try:
+            pipe.close()
+        except OSError:
+            pass
+
+def probe_duration(source):
+    """Return the duration of the audio in seconds, or None if it can't be determined"""
+    command = ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+               "-of", "default=noprint_wrappers=1:nokey=1", "-i"]
+    try:
+        if _is_buffer(source):
+            result = subprocess.run(command + ["pipe:0"], input=bytes(source), capture_output=True, timeout=60)
+        else:
+            result = subprocess.run(command + [str(source)], capture_output=True, timeout=60)
+        return float(result.stdout.decode().strip())
+    except (OSError, ValueError, subprocess.TimeoutExpired):
+        return None
+
+def wav_header(data_size, sample_rate=SAMPLE_RATE):
+    """Build a 44-byte RIFF/WAVE header for mono 16-bit PCM"""
+    byte_rate = sample_rate * SAMPLE_WIDTH * CHANNELS
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, CHANNELS, sample_rate, byte_rate, SAMPLE_WIDTH * CHANNELS, SAMPLE_WIDTH * 8,
+        b"data", data_size
+    )
+
+def wav_upload(pcm, name="chunk.wav", sample_rate=SAMPLE_RATE):
+    """Wrap PCM audio as an in-memory WAV file tuple accepted by the OpenAI client"""
+    # A single buffer write; the client streams it from memory, no temp file needed
+    buffer = io.BytesIO()
+    buffer.write(wav_header(len(pcm), sample_rate))
+    buffer.write(pcm)
+    buffer.seek(0)
+    return (name, buffer, "audio/wav")
+
+def encode_pcm(pcm, upload_format, sample_rate=SAMPLE_RATE):
+    """Encode mono 16-bit PCM with ffmpeg into one of UPLOAD_FORMATS and return the bytes"""
+    encoder = UPLOAD_FORMATS[upload_format][0]
+    if encoder is None:
+        return wav_header(len(pcm), sample_rate) + bytes(pcm)
+    command = (
+        ["ffmpeg", "-hide_banner", "-loglevel", "error",
+         "-f", "s16le", "-ac", str(CHANNELS), "-ar", str(sample_rate), "-i", "pipe:0"]
+        + encoder + ["pipe:1"]
+    )
+    try:
+        result = subprocess.run(command, input=pcm, capture_output=True, timeout=300)
+    except FileNotFoundError as e:
+        raise EncoderUnavailable(f"ffmpeg could not encode {upload_format}: {str(e)}")
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise RuntimeError(f"ffmpeg could not encode {upload_format}: {str(e)}")
+    if result.returncode != 0 or not result.stdout:
+        message = result.stderr.decode(errors="replace").strip()
+        if "Unknown encoder" in message or "Encoder not found" in message:
+            raise EncoderUnavailable(message)
+        raise RuntimeError(message or f"ffmpeg could not encode {upload_format}")
+    return result.stdout
+
+def audio_upload(pcm, upload_format="wav", name="chunk", sample_rate=SAMPLE_RATE):
+    """Encode PCM as an in-memory file tuple (name, file, content type) for the OpenAI client"""
+    if upload_format == "wav":
+        return wav_upload(pcm, name=f"{name}.wav", sample_rate=sample_rate)
+    _, extension, content_type = UPLOAD_FORMATS[upload_format]
+    return (f"{name}.{extension}", io.BytesIO(encode_pcm(pcm, upload_format, sample_rate)), content_type)
+
+def estimate_chunk_count(source, chunk_seconds):
+    """Estimate how many windows stream_pcm will yield, or None if unknown"""
+    duration = probe_duration(source)
+    if not duration:
+        return None
+    return max(1, math.ceil(duration / chunk_seconds))
+
+def stream_pcm(source, chunk_seconds=300, sample_rate=SAMPLE_RATE):
+    """Decode audio through an ffmpeg pipe and yield mono 16-bit PCM windows
+
+    Only one window of decoded audio is held in memory at a time, so memory
+    use does not grow with the length of the recording.
+    """
+    window_bytes = int(chunk_seconds * sample_rate) * SAMPLE_WIDTH * CHANNELS
+    command = (
+        ["ffmpeg", "-hide_banner", "-loglevel", "error"]
+        + _ffmpeg_input(source)
+        + ["-vn", "-f", "s16le", "-acodec", "pcm_s16le",
+           "-ac", str(CHANNELS), "-ar", str(sample_rate), "pipe:1"]
+    )
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE if _is_buffer(source) else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+
+    # Drain stderr in the background so ffmpeg never blocks on a full pipe
+    errors = []
+    stderr_thread = threading.Thread(target=lambda: errors.append(process.stderr.read()), daemon=True)
+    stderr_thread.start()
+
+    writer = None
+    if process.stdin is not None:
+        writer = threading.Thread(target=_feed_stdin, args=(process.stdin, source), daemon=True)
+        writer.start()
+
+    try:
+        while True:
+            window = process.stdout.read(window_bytes)
+            if not window:
+                break
+            yield window
+
+        process.wait()
+        stderr_thread.join()
+        if process.returncode != 0:
+            message = b"".join(errors).decode(errors="replace").strip()
+            raise RuntimeError(message or "ffmpeg could not decode the audio")
+    finally:
+        # Stop ffmpeg if the consumer stopped early
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        if writer is not None:
+            writer.join()
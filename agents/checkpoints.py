@@ -0,0 +1,81 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+
+class TranscriptionCheckpoints:
+    """Per-recording store of finished chunk transcripts, so failed jobs can resume
+
+    Chunks are written as they finish under checkpoint_dir/<key>/, where the
+    key hashes the audio together with the settings that decide chunk
+    boundaries. Running the same recording again skips every chunk already on
+    disk; the checkpoint is discarded once the whole transcription succeeds.
+    Checkpoints of recordings that were never retried are pruned after
+    max_age_seconds without a write.
+    """
+
+    def __init__(self, checkpoint_dir="cache/checkpoints", max_age_seconds=7 * 24 * 60 * 60):
+        self.checkpoint_dir = checkpoint_dir
+        self.max_age_seconds = max_age_seconds
+        self.prune()
+
+    def prune(self):
+        """Remove checkpoints not written to for max_age_seconds; returns how many"""
+        if not self.max_age_seconds or not os.path.isdir(self.checkpoint_dir):
+            return 0
+        cutoff = time.time() - self.max_age_seconds
+        removed = 0
+        for entry in os.scandir(self.checkpoint_dir):
+            try:
+                # Saving a chunk replaces a file in the directory, updating its mtime
+                if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+    @staticmethod
+    def make_key(audio_bytes, *settings):
+        """Hash the uploaded audio with the model and chunking settings"""
+        digest = hashlib.sha256("\0".join(str(setting) for setting in settings).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(audio_bytes)
+        return digest.hexdigest()
+
+    def _dir(self, key):
+        return os.path.join(self.checkpoint_dir, key)
+
+    def _path(self, key, index):
+        return os.path.join(self._dir(key), f"{index:05d}.txt")
+
+    def load(self, key):
+        """Return {chunk index: text} for every chunk checkpointed under key"""
+        directory = self._dir(key)
+        if not os.path.isdir(directory):
+            return {}
+        chunks = {}
+        for name in os.listdir(directory):
+            stem, extension = os.path.splitext(name)
+            if extension != ".txt" or not stem.isdigit():
+                continue
+            try:
+                with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                    chunks[int(stem)] = f.read()
+            except OSError:
+                continue
+        return chunks
+
+    def save(self, key, index, text):
+        """Write one finished chunk atomically"""
+        path = self._path(key, index)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temp_path, path)
+
+    def discard(self, key):
+        """Remove a checkpoint once its transcription is complete"""
+        shutil.rmtree(self._dir(key), ignore_errors=True)
@@ -0,0 +1,141 @@
+from .audio_stream import SAMPLE_RATE, SAMPLE_WIDTH
+from .audio_preprocess import frame_levels
+
+class SilenceChunker:
+    """Cut a 16-bit mono PCM stream into chunks at silence boundaries
+
+    Chunks are cut in the pause closest to target_seconds (within
+    search_seconds either side). Silent gaps longer than max_silence_ms are
+    shrunk to keep_silence_ms, and chunks that are entirely silent are dropped,
+    so fewer seconds are uploaded and billed.
+    """
+
+    def __init__(self, target_seconds=300, search_seconds=30, sample_rate=SAMPLE_RATE,
+                 frame_ms=30, silence_db=-40.0, min_cut_silence_ms=300,
+                 max_silence_ms=2000, keep_silence_ms=500, strip_silence=True):
+        self.sample_rate = sample_rate
+        self.frame_bytes = int(sample_rate * frame_ms / 1000) * SAMPLE_WIDTH
+        self.target_frames = int(target_seconds * 1000 / frame_ms)
+        self.search_frames = int(search_seconds * 1000 / frame_ms)
+        self.min_cut_frames = max(1, min_cut_silence_ms // frame_ms)
+        self.max_silence_frames = max(1, max_silence_ms // frame_ms)
+        self.keep_frames = keep_silence_ms // frame_ms
+        self.strip_silence = strip_silence
+        # RMS level below which a frame counts as silence (dBFS -> 16-bit amplitude)
+        self.threshold = int(32768 * 10 ** (silence_db / 20))
+
+        self._buffer = bytearray()
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.chunks = 0
+        self.skipped_chunks = 0
+
+    def feed(self, pcm):
+        """Add decoded audio and yield any chunks that are ready"""
+        self._buffer += pcm
+        self.input_bytes += len(pcm)
+        # Wait for the whole search window past the target before cutting
+        while len(self._buffer) >= (self.target_frames + self.search_frames) * self.frame_bytes:
+            chunk = self._next_chunk()
+            if chunk:
+                yield chunk
+
+    def flush(self):
+        """Yield the remaining buffered audio at the end of the stream"""
+        while self._buffer:
+            chunk = self._next_chunk(final=True)
+            if chunk:
+                yield chunk
+
+    def _levels(self, frame_count):
+        """RMS level of each full frame at the start of the buffer"""
+        return frame_levels(self._buffer, self.frame_bytes, frame_count)
+
+    def _silent_runs(self, levels, min_frames):
+        """Return (start, end) frame ranges of silence at least min_frames long"""
+        runs = []
+        start = None
+        for i, level in enumerate(levels):
+            if level < self.threshold:
+                if start is None:
+                    start = i
+            elif start is not None:
+                if i - start >= min_frames:
+                    runs.append((start, i))
+                start = None
+        if start is not None and len(levels) - start >= min_frames:
+            runs.append((start, len(levels)))
+        return runs
+
+    def _find_cut(self, levels):
+        """Pick the frame to cut at: the pause nearest the target length"""
+        low = self.target_frames - self.search_frames
+        high = min(len(levels), self.target_frames + self.search_frames)
+
+        best = None
+        for start, end in self._silent_runs(levels[low:high], self.min_cut_frames):
+            middle = low + (start + end) // 2
+            if best is None or abs(middle - self.target_frames) < abs(best - self.target_frames):
+                best = middle
+        if best is not None:
+            return best
+
+        # No real pause nearby; fall back to the quietest frame in the window
+        window = levels[low:high]
+        return low + window.index(min(window))
+
+    def _strip(self, chunk, levels):
+        """Shrink long silent gaps inside a chunk"""
+        pieces = []
+        position = 0
+        for start, end in self._silent_runs(levels, self.max_silence_frames):
+            if end - start <= self.keep_frames:
+                continue
+            keep_head = self.keep_frames // 2
+            keep_tail = self.keep_frames - keep_head
+            pieces.append(chunk[position:(start + keep_head) * self.frame_bytes])
+            position = (end - keep_tail) * self.frame_bytes
+        pieces.append(chunk[position:])
+        return b"".join(pieces)
+
+    def _next_chunk(self, final=False):
+        """Cut the next chunk off the front of the buffer"""
+        frame_count = len(self._buffer) // self.frame_bytes
+        levels = self._levels(frame_count)
+
+        if final and frame_count <= self.target_frames + self.search_frames:
+            cut_frame = frame_count
+            cut = len(self._buffer)
+        else:
+            cut_frame = self._find_cut(levels)
+            cut = cut_frame * self.frame_bytes
+
+        with memoryview(self._buffer) as view:
+            chunk = bytes(view[:cut])
+        del self._buffer[:cut]
+        levels = levels[:cut_frame]
+
+        # Nothing but silence: don't upload it at all
+        if levels and max(levels) < self.threshold:
+            self.skipped_chunks += 1
+            return None
+
+        if self.strip_silence:
+            chunk = self._strip(chunk, levels)
+
+        self.chunks += 1
+        self.output_bytes += len(chunk)
+        return chunk
+
+    def report(self):
+        """Summarise how much audio was removed before upload"""
+        bytes_per_second = self.sample_rate * SAMPLE_WIDTH
+        input_seconds = self.input_bytes / bytes_per_second
+        output_seconds = self.output_bytes / bytes_per_second
+        return {
+            'input_seconds': round(input_seconds, 1),
+            'output_seconds': round(output_seconds, 1),
+            'removed_seconds': round(input_seconds - output_seconds, 1),
+            'chunks': self.chunks,
+            'skipped_chunks': self.skipped_chunks
+        }
@@ -0,0 +1,155 @@
+import hashlib
+from .conversation_agent import CONVERSATION_INSTRUCTIONS
+from .medical_summary_agent import SUMMARY_INSTRUCTIONS, summary_cache_key
+from .streaming import stream_text
+from .summary_model import SummaryStream
+from .telemetry import telemetry
+
+DIALOGUE_MARKER = "=== DIALOGUE ==="
+SUMMARY_MARKER = "=== MEDICAL SUMMARY ==="
+
+COMBINED_INSTRUCTIONS = f"""You will produce two documents from one transcript of a medical consultation: first the complete dialogue, then a medical summary of it.
+
+DIALOGUE
+
+{CONVERSATION_INSTRUCTIONS}
+
+MEDICAL SUMMARY
+
+{SUMMARY_INSTRUCTIONS}
+
+OUTPUT FORMAT
+
+Write the line {DIALOGUE_MARKER}, then the complete dialogue, then the line {SUMMARY_MARKER}, then the summary JSON object.
+Each marker must be on a line of its own. Write nothing before the first marker and nothing after the JSON object."""
+
+# Changes whenever the combined prompt does, invalidating summaries saved under the old one
+COMBINED_PROMPT_VERSION = hashlib.sha256(COMBINED_INSTRUCTIONS.encode("utf-8")).hexdigest()[:12]
+
+COMBINED_MODEL = "gpt-4"
+
+def combined_cache_key(transcription, model=COMBINED_MODEL):
+    """Source key of a summary generated together with the dialogue from this transcript"""
+    digest = hashlib.sha256(f"combined\0{model}\0{COMBINED_PROMPT_VERSION}\0".encode("utf-8"))
+    digest.update(transcription.encode("utf-8"))
+    return digest.hexdigest()
+
+def summary_source_keys(conversation=None, transcription=None):
+    """Source keys under which a saved summary is still current
+
+    That is a summary of the conversation (or, without one, the
+    transcript) by the summary agent, or one generated in combined mode
+    from the transcript, each with the current prompt and model.
+    """
+    keys = []
+    if conversation or transcription:
+        keys.append(summary_cache_key(conversation or transcription))
+    if transcription:
+        keys.append(combined_cache_key(transcription))
+    return tuple(keys)
+
+class SectionSplitter:
+    """Split the combined stream into dialogue and summary as it arrives
+
+    Only text not seen before is searched for the summary marker, and the
+    summary JSON is parsed incrementally, so each update costs little more
+    than the new text.
+    """
+
+    def __init__(self):
+        self._searched = 0
+        self._dialogue_end = None
+        self._summary_start = None
+        self.summary = SummaryStream()
+
+    def update(self, streamed):
+        """Return (dialogue so far, MedicalSummary so far or None)"""
+        if self._summary_start is None:
+            at = streamed.find(SUMMARY_MARKER, max(0, self._searched - len(SUMMARY_MARKER)))
+            if at == -1:
+                self._searched = len(streamed)
+            else:
+                self._dialogue_end = at
+                self._summary_start = at + len(SUMMARY_MARKER)
+
+        dialogue = streamed[:self._dialogue_end].lstrip()
+        if dialogue.startswith(DIALOGUE_MARKER):
+            dialogue = dialogue[len(DIALOGUE_MARKER):]
+        if self._summary_start is None:
+            # Hold back a marker that is still arriving
+            head, _, last = dialogue.rpartition("\n")
+            last = last.strip()
+            if last and (SUMMARY_MARKER.startswith(last) or DIALOGUE_MARKER.startswith(last)):
+                dialogue = head
+            return dialogue.strip(), None
+
+        self.summary.feed(streamed[self._summary_start + self.summary.consumed:])
+        return dialogue.strip(), self.summary.summary
+
+class CombinedAgent:
+    """Produce the dialogue and the medical summary from a single streamed request
+
+    The transcript is sent once instead of once per artifact; the reply is
+    split at the section markers into the usual conversation and summary.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.name = "Combined Conversation and Summary Agent"
+        self.model = COMBINED_MODEL
+        # Seconds between UI updates while streaming
+        self.stream_interval = 0.1
+
+    def generate(self, text, conversation_callback=None, summary_callback=None):
+        """Return (conversation, MedicalSummary); the summary is None if the reply had no valid summary section"""
+        try:
+            if not text:
+                return "Error: No transcription text provided", None
+
+            if callable(conversation_callback):
+                conversation_callback(0.2, "Generating conversation and summary...")
+
+            with telemetry.span("combined", model=self.model, input_chars=len(text)) as span:
+                stream = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": COMBINED_INSTRUCTIONS},
+                        {"role": "user", "content": text}
+                    ],
+                    stream=True
+                )
+
+                splitter = SectionSplitter()
+                dialogue_done = False
+
+                def finish_dialogue():
+                    nonlocal dialogue_done
+                    if not dialogue_done and callable(conversation_callback):
+                        conversation_callback(1.0, "Conversation generated")
+                    dialogue_done = True
+
+                def on_update(partial):
+                    dialogue, summary = splitter.update(partial)
+                    if summary is None:
+                        if callable(conversation_callback) and dialogue:
+                            conversation_callback(0.6, dialogue + "▌")
+                        return
+                    # The dialogue is complete once the summary section starts
+                    finish_dialogue()
+                    rendered = summary.to_markdown()
+                    if callable(summary_callback) and rendered:
+                        summary_callback(0.6, rendered + "▌")
+
+                full_response = stream_text(stream, on_update, self.stream_interval, span)
+                conversation, summary = splitter.update(full_response)
+                try:
+                    summary = splitter.summary.result() if summary is not None else None
+                except ValueError:
+                    summary = None
+                span.set(output_chars=len(full_response), summary_section=summary is not None)
+
+            finish_dialogue()
+            return conversation, summary
+
+        except Exception as e:
+            return f"Error: {str(e)}", None
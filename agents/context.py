@@ -0,0 +1,82 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+def _size_of(value):
+    """Approximate memory held by a context value"""
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, dict):
+        return sum(_size_of(v) for v in value.values())
+    return sys.getsizeof(value)
+
+class AgentContext(MutableMapping):
+    """Context shared between agents of one orchestrator, with size and age limits
+
+    Each session or job owns its own context. Entries older than ttl_seconds
+    expire, and the oldest entries are dropped once the total size exceeds
+    max_bytes, so a long-lived session can't grow without bound.
+    """
+
+    def __init__(self, max_bytes=5 * 1024 * 1024, ttl_seconds=60 * 60):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (value, size, stored_at), oldest first
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+
+    def _expire(self):
+        """Drop entries past their lifetime (lock must be held)"""
+        if not self.ttl_seconds:
+            return
+        cutoff = time.time() - self.ttl_seconds
+        while self._entries:
+            key, (_, size, stored_at) = next(iter(self._entries.items()))
+            if stored_at >= cutoff:
+                break
+            del self._entries[key]
+            self._total_bytes -= size
+
+    def __getitem__(self, key):
+        with self._lock:
+            self._expire()
+            return self._entries[key][0]
+
+    def __setitem__(self, key, value):
+        size = _size_of(value)
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size, time.time())
+            self._total_bytes += size
+            # Evict the oldest entries (never the one just stored) when over budget
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, old_size, _) = self._entries.popitem(last=False)
+                self._total_bytes -= old_size
+
+    def __delitem__(self, key):
+        with self._lock:
+            self._total_bytes -= self._entries.pop(key)[1]
+
+    def __iter__(self):
+        with self._lock:
+            self._expire()
+            return iter(list(self._entries))
+
+    def __len__(self):
+        with self._lock:
+            self._expire()
+            return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    @property
+    def size(self):
+        """Approximate bytes currently held"""
+        with self._lock:
+            return self._total_bytes
@@ -1,27 +1,11 @@
-import time
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .dialogue import split_transcript, split_sentences, stitch
+from .streaming import astream_text, stream_text
+from .telemetry import telemetry
 
-class ConversationAgent:
-    def __init__(self, client):
-        self.client = client
-
-    def generate_conversation(self, text, progress_callback, context=None):
-        """Convert transcription to conversation format with streaming"""
-        try:
-            if not text:
-                return "Error: No transcription text provided"
-
-            # Use context if provided
-            context = context or {}
-            
-            # Initial progress update
-            if callable(progress_callback):
-                progress_callback(0.2, "Generating conversation...")
-
-            # Create messages for the API with detailed medical transcription instructions
-            messages = [
-                {
-                    "role": "system", 
-                    "content": """You are an expert medical transcriptionist with a critical responsibility to preserve medical records with 100% accuracy. Your task is to convert the text into a precise dialogue format with these strict requirements:
+CONVERSATION_INSTRUCTIONS = """You are an expert medical transcriptionist with a critical responsibility to preserve medical records with 100% accuracy. Your task is to convert the text into a precise dialogue format with these strict requirements:
 
 1. CRITICAL: Every single word from the original transcription MUST be included - no omissions allowed
 
@@ -68,40 +52,246 @@ class ConversationAgent:
    - NO standardizing speaker labels
 
 Remember: This is a legal medical record - every word and speaker identification must be preserved exactly as in the original transcript."""
-                },
-                {"role": "user", "content": text}
-            ]
-
-            # Get streaming response
-            full_response = ""
-            stream = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=messages,
-                stream=True
-            )
-
-            # Process the stream
-            for chunk in stream:
-                if hasattr(chunk.choices[0].delta, 'content'):
-                    content = chunk.choices[0].delta.content
-                    if content is not None:
-                        full_response += content
-                        # Update UI with streaming content
-                        if callable(progress_callback):
-                            progress_callback(0.6, full_response + "▌")
-                            # Add a small delay to allow Streamlit to update
-                            time.sleep(0.01)
-
-            # Final progress update
+
+class ConversationAgent:
+    def __init__(self, client, max_workers=4):
+        self.client = client
+        self.model = "gpt-4"
+        # Transcripts longer than this are diarized in overlapping segments
+        self.segment_chars = 8000
+        self.overlap_sentences = 2
+        # Seconds between UI updates while streaming (tokens are buffered in between)
+        self.stream_interval = 0.1
+        # Number of segments diarized in parallel
+        self.max_workers = max(1, max_workers)
+
+    def segment_messages(self, segment, index, total):
+        """Messages asking for the dialogue of one segment of a longer transcript"""
+        return [
+            {"role": "system", "content": CONVERSATION_INSTRUCTIONS},
+            {
+                "role": "system",
+                "content": f"This is part {index + 1} of {total} of a longer transcript. "
+                           "Format only this part and keep speaker labels exactly as the transcript implies."
+            },
+            {"role": "user", "content": segment}
+        ]
+
+    def diarize_segment(self, segment, index, total):
+        """Convert one transcript segment to dialogue (non-streaming)"""
+        messages = self.segment_messages(segment, index, total)
+        with telemetry.span("conversation.segment", index=index, input_chars=len(segment)) as span:
+            response = self.client.chat.completions.create(model=self.model, messages=messages)
+            return _segment_content(response, span)
+
+    async def adiarize_segment(self, segment, index, total):
+        """diarize_segment for AsyncOpenAI clients"""
+        messages = self.segment_messages(segment, index, total)
+        with telemetry.span("conversation.segment", index=index, input_chars=len(segment)) as span:
+            response = await self.client.chat.completions.create(model=self.model, messages=messages)
+            return _segment_content(response, span)
+
+    def _segment_done(self, progress_callback, results, segments, completed):
+        """Report progress and the dialogue that is contiguous from the start"""
+        if not callable(progress_callback):
+            return
+        total = len(segments)
+        # The same value for both reports, so progress never goes backwards
+        progress = 0.2 + 0.7 * completed / total
+        progress_callback(progress, f"Generating conversation... ({completed}/{total} segments)")
+        ready = []
+        for result, (_, overlap) in zip(results, segments):
+            if result is None:
+                break
+            ready.append((result, overlap))
+        if ready:
+            progress_callback(progress, stitch(ready) + "▌")
+
+    def generate_segmented(self, text, progress_callback):
+        """Diarize overlapping segments concurrently and stitch them in order"""
+        segments = split_transcript(text, self.segment_chars, self.overlap_sentences)
+        total = len(segments)
+        results = [None] * total
+        completed = 0
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, total)) as executor:
+            # Each segment runs in a copy of the caller's context, keeping its span's parent
+            futures = {
+                executor.submit(contextvars.copy_context().run, self.diarize_segment, segment, i, total): i
+                for i, (segment, _) in enumerate(segments)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception:
+                    for pending in futures:
+                        pending.cancel()
+                    raise
+                completed += 1
+                self._segment_done(progress_callback, results, segments, completed)
+
+        return stitch(list(zip(results, (overlap for _, overlap in segments))))
+
+    async def agenerate_segmented(self, text, progress_callback):
+        """generate_segmented with asyncio tasks instead of worker threads"""
+        segments = split_transcript(text, self.segment_chars, self.overlap_sentences)
+        total = len(segments)
+        results = [None] * total
+        completed = 0
+        limit = asyncio.Semaphore(min(self.max_workers, total))
+
+        async def diarize(segment, i):
+            async with limit:
+                return i, await self.adiarize_segment(segment, i, total)
+
+        tasks = [asyncio.ensure_future(diarize(segment, i)) for i, (segment, _) in enumerate(segments)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                i, results[i] = await next_done
+                completed += 1
+                self._segment_done(progress_callback, results, segments, completed)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        return stitch(list(zip(results, (overlap for _, overlap in segments))))
+
+    def stream_segment(self, segment, previous_dialogue, on_update):
+        """Stream the dialogue for one transcript chunk, continuing previous_dialogue"""
+        messages = [{"role": "system", "content": CONVERSATION_INSTRUCTIONS}]
+        if previous_dialogue:
+            messages.append({
+                "role": "system",
+                "content": "The conversation so far ends with:\n\n" + previous_dialogue +
+                           "\n\nThe text below continues it (its first sentences repeat the end of the "
+                           "previous part). Keep using the same speaker labels."
+            })
+        messages.append({"role": "user", "content": segment})
+
+        with telemetry.span("conversation.segment", input_chars=len(segment)) as span:
+            stream = self.client.chat.completions.create(model=self.model, messages=messages, stream=True)
+            text = stream_text(stream, on_update, self.stream_interval, span)
+            span.set(output_chars=len(text))
+        return text
+
+    def generate_incremental(self, chunks, progress_callback, context=None):
+        """Format transcript chunks into dialogue as they arrive (pipelined mode)
+
+        chunks is an iterable of transcript texts in order; each one is
+        diarized as soon as it arrives and streamed after the dialogue so far.
+        """
+        if context is None:
+            context = {}
+
+        parts = []
+        dialogue = ""
+        previous_text = ""
+        for index, chunk_text in enumerate(chunks):
+            # Repeat the end of the previous chunk so speakers can be matched at the seam
+            overlap = " ".join(split_sentences(previous_text)[-self.overlap_sentences:]) if previous_text else ""
+            segment = f"{overlap} {chunk_text}".strip()
+            prefix = f"{dialogue}\n\n" if dialogue else ""
+
+            if callable(progress_callback):
+                progress_callback(0.6, f"Formatting conversation... (part {index + 1})")
+
+            def on_update(partial):
+                if callable(progress_callback):
+                    progress_callback(0.6, prefix + partial + "▌")
+
+            parts.append((self.stream_segment(segment, dialogue[-1500:], on_update), overlap))
+            dialogue = stitch(parts)
+            previous_text = chunk_text
             if callable(progress_callback):
-                progress_callback(1.0, "Conversation generated")
+                progress_callback(0.6, dialogue + "▌")
+
+        if callable(progress_callback):
+            progress_callback(1.0, "Conversation generated")
+        context['conversation'] = dialogue
+        return dialogue
+
+    def messages(self, text):
+        """Messages for the API with detailed medical transcription instructions"""
+        return [
+            {"role": "system", "content": CONVERSATION_INSTRUCTIONS},
+            {"role": "user", "content": text}
+        ]
+
+    def generate_conversation(self, text, progress_callback, context=None):
+        """Convert transcription to conversation format with streaming"""
+        if not text:
+            return "Error: No transcription text provided"
+        with _ConversationRun(self, text, progress_callback, context) as run:
+            # Long transcripts: diarize segments in parallel instead of one huge request
+            if run.segmented:
+                full_response = self.generate_segmented(text, progress_callback)
+            else:
+                stream = self.client.chat.completions.create(model=self.model, messages=self.messages(text), stream=True)
+                # Process the stream, updating the UI at a fixed frame rate rather than per token
+                full_response = stream_text(stream, run.on_update, self.stream_interval, run.span)
+            run.finish(full_response)
+        return run.result
+
+    async def agenerate_conversation(self, text, progress_callback, context=None):
+        """generate_conversation for AsyncOpenAI clients"""
+        if not text:
+            return "Error: No transcription text provided"
+        with _ConversationRun(self, text, progress_callback, context) as run:
+            if run.segmented:
+                full_response = await self.agenerate_segmented(text, progress_callback)
+            else:
+                stream = await self.client.chat.completions.create(model=self.model, messages=self.messages(text), stream=True)
+                full_response = await astream_text(stream, run.on_update, self.stream_interval, run.span)
+            run.finish(full_response)
+        return run.result
+
+class _ConversationRun:
+    """One generate_conversation() call: span, progress and the final result
+
+    Used as a context manager around the request; an exception inside it
+    becomes an "Error: ..." result instead of propagating.
+    """
+
+    def __init__(self, agent, text, progress_callback, context):
+        self.progress_callback = progress_callback
+        # Use context if provided
+        self.context = context if context is not None else {}
+        self.segmented = len(text) > agent.segment_chars
+        self.on_update = None
+        if callable(progress_callback):
+            self.on_update = lambda partial: progress_callback(0.6, partial + "▌")
+        self._span = telemetry.span("conversation", model=agent.model, input_chars=len(text))
+        self.result = None
+
+    def __enter__(self):
+        # Initial progress update
+        if callable(self.progress_callback):
+            self.progress_callback(0.2, "Generating conversation...")
+        self.span = self._span.__enter__()
+        self.span.set(mode="segmented" if self.segmented else "single")
+        return self
 
-            # Store result in context
-            context['conversation'] = full_response
+    def __exit__(self, exc_type, exc, tb):
+        if isinstance(exc, Exception):
+            self.result = f"Error: {str(exc)}"
+        self._span.__exit__(exc_type, exc, tb)
+        return isinstance(exc, Exception)
 
-            return full_response
+    def finish(self, full_response):
+        self.span.set(output_chars=len(full_response))
+        if callable(self.progress_callback):
+            self.progress_callback(1.0, "Conversation generated")
+        # Store result in context
+        self.context['conversation'] = full_response
+        self.result = full_response
 
-        except Exception as e:
-            return f"Error: {str(e)}"
+def _segment_content(response, span):
+    """The text of a non-streamed segment reply, recording its size and usage"""
+    content = response.choices[0].message.content or ""
+    span.set(output_chars=len(content))
+    if getattr(response, "usage", None) is not None:
+        span.set(total_tokens=response.usage.total_tokens)
+    return content
 
 # Remove the legacy agent definition completely 
\ No newline at end of file
@@ -0,0 +1,138 @@
+import re
+from collections import Counter
+
+# "Speaker: words" at the start of a line; labels are short and contain no colon
+TURN_PATTERN = re.compile(r"^\s*\**([^:\n*]{1,40}?)\**\s*:\s*(.*)$")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def split_sentences(text):
+    """Split transcript text into sentences"""
+    return [sentence for sentence in SENTENCE_END.split(text.strip()) if sentence]
+
+def split_words(text, max_chars):
+    """Split text into pieces of at most max_chars at word boundaries
+
+    A single word longer than max_chars is kept whole.
+    """
+    pieces = []
+    current = []
+    size = 0
+    for word in text.split():
+        if current and size + len(word) > max_chars:
+            pieces.append(" ".join(current))
+            current = []
+            size = 0
+        current.append(word)
+        size += len(word) + 1
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+def split_transcript(text, max_chars=8000, overlap_sentences=2):
+    """Split a transcript into segments at sentence boundaries
+
+    Returns a list of (segment_text, overlap_text) where overlap_text is the
+    leading part of the segment repeated from the end of the previous one.
+    Sentences too long for a segment (such as unpunctuated transcripts) are
+    split at word boundaries instead.
+    """
+    # Small enough that the carried overlap leaves at least half a segment for new text
+    piece_chars = max(1, max_chars // (2 * overlap_sentences)) if overlap_sentences else max_chars
+    sentences = []
+    for sentence in split_sentences(text):
+        if len(sentence) > max_chars:
+            sentences.extend(split_words(sentence, piece_chars))
+        else:
+            sentences.append(sentence)
+    segments = []
+    current = []
+    overlap = []
+    size = 0
+    for sentence in sentences:
+        if current and size + len(sentence) > max_chars and len(current) > len(overlap):
+            segments.append((" ".join(current), " ".join(overlap)))
+            # Carry the last few sentences into the next segment as shared context
+            overlap = current[-overlap_sentences:] if overlap_sentences else []
+            current = list(overlap)
+            size = sum(len(s) + 1 for s in current)
+        current.append(sentence)
+        size += len(sentence) + 1
+    if len(current) > len(overlap) or not segments:
+        segments.append((" ".join(current), " ".join(overlap)))
+    return segments
+
+def parse_turns(dialogue):
+    """Parse "Speaker: text" dialogue into a list of [speaker, text] turns"""
+    turns = []
+    for line in dialogue.splitlines():
+        if not line.strip():
+            continue
+        match = TURN_PATTERN.match(line)
+        if match:
+            turns.append([match.group(1).strip(), match.group(2).strip()])
+        elif turns:
+            # Continuation of the previous speaker's turn
+            turns[-1][1] = f"{turns[-1][1]} {line.strip()}"
+        else:
+            turns.append(["", line.strip()])
+    return turns
+
+def format_turns(turns):
+    """Render turns back into the dialogue format, one blank line between turns"""
+    return "\n\n".join(f"{speaker}: {text}" if speaker else text for speaker, text in turns)
+
+def _word_speakers(turns):
+    """Flatten turns into one speaker label per word"""
+    return [speaker for speaker, text in turns for _ in text.split()]
+
+def _map_labels(previous_tail, current_head):
+    """Map the current segment's speaker labels onto the previous segment's
+
+    Both lists hold one label per word of the same overlapping text, so
+    counting which labels line up tells us how the model renamed speakers.
+    """
+    pairs = Counter(zip(current_head, previous_tail))
+    mapping = {}
+    used = set()
+    for (current, previous), _ in pairs.most_common():
+        if current in mapping or previous in used:
+            continue
+        mapping[current] = previous
+        used.add(previous)
+    return mapping
+
+def stitch(parts):
+    """Join diarized segments, dropping repeated overlap and reconciling labels
+
+    parts is a list of (dialogue, overlap_text) in segment order.
+    """
+    stitched = []
+    for dialogue, overlap in parts:
+        turns = parse_turns(dialogue)
+        overlap_words = len(overlap.split())
+        if not stitched or not overlap_words:
+            stitched.extend(turns)
+            continue
+
+        # Align speaker labels over the overlapping words
+        head = _word_speakers(turns)[:overlap_words]
+        tail = _word_speakers(stitched)[-len(head):] if head else []
+        mapping = _map_labels(tail, head)
+        turns = [[mapping.get(speaker, speaker), text] for speaker, text in turns]
+
+        # Drop the words already present at the end of the previous segment
+        remaining = overlap_words
+        while turns and remaining > 0:
+            words = turns[0][1].split()
+            if len(words) <= remaining:
+                remaining -= len(words)
+                turns.pop(0)
+            else:
+                turns[0][1] = " ".join(words[remaining:])
+                remaining = 0
+
+        # Merge a turn split across the seam
+        if turns and stitched and turns[0][0] == stitched[-1][0]:
+            stitched[-1][1] = f"{stitched[-1][1]} {turns.pop(0)[1]}"
+        stitched.extend(turns)
+    return format_turns(stitched)
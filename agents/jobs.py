@@ -0,0 +1,238 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+STAGES = ("transcription", "conversation", "summary")
+
+class Job:
+    """State of one background processing job"""
+
+    def __init__(self, job_id, name, stages, metadata=None):
+        self.id = job_id
+        self.name = name
+        self.stages = tuple(stages)
+        self.metadata = metadata or {}
+        self.status = "queued"  # queued, running, done or failed
+        self.stage = None
+        self.progress = 0.0
+        self.message = "Waiting for a worker..."
+        # stage -> text, partial while the stage is streaming, plus
+        # summary_record: the typed summary the summary text was rendered from
+        # summary_key: source key of the text, prompt and model it came from
+        self.results = {}
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def snapshot(self):
+        """Return a plain copy of the job state that is safe to read from the UI"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'stages': self.stages,
+            'metadata': dict(self.metadata),
+            'status': self.status,
+            'stage': self.stage,
+            'progress': self.progress,
+            'message': self.message,
+            'results': dict(self.results),
+            'error': self.error,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at
+        }
+
+class JobManager:
+    """Run transcription, conversation and summary stages on a worker pool
+
+    The UI submits audio, gets a job ID back straight away and polls
+    get() for status and partial results, so long recordings never hold
+    a Streamlit script run.
+    """
+
+    def __init__(self, orchestrator_factory, max_workers=2, on_stage_complete=None, max_finished=100,
+                 pipeline=True, combined=False):
+        # Each job gets its own orchestrator so contexts never leak between jobs
+        self.orchestrator_factory = orchestrator_factory
+        # Stream dialogue while later chunks are still being transcribed
+        self.pipeline = pipeline
+        # Generate conversation and summary from one request instead of two
+        self.combined = combined
+        self.on_stage_complete = on_stage_complete
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, audio_bytes, name, stages=STAGES, results=None, metadata=None):
+        """Queue a job and return its ID; results pre-fills stages that can be skipped"""
+        job = Job(uuid.uuid4().hex, name, stages, metadata)
+        job.results.update(results or {})
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        # The executor keeps its arguments until the job ends, so hand over
+        # the upload in a list _run can empty once it has been transcribed
+        self._executor.submit(self._run, job, [audio_bytes])
+        return job.id
+
+    def get(self, job_id):
+        """Return a snapshot of a job, or None if it is unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.snapshot() if job else None
+
+    def list(self):
+        """Return snapshots of all known jobs, newest first"""
+        with self._lock:
+            return [job.snapshot() for job in reversed(self._jobs.values())]
+
+    def queue_depth(self):
+        """Number of jobs waiting for a worker"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.status == "queued")
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond max_finished (lock must be held)"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in ("done", "failed")]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def _update(self, job, **fields):
+        with self._lock:
+            for key, value in fields.items():
+                setattr(job, key, value)
+
+    def _progress_callback(self, job, index):
+        """Map a stage's 0-1 progress onto the whole job and capture streamed text"""
+        def callback(progress, text):
+            with self._lock:
+                if text.endswith("▌"):
+                    # Streaming callbacks pass the partial output with a cursor
+                    job.results[job.stage] = text[:-1]
+                else:
+                    job.message = text
+                job.progress = (index + progress) / len(job.stages)
+        return callback
+
+    def _complete_stage(self, job, stage, result):
+        with self._lock:
+            job.results[stage] = result
+        if self.on_stage_complete:
+            self.on_stage_complete(job.snapshot(), stage, result)
+
+    def _keep_summary_record(self, job, orchestrator):
+        """Keep the typed summary and its source key so on_stage_complete can save them"""
+        with self._lock:
+            for key in ('summary_record', 'summary_key'):
+                if orchestrator.context.get(key) is not None:
+                    job.results[key] = orchestrator.context[key]
+
+    def _can_pipeline(self, job):
+        """Pipeline only when transcription is followed by a conversation to generate"""
+        stages = job.stages
+        return (self.pipeline and "conversation" in stages and "conversation" not in job.results
+                and stages.index("conversation") == stages.index("transcription") + 1
+                and not self._can_combine(job))
+
+    def _can_combine(self, job):
+        """Combine only when both conversation and summary, in that order, are still to do"""
+        stages = job.stages
+        return (self.combined and "conversation" in stages and "summary" in stages
+                and "conversation" not in job.results and "summary" not in job.results
+                and stages.index("summary") == stages.index("conversation") + 1)
+
+    def _run_pipeline(self, job, orchestrator, audio_bytes, index):
+        """Run transcription and conversation together, streaming partial dialogue"""
+        def callback(progress, text):
+            with self._lock:
+                if text.endswith("▌"):
+                    job.stage = "conversation"
+                    job.results["conversation"] = text[:-1]
+                else:
+                    job.message = text
+                # The pipeline covers two stages' worth of progress
+                job.progress = (index + 2 * progress) / len(job.stages)
+
+        transcription, conversation = orchestrator.process_pipeline(audio_bytes, callback)
+        if not transcription or transcription.startswith("Error"):
+            raise RuntimeError(transcription or "Transcription returned no result")
+        self._complete_stage(job, "transcription", transcription)
+
+        if not conversation or conversation.startswith("Error"):
+            with self._lock:
+                job.results.pop("conversation", None)
+            raise RuntimeError(conversation or "Conversation returned no result")
+        self._complete_stage(job, "conversation", conversation)
+
+    def _run_combined(self, job, orchestrator, index):
+        """Run conversation and summary as one request, streaming both"""
+        summary_progress = self._progress_callback(job, index + 1)
+
+        def summary_callback(progress, text):
+            with self._lock:
+                job.stage = "summary"
+            summary_progress(progress, text)
+
+        conversation, summary = orchestrator.process_combined(
+            job.results["transcription"], self._progress_callback(job, index), summary_callback)
+        if not conversation or conversation.startswith("Error"):
+            with self._lock:
+                job.results.pop("conversation", None)
+            raise RuntimeError(conversation or "Conversation returned no result")
+        self._complete_stage(job, "conversation", conversation)
+
+        if not summary or summary.startswith("Error"):
+            with self._lock:
+                job.results.pop("summary", None)
+            raise RuntimeError(summary or "Summary returned no result")
+        self._keep_summary_record(job, orchestrator)
+        self._complete_stage(job, "summary", summary)
+
+    def _run(self, job, upload):
+        try:
+            orchestrator = self.orchestrator_factory()
+            self._update(job, status="running")
+
+            for index, stage in enumerate(job.stages):
+                self._update(job, stage=stage, progress=index / len(job.stages))
+                if stage in job.results:
+                    # Already available (e.g. loaded from a saved file)
+                    continue
+
+                if stage == "transcription" and self._can_pipeline(job):
+                    self._run_pipeline(job, orchestrator, upload.pop(), index)
+                    continue
+
+                if stage == "conversation" and self._can_combine(job):
+                    self._run_combined(job, orchestrator, index)
+                    continue
+
+                callback = self._progress_callback(job, index)
+                if stage == "transcription":
+                    # Release the upload as soon as it has been transcribed
+                    result = orchestrator.process_transcription(upload.pop(), callback)
+                elif stage == "conversation":
+                    result = orchestrator.process_conversation(job.results["transcription"], callback)
+                elif stage == "summary":
+                    source = job.results.get("conversation") or job.results["transcription"]
+                    result = orchestrator.process_summary(source, callback)
+                    self._keep_summary_record(job, orchestrator)
+                else:
+                    raise ValueError(f"Unknown job stage: {stage}")
+
+                if not result or result.startswith("Error"):
+                    raise RuntimeError(result or f"{stage.title()} returned no result")
+
+                self._complete_stage(job, stage, result)
+
+            self._update(job, status="done", stage=None, progress=1.0,
+                         message="Complete", finished_at=time.time())
+        except Exception as e:
+            self._update(job, status="failed", error=str(e),
+                         message=f"Failed: {str(e)}", finished_at=time.time())
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs and optionally wait for running ones"""
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,105 @@
+import json
+
+class JsonFieldParser:
+    """Parse a streamed JSON object and report each field as soon as it is complete
+
+    Fed text in arbitrary pieces, it calls on_field(name, value) when a
+    top-level field's value has fully arrived, and on_item(name, value) for
+    every element of a top-level array as soon as that element closes, so
+    callers can use the first fields long before the response ends. Each
+    character is scanned once; only completed values are handed to
+    json.loads. Text before the opening brace (e.g. a code fence) is ignored.
+    """
+
+    def __init__(self, on_field=None, on_item=None):
+        self.on_field = on_field
+        self.on_item = on_item
+        self.done = False  # True once the top-level object has closed
+        self._text = ""
+        self._pos = 0
+        self._stack = []  # Open containers, "{" or "["
+        self._in_string = False
+        self._escape = False
+        self._token_start = None  # Start of the string or literal being read
+        self._expect_key = True  # Next token in the top-level object is a key
+        self._key = None
+        self._value_start = None  # Start of the current top-level value
+        self._item_start = None  # Start of the current top-level array element
+
+    def feed(self, text):
+        """Scan newly streamed text"""
+        self._text += text
+        text = self._text
+        for i in range(self._pos, len(text)):
+            if self.done:
+                break
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._end_token(i + 1)
+                continue
+
+            if self._token_start is not None and (c in ",:}]" or c.isspace()):
+                # End of a number, true, false or null
+                self._end_token(i)
+
+            if c.isspace() or (not self._stack and c != "{"):
+                continue
+            if c == '"':
+                self._start_token(i)
+                self._in_string = True
+            elif c in "{[":
+                self._start_value(i)
+                self._stack.append(c)
+            elif c in "}]":
+                self._stack.pop()
+                if not self._stack:
+                    self.done = True
+                else:
+                    self._end_value(i + 1)
+            elif c == ":":
+                if len(self._stack) == 1:
+                    self._expect_key = False
+            elif c == ",":
+                if len(self._stack) == 1:
+                    self._expect_key = True
+            elif self._token_start is None:
+                self._start_token(i)
+        self._pos = len(text)
+
+    def _start_token(self, i):
+        self._token_start = i
+        self._start_value(i)
+
+    def _end_token(self, end):
+        start, self._token_start = self._token_start, None
+        if len(self._stack) == 1 and self._expect_key:
+            self._key = json.loads(self._text[start:end])
+        else:
+            self._end_value(end)
+
+    def _start_value(self, i):
+        depth = len(self._stack)
+        if depth == 1 and not self._expect_key:
+            self._value_start = i
+        elif depth == 2 and self._stack[1] == "[":
+            self._item_start = i
+
+    def _end_value(self, end):
+        """A value closed at `end`; report it if it is a field or array element"""
+        depth = len(self._stack)
+        if depth == 1 and self._value_start is not None:
+            value = json.loads(self._text[self._value_start:end])
+            self._value_start = None
+            if self.on_field:
+                self.on_field(self._key, value)
+        elif depth == 2 and self._stack[1] == "[" and self._item_start is not None:
+            value = json.loads(self._text[self._item_start:end])
+            self._item_start = None
+            if self.on_item:
+                self.on_item(self._key, value)
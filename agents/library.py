@@ -0,0 +1,195 @@
+import glob
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+ARTIFACT_KINDS = ("transcription", "conversation", "summary")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    path TEXT PRIMARY KEY,
+    display_name TEXT NOT NULL,
+    recorded_at TEXT,
+    modified_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    transcription_path TEXT,
+    conversation_path TEXT,
+    summary_path TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_recordings_modified ON recordings (modified_at DESC);
+CREATE INDEX IF NOT EXISTS idx_recordings_name ON recordings (display_name COLLATE NOCASE);
+"""
+
+# Keep artifact paths recorded earlier if they can't be guessed from the name
+UPSERT = """
+INSERT INTO recordings (path, display_name, recorded_at, modified_at, size,
+    transcription_path, conversation_path, summary_path)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (path) DO UPDATE SET
+    display_name = excluded.display_name,
+    recorded_at = excluded.recorded_at,
+    modified_at = excluded.modified_at,
+    size = excluded.size,
+    transcription_path = COALESCE(excluded.transcription_path, transcription_path),
+    conversation_path = COALESCE(excluded.conversation_path, conversation_path),
+    summary_path = COALESCE(excluded.summary_path, summary_path)
+"""
+
+def parse_recording_name(audio_path):
+    """Return (display name, recorded datetime or None) from name_YYYYMMDD_HHMMSS.ext"""
+    name, _ = os.path.splitext(os.path.basename(audio_path))
+    parts = name.split('_')
+    display_name = ' '.join(parts[:-2]).title()
+    try:
+        recorded_at = datetime.strptime('_'.join(parts[-2:]), "%Y%m%d_%H%M%S")
+    except ValueError:
+        recorded_at = None
+    return display_name, recorded_at
+
+def find_artifacts(audio_path, transcriptions_dir="transcriptions", conversations_dir="conversations",
+                   summaries_dir="summaries"):
+    """Locate transcription, conversation and summary files saved for a recording"""
+    # Get the original filename without the timestamp
+    filename = os.path.basename(audio_path)
+    original_name = filename.split('_')[0]  # Get the part before first underscore
+
+    # Get just the date from the audio filename
+    date_only = filename.split('_')[-2] if '_' in filename else ''  # Get YYYYMMDD part
+
+    # Create the base filename that matches our saved files
+    base_filename = f"{original_name}_{date_only}"
+    transcription_path = os.path.join(transcriptions_dir, f"{base_filename}.md")
+    conversation_path = os.path.join(conversations_dir, f"{base_filename}.md")
+    summary_path = os.path.join(summaries_dir, f"{base_filename}.md")
+
+    return {
+        'transcription': transcription_path if os.path.exists(transcription_path) else None,
+        'conversation': conversation_path if os.path.exists(conversation_path) else None,
+        'summary': summary_path if os.path.exists(summary_path) else None
+    }
+
+class RecordingLibrary:
+    """Persistent SQLite index of recordings and their derived artifacts
+
+    The index is updated when files are saved or deleted, so listing the
+    library is a paginated query instead of a directory scan.
+    """
+
+    def __init__(self, db_path="library.db", audio_dir="audio"):
+        self.db_path = db_path
+        self.audio_dir = audio_dir
+        self._lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            # Indexes created before summaries were saved lack the column
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(recordings)")}
+            if 'summary_path' not in columns:
+                conn.execute("ALTER TABLE recordings ADD COLUMN summary_path TEXT")
+
+    @contextmanager
+    def _connect(self):
+        """Open a short-lived connection; commit on success"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _record(self, audio_path):
+        """Build an index row for an audio file on disk"""
+        stat = os.stat(audio_path)
+        display_name, recorded_at = parse_recording_name(audio_path)
+        artifacts = find_artifacts(audio_path)
+        return (
+            audio_path,
+            display_name,
+            recorded_at.isoformat() if recorded_at else None,
+            stat.st_mtime,
+            stat.st_size,
+            artifacts['transcription'],
+            artifacts['conversation'],
+            artifacts['summary']
+        )
+
+    def add(self, audio_path):
+        """Index (or re-index) a recording"""
+        record = self._record(audio_path)
+        with self._lock, self._connect() as conn:
+            conn.execute(UPSERT, record)
+
+    def remove(self, audio_path):
+        """Drop a recording from the index"""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM recordings WHERE path = ?", (audio_path,))
+
+    def set_artifact(self, audio_path, kind, artifact_path):
+        """Record where a derived file (transcription, conversation, summary) was saved"""
+        if kind not in ARTIFACT_KINDS:
+            raise ValueError(f"Unknown artifact kind: {kind}")
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                f"UPDATE recordings SET {kind}_path = ? WHERE path = ?",
+                (artifact_path, audio_path)
+            )
+
+    def get(self, audio_path):
+        """Return the index row for a recording, or None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM recordings WHERE path = ?", (audio_path,)).fetchone()
+        return dict(row) if row else None
+
+    def _where(self, search):
+        if not search:
+            return "", ()
+        # Match % and _ in names literally rather than as wildcards
+        pattern = search.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return "WHERE display_name LIKE ? ESCAPE '\\' COLLATE NOCASE", (f"%{pattern}%",)
+
+    def list(self, offset=0, limit=20, search=None):
+        """Return one page of recordings, newest first, optionally filtered by name"""
+        where, params = self._where(search)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM recordings {where} ORDER BY modified_at DESC LIMIT ? OFFSET ?",
+                params + (limit, offset)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self, search=None):
+        """Number of recordings matching the search"""
+        where, params = self._where(search)
+        with self._connect() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM recordings {where}", params).fetchone()[0]
+
+    def sync(self):
+        """Reconcile the index with the audio folder (new, changed and removed files)"""
+        on_disk = {}
+        for path in glob.glob(os.path.join(self.audio_dir, "*.mp3")):
+            try:
+                on_disk[path] = os.path.getmtime(path)
+            except OSError:
+                continue
+
+        with self._connect() as conn:
+            indexed = dict(conn.execute("SELECT path, modified_at FROM recordings").fetchall())
+
+        records = []
+        for path, mtime in on_disk.items():
+            if indexed.get(path) != mtime:
+                try:
+                    records.append(self._record(path))
+                except OSError:
+                    continue
+        # One transaction for the whole folder instead of one per file
+        with self._lock, self._connect() as conn:
+            conn.executemany("DELETE FROM recordings WHERE path = ?",
+                             [(path,) for path in set(indexed) - set(on_disk)])
+            conn.executemany(UPSERT, records)
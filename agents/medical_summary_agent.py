@@ -1,20 +1,142 @@
+import hashlib
+
+from .streaming import astream_text, stream_text
+from .summary_model import SummaryStream
+from .telemetry import telemetry
+
+SUMMARY_INSTRUCTIONS = """You are a medical documentation specialist. Extract the following information from the conversation and return it as a single JSON object with exactly these keys, in this order:
+
+{
+  "medications": [
+    {"name": "medication name", "dosage": "dosage prescribed", "frequency": "frequency of administration",
+     "duration": "duration of treatment", "route": "route of administration"}
+  ],
+  "treatment_plan": {
+    "treatments": ["prescribed treatments/procedures"],
+    "schedule": "treatment schedule",
+    "duration": "treatment duration",
+    "special_instructions": ["special instructions"]
+  },
+  "side_effects": {
+    "reported": ["reported side effects"],
+    "potential": ["potential side effects discussed"],
+    "warnings": ["warnings given"]
+  },
+  "effectiveness": {
+    "reported": ["reported effectiveness of current/previous treatments"],
+    "expected_outcomes": ["expected outcomes"],
+    "follow_up": ["follow-up requirements"]
+  },
+  "notes": {
+    "warnings": ["any specific warnings"],
+    "contraindications": ["contraindications"],
+    "drug_interactions": ["drug interactions"],
+    "lifestyle_modifications": ["lifestyle modifications"]
+  }
+}
+
+Use null for a text field and an empty list for a list field when that information was not discussed.
+Only include information that was explicitly mentioned in the conversation - do not make assumptions or add information not present in the transcript."""
+
+# Changes whenever the instructions do, so summaries cached under an older prompt are regenerated
+SUMMARY_PROMPT_VERSION = hashlib.sha256(SUMMARY_INSTRUCTIONS.encode("utf-8")).hexdigest()[:12]
+
+SUMMARY_MODEL = "o3-mini"
+
+def summary_cache_key(text, model=SUMMARY_MODEL):
+    """Hash the source text together with the prompt version and model"""
+    digest = hashlib.sha256(f"{model}\0{SUMMARY_PROMPT_VERSION}\0".encode("utf-8"))
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
 class MedicalSummaryAgent:
     def __init__(self, client):
         self.client = client
         self.name = "Medical Summary Agent"
-        self.model = "gpt-4"
-        self.instructions = "You are a medical summarization expert. Extract and organize key medical information."
+        self.model = SUMMARY_MODEL
+        self.instructions = SUMMARY_INSTRUCTIONS
+        # Seconds between UI updates while streaming
+        self.stream_interval = 0.1
         
-    def generate_summary(self, text):
-        """Generate a medical summary from the conversation"""
+    def generate_structured(self, text, on_update=None):
+        """Extract a MedicalSummary from the conversation; raises on API or parse errors
+
+        The reply is requested in JSON mode and parsed as it streams. With
+        on_update, the summary so far (holding the sections received) is
+        passed on each time the UI is due a refresh.
+        """
+        with telemetry.span("summary", model=self.model, input_chars=len(text)) as span:
+            request = self.request(text)
+            parsed = SummaryStream()
+            if callable(on_update):
+                stream = self.client.chat.completions.create(stream=True, **request)
+                parsed.update(stream_text(stream, lambda partial: on_update(parsed.update(partial)),
+                                          self.stream_interval, span))
+            else:
+                response = self.client.chat.completions.create(**request)
+                _feed_response(parsed, response, span)
+            return parsed.result()
+
+    async def agenerate_structured(self, text, on_update=None):
+        """generate_structured for AsyncOpenAI clients"""
+        with telemetry.span("summary", model=self.model, input_chars=len(text)) as span:
+            request = self.request(text)
+            parsed = SummaryStream()
+            if callable(on_update):
+                stream = await self.client.chat.completions.create(stream=True, **request)
+                parsed.update(await astream_text(stream, lambda partial: on_update(parsed.update(partial)),
+                                                 self.stream_interval, span))
+            else:
+                response = await self.client.chat.completions.create(**request)
+                _feed_response(parsed, response, span)
+            return parsed.result()
+
+    def request(self, text):
+        """Chat completion arguments asking for the summary JSON"""
+        return {
+            'model': self.model,
+            'messages': [
+                {"role": "system", "content": self.instructions},
+                {"role": "user", "content": text}
+            ],
+            'response_format': {"type": "json_object"}
+        }
+
+    def generate_summary(self, text, progress_callback=None, context=None):
+        """Generate a medical summary from the conversation, rendered as Markdown
+
+        With a progress callback the summary is streamed, and each section is
+        passed on (with a "▌" cursor) as soon as it has been parsed. The typed
+        summary is kept in context['summary_record'].
+        """
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self.instructions},
-                    {"role": "user", "content": text}
-                ]
-            )
-            return response.choices[0].message.content
+            summary = self.generate_structured(text, _markdown_updates(progress_callback))
+            return _keep_summary(summary, context)
         except Exception as e:
-            return f"Error generating summary: {str(e)}" 
\ No newline at end of file
+            return f"Error generating summary: {str(e)}"
+
+    async def agenerate_summary(self, text, progress_callback=None, context=None):
+        """generate_summary for AsyncOpenAI clients"""
+        try:
+            summary = await self.agenerate_structured(text, _markdown_updates(progress_callback))
+            return _keep_summary(summary, context)
+        except Exception as e:
+            return f"Error generating summary: {str(e)}"
+
+def _feed_response(parsed, response, span):
+    """Parse a non-streamed reply, recording its token usage"""
+    if getattr(response, "usage", None) is not None:
+        span.set(total_tokens=response.usage.total_tokens)
+    parsed.feed(response.choices[0].message.content)
+
+def _markdown_updates(progress_callback):
+    """on_update passing the summary so far to progress_callback as Markdown"""
+    if not callable(progress_callback):
+        return None
+    return lambda summary: progress_callback(0.6, summary.to_markdown() + "▌")
+
+def _keep_summary(summary, context):
+    """Keep the typed summary in context and return it rendered as Markdown"""
+    if context is not None:
+        context['summary_record'] = summary
+    return summary.to_markdown()
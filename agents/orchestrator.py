@@ -1,24 +1,175 @@
+import contextvars
+import queue
+import threading
 from openai import OpenAI
 from .transcription_agent import TranscriptionAgent
 from .conversation_agent import ConversationAgent
+from .medical_summary_agent import MedicalSummaryAgent, summary_cache_key
+from .combined_agent import CombinedAgent, combined_cache_key
+from .context import AgentContext
+from .telemetry import telemetry
 
 class Orchestrator:
-    def __init__(self, client):
+    def __init__(self, client, transcription_workers=4, transcription_cache=None,
+                 context_max_bytes=5 * 1024 * 1024, context_ttl_seconds=60 * 60,
+                 transcription_checkpoints=None, transcription_backend=None,
+                 transcription_upload_format=None):
         self.client = client
-        self.transcription_agent = TranscriptionAgent(client)
+        self.transcription_agent = TranscriptionAgent(
+            client,
+            max_workers=transcription_workers,
+            cache=transcription_cache,
+            checkpoints=transcription_checkpoints,
+            backend=transcription_backend,
+            upload_format=transcription_upload_format
+        )
         self.conversation_agent = ConversationAgent(client)
-        self.context = {}  # Shared context between agents
+        self.summary_agent = MedicalSummaryAgent(client)
+        self.combined_agent = CombinedAgent(client)
+        # Context shared between this orchestrator's agents; one orchestrator
+        # per session or job keeps users' data apart
+        self.context = AgentContext(max_bytes=context_max_bytes, ttl_seconds=context_ttl_seconds)
+
+    def reset_context(self):
+        """Forget everything from the previous recording"""
+        self.context.clear()
 
     def process_transcription(self, audio_bytes, progress_callback):
         """Coordinate transcription of audio using the transcription agent"""
-        return self.transcription_agent.transcribe(audio_bytes, progress_callback, self.context)
+        with telemetry.span("stage.transcription"):
+            return self.transcription_agent.transcribe(audio_bytes, progress_callback, self.context)
 
     def process_conversation(self, transcription_text, progress_callback):
         """Coordinate conversation generation using the conversation agent"""
-        # Store transcription in context if not already there
-        if 'transcription' not in self.context:
-            self.context['transcription'] = transcription_text
-        return self.conversation_agent.generate_conversation(transcription_text, progress_callback, self.context)
+        # Always track the transcription being converted, not a stale one
+        self.context['transcription'] = transcription_text
+        with telemetry.span("stage.conversation"):
+            return self.conversation_agent.generate_conversation(transcription_text, progress_callback, self.context)
+
+    def process_pipeline(self, audio_bytes, progress_callback):
+        """Transcribe and format the conversation at the same time
+
+        Each transcribed chunk is handed to the conversation agent as soon as
+        it is ready, so dialogue streams while later chunks are still being
+        transcribed. Returns (transcription, conversation); on failure the
+        conversation is None and the transcription holds the error message.
+        """
+        events = queue.Queue()
+
+        def transcribe():
+            try:
+                result = self.transcription_agent.transcribe(
+                    audio_bytes,
+                    lambda progress, text: events.put(("progress", progress, text)),
+                    self.context,
+                    chunk_callback=lambda text: events.put(("chunk", text))
+                )
+            except Exception as e:
+                result = f"Error in transcription process: {str(e)}"
+            events.put(("done", result))
+
+        outcome = {}
+        # Transcription progress now, when the chunk being formatted arrived,
+        # and when the last formatted one did; the conversation's share of
+        # the progress follows the chunks it has finished
+        state = {'transcribed': 0.0, 'consumed': 0.0, 'formatted': 0.0, 'reported': 0.0}
+
+        def report(text):
+            # Never move backwards, whichever side reports
+            state['reported'] = max(state['reported'], 0.5 * (state['transcribed'] + state['formatted']))
+            if callable(progress_callback):
+                progress_callback(state['reported'], text)
+
+        def chunks():
+            while True:
+                event = events.get()
+                if event[0] == "progress":
+                    state['transcribed'] = event[1]
+                    report(event[2])
+                elif event[0] == "chunk":
+                    state['consumed'] = state['transcribed']
+                    yield event[1]
+                    # Asked for the next chunk, so the previous one is formatted
+                    state['formatted'] = state['consumed']
+                else:
+                    outcome['transcription'] = event[1]
+                    return
+
+        def conversation_progress(progress, text):
+            if text.endswith("▌"):
+                span.mark("first_dialogue")
+            if progress >= 1.0:
+                state['reported'] = 1.0
+                if callable(progress_callback):
+                    progress_callback(1.0, text)
+            else:
+                report(text)
+
+        with telemetry.span("stage.pipeline") as span:
+            # Transcription runs on its own thread, in a copy of this context so
+            # its spans nest under the pipeline's; callbacks are relayed through
+            # the queue so they always run on the caller's thread
+            threading.Thread(target=contextvars.copy_context().run, args=(transcribe,), daemon=True).start()
+            try:
+                conversation = self.conversation_agent.generate_incremental(chunks(), conversation_progress, self.context)
+            except Exception as e:
+                # Let transcription finish so it can still be saved; once "done"
+                # has been read nothing more is queued, so draining would block
+                if 'transcription' not in outcome:
+                    for _ in chunks():
+                        pass
+                span.set(error=type(e).__name__)
+                return outcome.get('transcription'), f"Error: {str(e)}"
+
+        transcription = outcome.get('transcription')
+        if not transcription or transcription.startswith("Error"):
+            return transcription, None
+        return transcription, conversation
+
+    def process_summary(self, text, progress_callback):
+        """Coordinate medical summary generation using the summary agent"""
+        if callable(progress_callback):
+            progress_callback(0.2, "Generating medical summary...")
+        with telemetry.span("stage.summary"):
+            summary = self.summary_agent.generate_summary(text, progress_callback, self.context)
+        if not summary.startswith("Error"):
+            self.context['summary'] = summary
+            # Which text, prompt and model the summary came from, for saving it
+            self.context['summary_key'] = summary_cache_key(text, self.summary_agent.model)
+        if callable(progress_callback):
+            progress_callback(1.0, "Medical summary generated")
+        return summary
+
+    def process_combined(self, transcription_text, conversation_callback, summary_callback):
+        """Generate the conversation and the medical summary with one request
+
+        The transcript is sent once and the streamed reply is split into
+        both artifacts. Transcripts too long for a single request, and
+        replies missing the summary section, fall back to the separate
+        stages. Returns (conversation, summary).
+        """
+        self.context['transcription'] = transcription_text
+        if len(transcription_text) > self.conversation_agent.segment_chars:
+            conversation = self.process_conversation(transcription_text, conversation_callback)
+            if conversation.startswith("Error"):
+                return conversation, None
+            return conversation, self.process_summary(conversation, summary_callback)
+
+        with telemetry.span("stage.combined"):
+            conversation, summary = self.combined_agent.generate(
+                transcription_text, conversation_callback, summary_callback)
+        if conversation.startswith("Error"):
+            return conversation, None
+        self.context['conversation'] = conversation
+        if summary is None:
+            return conversation, self.process_summary(conversation, summary_callback)
+
+        self.context['summary_record'] = summary
+        self.context['summary'] = summary.to_markdown()
+        self.context['summary_key'] = combined_cache_key(transcription_text, self.combined_agent.model)
+        if callable(summary_callback):
+            summary_callback(1.0, "Medical summary generated")
+        return conversation, self.context['summary']
 
     def process_audio(self, input_data, progress_callback):
         """Legacy method - kept for backward compatibility"""
@@ -0,0 +1,297 @@
+import asyncio
+import random
+import threading
+import time
+from itertools import count
+from types import SimpleNamespace
+
+import openai
+
+# Lower numbers are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+# (requests per minute, tokens per minute) for models without an explicit limit
+DEFAULT_LIMIT = (500, 200000)
+
+def is_transient(error):
+    """Whether an API error is worth retrying (rate limits, timeouts, server errors)"""
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+def retry_after(error):
+    """Seconds the server asked us to wait, from Retry-After headers, or None"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+def parse_limits(spec):
+    """Parse "model=rpm:tpm,model=rpm:tpm" into {model: (rpm, tpm)}"""
+    limits = {}
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        model, _, values = item.partition("=")
+        rpm, _, tpm = values.partition(":")
+        limits[model.strip()] = (int(rpm), int(tpm))
+    return limits
+
+def estimate_tokens(kwargs):
+    """Rough token cost of a chat request: prompt plus expected completion"""
+    chars = 0
+    for message in kwargs.get("messages", ()):
+        content = message.get("content") or ""
+        if isinstance(content, str):
+            chars += len(content)
+        else:
+            chars += sum(len(part.get("text", "")) for part in content)
+    prompt_tokens = chars // 4 + 1
+    # Reformatting prompts produce roughly as much text as they receive
+    completion_tokens = kwargs.get("max_completion_tokens") or kwargs.get("max_tokens") or prompt_tokens
+    return prompt_tokens + completion_tokens
+
+class _Bucket:
+    """Token bucket refilled continuously at `per_minute` units per minute"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` units are available"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+    def give(self, amount):
+        self.level = min(self.capacity, self.level + amount)
+
+class RateLimitScheduler:
+    """Admit API requests within per-model request and token budgets
+
+    Requests wait in priority order (then arrival order) until their model
+    has both a request and enough tokens left in the current minute. A 429
+    from the server pauses the whole model for its Retry-After period, so
+    every caller backs off together instead of failing in bursts.
+    """
+
+    def __init__(self, limits=None, default_limit=DEFAULT_LIMIT):
+        self.limits = dict(limits or {})
+        self.default_limit = default_limit
+        self.rate_limited = 0
+        self._budgets = {}  # model -> (request bucket, token bucket)
+        self._paused_until = {}  # model -> monotonic time
+        self._waiting = []  # (priority, sequence, model) of blocked requests
+        self._sequence = count()
+        self._condition = threading.Condition()
+        # Longest an async waiter sleeps before checking its turn again
+        self.poll_interval = 0.05
+
+    def _budget(self, model):
+        if model not in self._budgets:
+            rpm, tpm = self.limits.get(model, self.default_limit)
+            self._budgets[model] = (_Bucket(rpm), _Bucket(tpm))
+        return self._budgets[model]
+
+    def _wait_time(self, entry, tokens):
+        """Seconds until entry may run, or None while an earlier request is ahead (lock held)"""
+        model = entry[2]
+        if any(other < entry for other in self._waiting if other[2] == model):
+            return None
+        now = time.monotonic()
+        requests, token_budget = self._budget(model)
+        return max(
+            self._paused_until.get(model, 0) - now,
+            requests.wait_time(1, now),
+            token_budget.wait_time(tokens, now)
+        )
+
+    def acquire(self, model, tokens=0, priority=PRIORITY_INTERACTIVE):
+        """Block until the model has budget for one request of `tokens` tokens"""
+        entry = (priority, next(self._sequence), model)
+        with self._condition:
+            self._waiting.append(entry)
+            try:
+                while True:
+                    wait = self._wait_time(entry, tokens)
+                    if wait is not None and wait <= 0:
+                        break
+                    self._condition.wait(timeout=wait)
+                requests, token_budget = self._budget(model)
+                requests.take(1)
+                token_budget.take(tokens)
+            finally:
+                self._waiting.remove(entry)
+                self._condition.notify_all()
+
+    async def acquire_async(self, model, tokens=0, priority=PRIORITY_INTERACTIVE):
+        """acquire() for coroutines: waits without blocking the event loop's thread
+
+        Shares the queue and budgets with threaded callers. A waiting
+        coroutine re-checks its turn at least every poll_interval seconds,
+        since it can't be woken by the condition variable.
+        """
+        entry = (priority, next(self._sequence), model)
+        with self._condition:
+            self._waiting.append(entry)
+        try:
+            while True:
+                with self._condition:
+                    wait = self._wait_time(entry, tokens)
+                    if wait is not None and wait <= 0:
+                        requests, token_budget = self._budget(model)
+                        requests.take(1)
+                        token_budget.take(tokens)
+                        return
+                await asyncio.sleep(self.poll_interval if wait is None else min(wait, self.poll_interval))
+        finally:
+            with self._condition:
+                self._waiting.remove(entry)
+                self._condition.notify_all()
+
+    def settle(self, model, estimated, actual):
+        """Correct the token budget once a response reports its real usage"""
+        with self._condition:
+            token_budget = self._budget(model)[1]
+            if actual < estimated:
+                token_budget.give(estimated - actual)
+            else:
+                token_budget.take(actual - estimated)
+            self._condition.notify_all()
+
+    def pause(self, model, seconds):
+        """Hold all requests for a model, e.g. for a 429's Retry-After"""
+        with self._condition:
+            self.rate_limited += 1
+            until = time.monotonic() + seconds
+            self._paused_until[model] = max(self._paused_until.get(model, 0), until)
+            self._condition.notify_all()
+
+    def queue_depth(self, priority=None):
+        """Number of requests waiting for budget, optionally of one priority"""
+        with self._condition:
+            return sum(1 for entry in self._waiting if priority is None or entry[0] == priority)
+
+    def client(self, client, priority=PRIORITY_INTERACTIVE):
+        """Wrap an OpenAI (or AsyncOpenAI) client so its requests go through this scheduler"""
+        if isinstance(client, openai.AsyncOpenAI):
+            return AsyncScheduledClient(client, self, priority)
+        return ScheduledClient(client, self, priority)
+
+class _Endpoint:
+    """Scheduled stand-in for one `create` endpoint of the OpenAI client"""
+
+    def __init__(self, scheduled, create, estimate):
+        self._scheduled = scheduled
+        self._create = create
+        self._estimate = estimate
+
+    def create(self, **kwargs):
+        return self._scheduled._call(self._create, kwargs, self._estimate(kwargs))
+
+class ScheduledClient:
+    """OpenAI client view whose chat and transcription calls are rate-limit scheduled
+
+    Agents use it exactly like the OpenAI client. 429s, connection errors
+    and server errors are retried here (honouring Retry-After), so the
+    underlying client's own retries are turned off.
+    """
+
+    def __init__(self, client, scheduler, priority=PRIORITY_INTERACTIVE, max_retries=4):
+        self._client = client.with_options(max_retries=0)
+        self._raw_client = client
+        self.scheduler = scheduler
+        self.priority = priority
+        self.max_retries = max_retries
+        self.chat = SimpleNamespace(completions=_Endpoint(
+            self, self._client.chat.completions.create, estimate_tokens))
+        # Audio requests are limited by request count; tokens aren't known up front
+        self.audio = SimpleNamespace(transcriptions=_Endpoint(
+            self, self._client.audio.transcriptions.create, lambda kwargs: 0))
+
+    def with_priority(self, priority):
+        """Another view of the same client and scheduler at a different priority"""
+        return type(self)(self._raw_client, self.scheduler, priority, self.max_retries)
+
+    def _call(self, create, kwargs, tokens):
+        model = kwargs.get("model", "")
+        for attempt in range(self.max_retries + 1):
+            self.scheduler.acquire(model, tokens, self.priority)
+            try:
+                response = create(**kwargs)
+            except Exception as e:
+                self._refund(model, tokens)
+                delay = self._backoff(e, attempt, model)
+                if delay:
+                    time.sleep(delay)
+                continue
+            self._settle(response, model, tokens)
+            return response
+
+    def _backoff(self, error, attempt, model):
+        """Re-raise errors not worth retrying; otherwise return how long this caller should sleep"""
+        if attempt == self.max_retries or not is_transient(error):
+            raise error
+        delay = retry_after(error)
+        if delay is None:
+            delay = random.uniform(0, min(30.0, 2 ** attempt))
+        if isinstance(error, openai.RateLimitError):
+            # Everyone using this model backs off, not just this caller
+            self.scheduler.pause(model, delay)
+            return 0
+        return delay
+
+    def _refund(self, model, tokens):
+        """Return the estimate taken for a request that failed, so retries don't pay twice"""
+        if tokens:
+            self.scheduler.settle(model, tokens, 0)
+
+    def _settle(self, response, model, tokens):
+        usage = getattr(response, "usage", None)
+        if tokens and usage is not None and getattr(usage, "total_tokens", None):
+            self.scheduler.settle(model, tokens, usage.total_tokens)
+
+    def __getattr__(self, name):
+        # Everything else (files, models, ...) goes straight to the client
+        return getattr(self._client, name)
+
+class AsyncScheduledClient(ScheduledClient):
+    """ScheduledClient for AsyncOpenAI: `create` calls are awaited
+
+    Waiting for budget and backing off happen with asyncio.sleep, so
+    hundreds of requests can queue on one event loop thread.
+    """
+
+    async def _call(self, create, kwargs, tokens):
+        model = kwargs.get("model", "")
+        for attempt in range(self.max_retries + 1):
+            await self.scheduler.acquire_async(model, tokens, self.priority)
+            try:
+                response = await create(**kwargs)
+            except Exception as e:
+                self._refund(model, tokens)
+                delay = self._backoff(e, attempt, model)
+                if delay:
+                    await asyncio.sleep(delay)
+                continue
+            self._settle(response, model, tokens)
+            return response
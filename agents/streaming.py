@@ -0,0 +1,71 @@
+import time
+
+from .telemetry import NOOP_SPAN
+
+class StreamBuffer:
+    """Collect streamed tokens and hand the text to a callback at a bounded rate
+
+    Tokens are appended to a list and only joined when a flush is due: at
+    most once per interval seconds, or sooner once max_chars new characters
+    have arrived. The stream loop never sleeps or re-renders per token.
+    """
+
+    def __init__(self, on_flush=None, interval=0.1, max_chars=2000, span=NOOP_SPAN):
+        self.on_flush = on_flush
+        # Telemetry span that receives first-token time, token and flush counts
+        self.span = span
+        self.interval = interval
+        self.max_chars = max_chars
+        self._text = ""
+        self._pending = []
+        self._pending_chars = 0
+        self._last_flush = time.monotonic()
+
+    def write(self, token):
+        """Add a token; flushes if the frame interval or size threshold is reached"""
+        if not token:
+            return
+        self.span.mark("first_token")
+        self.span.add(tokens=1)
+        self._pending.append(token)
+        self._pending_chars += len(token)
+        if (self._pending_chars >= self.max_chars
+                or time.monotonic() - self._last_flush >= self.interval):
+            self.flush()
+
+    def flush(self):
+        """Hand everything received so far to the callback"""
+        if self._pending:
+            self._text += "".join(self._pending)
+            self._pending.clear()
+            self._pending_chars = 0
+        self._last_flush = time.monotonic()
+        if self.on_flush:
+            started = time.perf_counter()
+            self.on_flush(self._text)
+            # Time spent re-rendering the UI, as opposed to waiting on the API
+            self.span.add(flushes=1, render_seconds=time.perf_counter() - started)
+
+    def getvalue(self):
+        """Full text received so far, including tokens not yet flushed"""
+        if self._pending:
+            self._text += "".join(self._pending)
+            self._pending.clear()
+            self._pending_chars = 0
+        return self._text
+
+def stream_text(stream, on_flush=None, interval=0.1, span=NOOP_SPAN):
+    """Consume a chat completion stream through a StreamBuffer and return the text"""
+    buffer = StreamBuffer(on_flush, interval=interval, span=span)
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            buffer.write(chunk.choices[0].delta.content)
+    return buffer.getvalue()
+
+async def astream_text(stream, on_flush=None, interval=0.1, span=NOOP_SPAN):
+    """stream_text for an async chat completion stream (AsyncOpenAI)"""
+    buffer = StreamBuffer(on_flush, interval=interval, span=span)
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            buffer.write(chunk.choices[0].delta.content)
+    return buffer.getvalue()
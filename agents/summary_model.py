@@ -0,0 +1,204 @@
+from .json_stream import JsonFieldParser
+
+def _text(value):
+    """A single JSON value as stripped text, or None when empty"""
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    value = str(value).strip()
+    return value or None
+
+def _texts(value):
+    """A JSON value as a list of non-empty strings"""
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        value = [value]
+    return [text for text in map(_text, value) if text]
+
+# Field names whose plain capitalized form reads badly
+LABELS = {
+    'follow_up': "Follow-up",
+    'route': "Route of administration"
+}
+
+def _label(name):
+    return LABELS.get(name, name.replace('_', ' ').capitalize())
+
+class Record:
+    """Small typed record built from a JSON object
+
+    Subclasses list their fields in __slots__ (so instances carry no
+    per-object dict) and the list-valued ones in LISTS; every other field
+    is text or None.
+    """
+
+    __slots__ = ()
+    LISTS = ()
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values.get(name, [] if name in self.LISTS else None))
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build from parsed JSON, ignoring unknown keys and coercing types"""
+        if not isinstance(data, dict):
+            data = {}
+        return cls(**{
+            name: _texts(data.get(name)) if name in cls.LISTS else _text(data.get(name))
+            for name in cls.__slots__
+        })
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def markdown_lines(self):
+        """Bullet lines for the fields that have a value"""
+        lines = []
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if not value:
+                continue
+            if name in self.LISTS:
+                lines.append(f"- {_label(name)}:")
+                lines.extend(f"  - {item}" for item in value)
+            else:
+                lines.append(f"- {_label(name)}: {value}")
+        return lines
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+class Medication(Record):
+    __slots__ = ("name", "dosage", "frequency", "duration", "route")
+
+    def markdown_lines(self):
+        lines = [f"- **{self.name or 'Unnamed medication'}**"]
+        lines.extend(f"  - {_label(name)}: {getattr(self, name)}"
+                     for name in self.__slots__[1:] if getattr(self, name))
+        return lines
+
+class TreatmentPlan(Record):
+    __slots__ = ("treatments", "schedule", "duration", "special_instructions")
+    LISTS = ("treatments", "special_instructions")
+
+class SideEffects(Record):
+    __slots__ = ("reported", "potential", "warnings")
+    LISTS = __slots__
+
+class Effectiveness(Record):
+    __slots__ = ("reported", "expected_outcomes", "follow_up")
+    LISTS = __slots__
+
+class ImportantNotes(Record):
+    __slots__ = ("warnings", "contraindications", "drug_interactions", "lifestyle_modifications")
+    LISTS = __slots__
+
+# Summary section -> (record type, heading); medications is a list of records
+SECTIONS = {
+    'medications': (Medication, "Medications"),
+    'treatment_plan': (TreatmentPlan, "Treatment Plan"),
+    'side_effects': (SideEffects, "Side Effects"),
+    'effectiveness': (Effectiveness, "Effectiveness"),
+    'notes': (ImportantNotes, "Important Notes")
+}
+
+class MedicalSummary:
+    """Typed medical summary: medications, treatment plan, side effects, effectiveness, notes
+
+    A section is None until it has been parsed, which lets a summary being
+    streamed be rendered with just the sections received so far.
+    """
+
+    __slots__ = tuple(SECTIONS)
+
+    def __init__(self, **sections):
+        for name in self.__slots__:
+            setattr(self, name, sections.get(name))
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls()
+        for name, value in (data or {}).items():
+            summary.set_section(name, value)
+        return summary.complete()
+
+    def set_section(self, name, value):
+        """Fill one section from its parsed JSON value; unknown sections are ignored"""
+        if name not in SECTIONS:
+            return
+        record_type = SECTIONS[name][0]
+        if name == 'medications':
+            items = value if isinstance(value, list) else []
+            value = [record_type.from_dict(item) for item in items if isinstance(item, dict)]
+        else:
+            value = record_type.from_dict(value)
+        setattr(self, name, value)
+
+    def add_item(self, name, value):
+        """Add one streamed element of a list section"""
+        if name == 'medications' and isinstance(value, dict):
+            if self.medications is None:
+                self.medications = []
+            self.medications.append(Medication.from_dict(value))
+
+    def complete(self):
+        """Mark sections that never arrived as empty (not discussed) and return self"""
+        for name, (record_type, _) in SECTIONS.items():
+            if getattr(self, name) is None:
+                setattr(self, name, [] if name == 'medications' else record_type())
+        return self
+
+    def to_dict(self):
+        return {
+            'medications': [item.to_dict() for item in self.medications or []],
+            **{name: getattr(self, name).to_dict() if getattr(self, name) is not None else None
+               for name in self.__slots__[1:]}
+        }
+
+    def to_markdown(self):
+        """Render as Markdown, one heading per section received so far"""
+        blocks = []
+        for name, (_, heading) in SECTIONS.items():
+            value = getattr(self, name)
+            if value is None:
+                continue
+            if name == 'medications':
+                lines = [line for item in value for line in item.markdown_lines()]
+            else:
+                lines = value.markdown_lines()
+            blocks.append("\n".join([f"### {heading}", ""] + (lines or ["Not discussed"])))
+        return "\n\n".join(blocks)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"MedicalSummary({self.to_dict()!r})"
+
+class SummaryStream:
+    """Fill a MedicalSummary from a streamed JSON reply, section by section"""
+
+    def __init__(self):
+        self.summary = MedicalSummary()
+        self.consumed = 0  # Characters of the reply seen so far
+        self._parser = JsonFieldParser(on_field=self.summary.set_section, on_item=self.summary.add_item)
+
+    def feed(self, text):
+        self.consumed += len(text)
+        self._parser.feed(text)
+
+    def update(self, streamed):
+        """Feed the unseen tail of the full reply and return the summary so far"""
+        self.feed(streamed[self.consumed:])
+        return self.summary
+
+    def result(self):
+        """The finished summary; raises ValueError if the JSON object never closed"""
+        if not self._parser.done:
+            raise ValueError("The summary reply was not a complete JSON object")
+        return self.summary.complete()
@@ -0,0 +1,206 @@
+import contextvars
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the span duration histogram buckets
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, float("inf"))
+
+# Span attributes that are meaningful to add up across spans, exported as
+# medical_span_<name>_total counters; others (chunk index, first-token
+# latency, ...) only appear in the span log
+COUNTED_ATTRIBUTES = (
+    "bytes", "input_bytes", "upload_bytes", "input_chars", "output_chars",
+    "tokens", "total_tokens", "attempts", "chunks", "flushes",
+    "audio_seconds", "silence_removed_seconds", "decode_seconds", "encode_seconds"
+)
+
+class _NoopSpan:
+    """Span returned while telemetry is off; every method does nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+    def add(self, **amounts):
+        pass
+
+    def mark(self, name):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+class Span:
+    """One timed operation with attributes (bytes, tokens, chunk index, ...)"""
+
+    def __init__(self, telemetry, name, attributes):
+        self.telemetry = telemetry
+        self.name = name
+        self.attributes = attributes
+        self.id = next(telemetry._ids)
+        self.parent_id = None
+
+    def __enter__(self):
+        stack = self.telemetry._spans.get()
+        self.parent_id = stack[-1].id if stack else None
+        self.telemetry._spans.set(stack + (self,))
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._start
+        if exc_type is not None:
+            self.attributes['error'] = exc_type.__name__
+        stack = self.telemetry._spans.get()
+        if stack and stack[-1] is self:
+            self.telemetry._spans.set(stack[:-1])
+        self.telemetry._record(self)
+        return False
+
+    def set(self, **attributes):
+        """Set attributes on the span"""
+        self.attributes.update(attributes)
+
+    def add(self, **amounts):
+        """Add to numeric attributes (e.g. tokens=1)"""
+        for key, amount in amounts.items():
+            self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def mark(self, name):
+        """Record the time since the span started, once (e.g. first_token)"""
+        key = f"{name}_seconds"
+        if key not in self.attributes:
+            self.attributes[key] = time.perf_counter() - self._start
+
+class Telemetry:
+    """Structured spans for the processing pipeline, exported as JSON lines and/or metrics
+
+    Disabled by default: span() then returns a shared no-op object, so
+    instrumented code pays one attribute check per span.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.log_file = None
+        self.collect_metrics = False
+        self._lock = threading.Lock()
+        # Open spans, per thread and per asyncio task
+        self._spans = contextvars.ContextVar("telemetry_spans", default=())
+        self._ids = itertools.count(1)
+        self._metrics = {}  # span name -> {count, seconds, buckets, totals}
+
+    def configure(self, log_path=None, metrics=False):
+        """Turn telemetry on: JSON lines to log_path ("-" for stderr) and/or in-memory metrics"""
+        if log_path == "-":
+            self.log_file = sys.stderr
+        elif log_path:
+            self.log_file = open(log_path, "a", encoding="utf-8")
+        self.collect_metrics = metrics
+        self.enabled = bool(self.log_file or metrics)
+
+    def span(self, name, **attributes):
+        """Context manager timing one operation; cheap no-op when disabled"""
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def _record(self, span):
+        with self._lock:
+            if self.collect_metrics:
+                self._aggregate(span)
+            if self.log_file is not None:
+                self.log_file.write(json.dumps({
+                    'span': span.name,
+                    'id': span.id,
+                    'parent': span.parent_id,
+                    'start': round(span.started_at, 6),
+                    'seconds': round(span.duration, 6),
+                    **span.attributes
+                }, default=str) + "\n")
+                self.log_file.flush()
+
+    def _aggregate(self, span):
+        """Update counters and the duration histogram (lock must be held)"""
+        metric = self._metrics.setdefault(span.name, {
+            'count': 0, 'seconds': 0.0, 'errors': 0,
+            'buckets': [0] * len(DURATION_BUCKETS), 'totals': {}
+        })
+        metric['count'] += 1
+        metric['seconds'] += span.duration
+        if 'error' in span.attributes:
+            metric['errors'] += 1
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if span.duration <= bound:
+                metric['buckets'][i] += 1
+        for key in COUNTED_ATTRIBUTES:
+            value = span.attributes.get(key)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                metric['totals'][key] = metric['totals'].get(key, 0) + value
+
+    def render_prometheus(self):
+        """Metrics in the Prometheus text exposition format"""
+        # Each metric family is one group of lines, headed by its TYPE
+        lines = ["# TYPE medical_span_seconds histogram"]
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+            for name, metric in metrics:
+                label = f'span="{name}"'
+                for bound, count in zip(DURATION_BUCKETS, metric['buckets']):
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f'medical_span_seconds_bucket{{{label},le="{le}"}} {count}')
+                lines.append(f"medical_span_seconds_sum{{{label}}} {metric['seconds']:.6f}")
+                lines.append(f"medical_span_seconds_count{{{label}}} {metric['count']}")
+
+            lines.append("# TYPE medical_span_errors_total counter")
+            for name, metric in metrics:
+                lines.append(f'medical_span_errors_total{{span="{name}"}} {metric["errors"]}')
+
+            for key in COUNTED_ATTRIBUTES:
+                totals = [(name, metric['totals'][key]) for name, metric in metrics if key in metric['totals']]
+                if totals:
+                    lines.append(f"# TYPE medical_span_{key}_total counter")
+                    lines.extend(f'medical_span_{key}_total{{span="{name}"}} {total:g}' for name, total in totals)
+        return "\n".join(lines) + "\n"
+
+    def serve_metrics(self, port):
+        """Expose /metrics over HTTP on a background thread and return the server"""
+        telemetry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = telemetry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+        return server
+
+# Process-wide instance used by the agents; off until configure() is called
+telemetry = Telemetry()
+
+def configure_from_env():
+    """Enable telemetry from TELEMETRY_LOG (JSON lines path or "-") and METRICS_PORT"""
+    port = os.getenv("METRICS_PORT")
+    telemetry.configure(log_path=os.getenv("TELEMETRY_LOG"), metrics=bool(port))
+    return telemetry.serve_metrics(int(port)) if port else None
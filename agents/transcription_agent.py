@@ -1,98 +1,438 @@
-import tempfile
+import asyncio
+import contextvars
 import io
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import count
 from pydub import AudioSegment
-import os
+from .audio_stream import EncoderUnavailable, stream_pcm, estimate_chunk_count, wav_upload, audio_upload
+from .audio_preprocess import segment_blocks
+from .chunking import SilenceChunker
+from .scheduler import ScheduledClient, is_transient
+from .telemetry import telemetry, NOOP_SPAN
+
+# Upload format per transcription model (see audio_stream.UPLOAD_FORMATS). These
+# models accept FLAC, which is lossless (so transcripts can't change) at about
+# half the size of WAV; unknown models get WAV. Lossy "ogg" (about a tenth of
+# WAV) is opt-in through TRANSCRIPTION_UPLOAD_FORMAT, as its effect on
+# accuracy for clinical speech hasn't been measured.
+UPLOAD_FORMAT_BY_MODEL = {
+    "gpt-4o-mini-transcribe": "flac",
+    "gpt-4o-transcribe": "flac",
+    "whisper-1": "flac"
+}
+
+class ChunkError(Exception):
+    """Raised when a single audio chunk fails to transcribe"""
 
 class TranscriptionAgent:
-    def __init__(self, client):
+    def __init__(self, client, max_workers=4, cache=None, checkpoints=None, backend=None, upload_format=None):
         self.client = client
+        # Optional local backend (e.g. LocalWhisperBackend) used instead of the API
+        self.backend = backend
+        # Optional TranscriptionCache shared between agents
+        self.cache = cache
+        # Optional TranscriptionCheckpoints so failed recordings resume where they stopped
+        self.checkpoints = checkpoints
+        self.model = backend.model_name if backend is not None else "gpt-4o-mini-transcribe"
+        # Number of chunks uploaded in parallel (1 = sequential)
+        self.max_workers = max(1, max_workers)
+        self.chunk_seconds = 5 * 60  # Target chunk length, cut at the nearest pause
+        self.decode_seconds = 10  # Size of each block read from the decoder
+        self.strip_silence = True
+        # Encoding used for uploads
+        self.upload_format = upload_format or UPLOAD_FORMAT_BY_MODEL.get(self.model, "wav")
+        # Transient API errors are retried with exponential backoff, unless a
+        # ScheduledClient already retries them (the attempts would multiply)
+        self.max_retries = 0 if isinstance(client, ScheduledClient) else 4
+        if self.max_retries and hasattr(client, "with_options"):
+            # Likewise the SDK's own retries, which would run inside each of ours
+            self.client = client.with_options(max_retries=0)
+        self.retry_base_delay = 1.0
+        self.retry_max_delay = 30.0
 
-    def split_audio(self, audio_segment):
-        """Split audio into 5-minute chunks"""
-        chunk_length_ms = 5 * 60 * 1000  # 5 minutes in milliseconds
-        chunks = []
-        duration_ms = len(audio_segment)
-        
-        # Split into 5-minute chunks
-        for i in range(0, duration_ms, chunk_length_ms):
-            chunk = audio_segment[i:i + chunk_length_ms]
-            # Convert to mono and set sample rate to reduce file size
-            chunk = chunk.set_channels(1).set_frame_rate(16000)
-            chunks.append(chunk)
-        
-        return chunks
-
-    def transcribe(self, audio_bytes, progress_callback, context=None):
-        """Process audio file and return transcription"""
-        try:
-            if not audio_bytes:
-                return "Error: No audio data received"
-            
-            progress_callback(0.1, "Converting audio...")
+    def transcribe_chunk(self, pcm, index=0):
+        """Transcribe a single chunk of 16 kHz mono PCM audio"""
+        with telemetry.span("transcription.chunk", index=index, bytes=len(pcm), model=self.model) as span:
+            # Only pay for chunks we haven't transcribed before
+            cache_key, transcription = self._cache_get(pcm, span)
+            if transcription is None:
+                if self.backend is not None:
+                    transcription = self.backend.transcribe(pcm)
+                else:
+                    upload = self._encode(pcm, index, span)
+                    transcription = self._retrying(lambda: self._upload(upload), span)
+                self._cache_put(cache_key, transcription)
+            return transcription
+
+    async def atranscribe_chunk(self, pcm, index=0):
+        """transcribe_chunk for AsyncOpenAI; cache, encoder and local models run on worker threads"""
+        with telemetry.span("transcription.chunk", index=index, bytes=len(pcm), model=self.model) as span:
+            cache_key, transcription = await asyncio.to_thread(self._cache_get, pcm, span)
+            if transcription is None:
+                if self.backend is not None:
+                    transcription = await asyncio.to_thread(self.backend.transcribe, pcm)
+                else:
+                    upload = await asyncio.to_thread(self._encode, pcm, index, span)
+                    transcription = await self._aretrying(lambda: self._upload(upload), span)
+                await asyncio.to_thread(self._cache_put, cache_key, transcription)
+            return transcription
+
+    def _cache_get(self, pcm, span):
+        """Return (cache key, cached text); both None without a cache"""
+        if self.cache is None:
+            return None, None
+        cache_key = self.cache.make_key(pcm, self.model)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            span.set(cached=True)
+        return cache_key, cached
+
+    def _cache_put(self, cache_key, transcription):
+        if self.cache is not None:
+            self.cache.put(cache_key, transcription)
+
+    def _encode(self, pcm, index, span):
+        """Encode a chunk for upload, returning (name, payload, content type)"""
+        started = time.perf_counter()
+        name, upload, content_type = self.encode_chunk(pcm, index)
+        payload = upload.getvalue()
+        span.set(upload_format=content_type, upload_bytes=len(payload),
+                 encode_seconds=time.perf_counter() - started)
+        return name, payload, content_type
+
+    def _upload(self, upload):
+        """Send one encoded chunk; returns a coroutine when the client is async"""
+        name, payload, content_type = upload
+        # Upload straight from memory with a filename and content type attached
+        return self.client.audio.transcriptions.create(
+            model=self.model,
+            file=(name, io.BytesIO(payload), content_type),
+            response_format="text"
+        )
+
+    def _retrying(self, call, span):
+        """Return call(), retrying transient errors with backoff"""
+        for attempt in range(self.max_retries + 1):
+            span.set(attempts=attempt + 1)
+            try:
+                return call()
+            except Exception as e:
+                time.sleep(self._retry_delay(e, attempt))
+
+    async def _aretrying(self, call, span):
+        """_retrying for calls returning a coroutine"""
+        for attempt in range(self.max_retries + 1):
+            span.set(attempts=attempt + 1)
             try:
-                # Load and verify audio
-                audio = AudioSegment.from_file(io.BytesIO(audio_bytes))
-                if len(audio) == 0:
-                    return "Error: Audio file appears to be empty"
-                
-                # Convert to mono and set sample rate
-                audio = audio.set_frame_rate(16000).set_channels(1)
-                
-                # Split into chunks
-                chunks = self.split_audio(audio)
-                total_chunks = len(chunks)
-                
-                # Process each chunk
-                full_transcription = []
-                
-                for i, chunk in enumerate(chunks):
-                    # Convert chunk to WAV
-                    wav_io = io.BytesIO()
-                    chunk.export(wav_io, format="wav")
-                    wav_io.seek(0)
-                    
-                    # Save to temporary file
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
-                        temp_file.write(wav_io.getvalue())
-                        temp_file_path = temp_file.name
-
-                    try:
-                        # Transcribe chunk
-                        with open(temp_file_path, "rb") as audio_file:
-                            transcription = self.client.audio.transcriptions.create(
-                                model="gpt-4o-mini-transcribe",
-                                file=audio_file,
-                                response_format="text"
-                            )
-                            full_transcription.append(transcription)
-                    except Exception as chunk_error:
-                        return f"Error processing chunk {i+1}: {str(chunk_error)}"
-                    finally:
-                        # Clean up temporary file
-                        if os.path.exists(temp_file_path):
-                            os.remove(temp_file_path)
-                    
-                    # Update progress
-                    chunk_progress = 0.1 + (0.8 * (i + 1) / total_chunks)
-                    progress_callback(chunk_progress, f"Transcribing audio... ({i+1}/{total_chunks})")
-                
-                if not full_transcription:
-                    return "Error: No chunks were successfully transcribed"
-                    
-                # Combine all transcriptions
-                final_transcription = " ".join(full_transcription)
-                progress_callback(1.0, "Transcription complete")
-                
-                # Store the final transcription in context
-                if context is not None:
-                    context['transcription'] = final_transcription
-                    
-                return final_transcription
-                
+                return await call()
             except Exception as e:
-                return f"Error during audio conversion: {str(e)}"
-                
-        except Exception as e:
-            return f"Error in transcription process: {str(e)}"
+                await asyncio.sleep(self._retry_delay(e, attempt))
+
+    def _retry_delay(self, error, attempt):
+        """Re-raise errors not worth retrying; otherwise return a backoff delay"""
+        if attempt == self.max_retries or not is_transient(error):
+            raise error
+        # Full jitter keeps parallel chunks from retrying in lockstep
+        delay = min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt)
+        return random.uniform(0, delay)
+
+    def iter_blocks(self, audio_bytes):
+        """Yield decoded 16 kHz mono PCM blocks, streaming through ffmpeg when possible"""
+        windows = stream_pcm(audio_bytes, self.decode_seconds)
+        started = False
+        try:
+            for block in windows:
+                started = True
+                yield block
+        except RuntimeError:
+            if started:
+                raise
+        finally:
+            # Stop the decoder if the consumer bailed out early
+            windows.close()
+        if started:
+            return
+
+        # Some containers (e.g. MP4 with the index at the end) can't be decoded
+        # from a pipe; fall back to pydub with a vectorized downmix/resample
+        audio = AudioSegment.from_file(io.BytesIO(audio_bytes))
+        yield from segment_blocks(audio, self.decode_seconds)
+
+    def iter_chunks(self, audio_bytes, chunker, span=NOOP_SPAN):
+        """Decode the audio and yield silence-aligned chunks ready for upload"""
+        blocks = self.iter_blocks(audio_bytes)
+        started = time.perf_counter()
+        try:
+            for block in blocks:
+                for chunk in chunker.feed(block):
+                    # Time spent decoding and cutting, excluding time the consumer holds us
+                    span.add(decode_seconds=time.perf_counter() - started)
+                    yield chunk
+                    started = time.perf_counter()
+            for chunk in chunker.flush():
+                span.add(decode_seconds=time.perf_counter() - started)
+                yield chunk
+                started = time.perf_counter()
+        finally:
+            blocks.close()
+
+    def encode_chunk(self, pcm, index=0):
+        """Encode a chunk in this agent's upload format, falling back to WAV"""
+        try:
+            return audio_upload(pcm, self.upload_format, name=f"chunk_{index + 1}")
+        except EncoderUnavailable:
+            # This ffmpeg build lacks the encoder; stop trying for later chunks
+            self.upload_format = "wav"
+        except RuntimeError:
+            # A one-off failure (timeout, bad chunk); only this chunk goes as WAV
+            pass
+        return wav_upload(pcm, name=f"chunk_{index + 1}.wav")
+
+    def _transcribe_and_save(self, pcm, index, checkpoint_key):
+        """Transcribe a chunk and checkpoint it from the worker thread
+
+        Saving here rather than when results are collected keeps chunks that
+        finish after another chunk has already failed the run.
+        """
+        text = self.transcribe_chunk(pcm, index)
+        if checkpoint_key is not None:
+            self.checkpoints.save(checkpoint_key, index, text)
+        return text
+
+    async def _atranscribe_and_save(self, pcm, index, checkpoint_key):
+        """_transcribe_and_save for the async path"""
+        text = await self.atranscribe_chunk(pcm, index)
+        if checkpoint_key is not None:
+            await asyncio.to_thread(self.checkpoints.save, checkpoint_key, index, text)
+        return text
+
+    def checkpoint_key(self, audio_bytes):
+        """Checkpoint key for a recording under the current model and chunking settings
+
+        None when the agent has no checkpoints.
+        """
+        if self.checkpoints is None:
+            return None
+        return self.checkpoints.make_key(audio_bytes, self.model, self.chunk_seconds, self.strip_silence)
+
+    def _chunk_results(self, audio_bytes, progress_callback, checkpoint_key):
+        """Ordering and progress state for one run of iter_transcriptions (blocking)"""
+        # Chunk count is only an estimate used for progress reporting
+        total_chunks = estimate_chunk_count(audio_bytes, self.chunk_seconds)
+        saved = self.checkpoints.load(checkpoint_key) if checkpoint_key is not None else {}
+        return _ChunkResults(progress_callback, total_chunks, saved, checkpoint_key is not None)
+
+    def iter_transcriptions(self, audio_bytes, progress_callback, chunker, checkpoint_key=None, span=NOOP_SPAN):
+        """Transcribe chunks in parallel and yield their texts in original order
+
+        Each chunk's text is yielded as soon as it and every chunk before it
+        have finished, so callers can start working before the last chunk.
+        With a checkpoint_key, finished chunks are saved as they complete and
+        chunks saved by an earlier run are not sent again.
+        """
+        # Decode chunk by chunk and transcribe in parallel; at most
+        # max_workers decoded chunks are held in memory at once
+        results = self._chunk_results(audio_bytes, progress_callback, checkpoint_key)
+        chunks = self.iter_chunks(audio_bytes, chunker, span)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            try:
+                for i, pcm in enumerate(chunks):
+                    if not results.resume(i):
+                        if len(results.pending) >= self.max_workers:
+                            results.collect(wait(results.pending, return_when=FIRST_COMPLETED)[0])
+                        # Run in a copy of this context so chunk spans nest under the transcription span
+                        future = executor.submit(contextvars.copy_context().run,
+                                                 self._transcribe_and_save, pcm, i, checkpoint_key)
+                        results.pending[future] = i
+                    results.collect_done()
+                    yield from results.ready()
+
+                while results.pending:
+                    results.collect(wait(results.pending, return_when=FIRST_COMPLETED)[0])
+                    yield from results.ready()
+            finally:
+                # Don't start chunks that are still queued
+                results.cancel()
+                chunks.close()
+
+    async def aiter_transcriptions(self, audio_bytes, progress_callback, chunker, checkpoint_key=None, span=NOOP_SPAN):
+        """iter_transcriptions as an async generator
+
+        Chunks are decoded on a worker thread and uploaded as concurrent
+        tasks, at most max_workers at a time; texts are yielded in order.
+        """
+        results = await asyncio.to_thread(self._chunk_results, audio_bytes, progress_callback, checkpoint_key)
+        chunks = self.iter_chunks(audio_bytes, chunker, span)
+        try:
+            for i in count():
+                # Decoding blocks on ffmpeg, so each chunk is fetched off the event loop
+                pcm = await asyncio.to_thread(next, chunks, None)
+                if pcm is None:
+                    break
+                if not results.resume(i):
+                    if len(results.pending) >= self.max_workers:
+                        results.collect((await asyncio.wait(results.pending, return_when=asyncio.FIRST_COMPLETED))[0])
+                    results.pending[asyncio.ensure_future(self._atranscribe_and_save(pcm, i, checkpoint_key))] = i
+                results.collect_done()
+                for text in results.ready():
+                    yield text
+
+            while results.pending:
+                results.collect((await asyncio.wait(results.pending, return_when=asyncio.FIRST_COMPLETED))[0])
+                for text in results.ready():
+                    yield text
+        finally:
+            # Like the threaded path, let uploads already running finish and checkpoint
+            await asyncio.gather(*results.pending, return_exceptions=True)
+            chunks.close()
+
+    def transcribe(self, audio_bytes, progress_callback, context=None, chunk_callback=None):
+        """Process audio file and return transcription
+
+        chunk_callback, if given, receives each chunk's text in order as soon
+        as it is available.
+        """
+        if not audio_bytes:
+            return "Error: No audio data received"
+        checkpoint_key = self.checkpoint_key(audio_bytes)
+        with _TranscriptionRun(self, audio_bytes, checkpoint_key, progress_callback, context, chunk_callback) as run:
+            for text in self.iter_transcriptions(audio_bytes, run.progress, run.chunker,
+                                                 run.checkpoint_key, run.span):
+                run.add(text)
+            run.finish()
+        return run.result
+
+    async def atranscribe(self, audio_bytes, progress_callback, context=None, chunk_callback=None):
+        """transcribe for AsyncOpenAI clients, without holding a thread per upload"""
+        if not audio_bytes:
+            return "Error: No audio data received"
+        # Hashing a long upload would stall every other coroutine on the loop
+        checkpoint_key = await asyncio.to_thread(self.checkpoint_key, audio_bytes)
+        with _TranscriptionRun(self, audio_bytes, checkpoint_key, progress_callback, context, chunk_callback) as run:
+            async for text in self.aiter_transcriptions(audio_bytes, run.progress, run.chunker,
+                                                        run.checkpoint_key, run.span):
+                run.add(text)
+            await asyncio.to_thread(run.finish)
+        return run.result
+
+class _ChunkResults:
+    """Ordering, progress and failure handling shared by the sync and async chunk loops
+
+    pending maps each in-flight future (or asyncio task) to its chunk index.
+    """
+
+    def __init__(self, progress_callback, total_chunks, saved, resumable):
+        self.progress_callback = progress_callback
+        self.total_chunks = total_chunks
+        self.saved = saved  # Chunks transcribed by an earlier, interrupted run
+        self.resumable = resumable
+        self.pending = {}
+        self._results = {}
+        self._completed = 0
+        self._next_index = 0
+
+    def resume(self, i):
+        """Use chunk i's checkpointed text, if any; True when it needs no upload"""
+        if i not in self.saved:
+            return False
+        self._finished(i, self.saved.pop(i))
+        return True
+
+    def _finished(self, i, text):
+        self._results[i] = text
+        # Update progress as chunks finish
+        self._completed += 1
+        total = max(self.total_chunks or self._completed, self._completed)
+        chunk_progress = min(0.9, 0.1 + (0.8 * self._completed / total))
+        self.progress_callback(chunk_progress, f"Transcribing audio... ({self._completed}/{total})")
+
+    def collect(self, done):
+        """Record finished futures; a failed chunk raises ChunkError"""
+        for future in done:
+            i = self.pending.pop(future)
+            try:
+                text = future.result()
+            except Exception as chunk_error:
+                message = f"Error processing chunk {i+1}: {str(chunk_error)}"
+                if self.resumable:
+                    message += " (finished chunks are saved; run again to resume)"
+                raise ChunkError(message)
+            self._finished(i, text)
+
+    def collect_done(self):
+        self.collect([future for future in self.pending if future.done()])
+
+    def ready(self):
+        """Yield the texts that are now contiguous from the start"""
+        while self._next_index in self._results:
+            yield self._results.pop(self._next_index)
+            self._next_index += 1
+
+    def cancel(self):
+        for future in self.pending:
+            future.cancel()
+
+class _TranscriptionRun:
+    """One transcribe() call: span, chunker, checkpoint and the final result
+
+    Used as a context manager around the chunk loop; failures inside it
+    become the agent's error strings in result instead of propagating.
+    """
+
+    def __init__(self, agent, audio_bytes, checkpoint_key, progress_callback, context, chunk_callback):
+        self.agent = agent
+        self.audio_bytes = audio_bytes
+        self.checkpoint_key = checkpoint_key
+        self.progress = progress_callback if callable(progress_callback) else lambda progress, text: None
+        self.context = context
+        self.chunk_callback = chunk_callback
+        self.texts = []
+        self.result = None
+
+    def __enter__(self):
+        agent = self.agent
+        self.progress(0.1, "Converting audio...")
+        self._span = telemetry.span("transcription", model=agent.model, input_bytes=len(self.audio_bytes))
+        self.span = self._span.__enter__()
+        self.chunker = SilenceChunker(target_seconds=agent.chunk_seconds, strip_silence=agent.strip_silence)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if isinstance(exc, ChunkError):
+            self.result = str(exc)
+        elif isinstance(exc, Exception):
+            self.result = f"Error during audio conversion: {str(exc)}"
+        # The span records the error type; cancellation and interrupts propagate
+        self._span.__exit__(exc_type, exc, tb)
+        return isinstance(exc, Exception)
+
+    def add(self, text):
+        self.texts.append(text)
+        if self.chunk_callback is not None:
+            self.chunk_callback(text)
+
+    def finish(self):
+        """Join the chunk texts, report, and drop the checkpoint"""
+        if not self.texts:
+            self.result = "Error: Audio file appears to be empty"
+            return
+
+        # Combine all transcriptions; the checkpoint is no longer needed
+        final_transcription = " ".join(self.texts)
+        if self.checkpoint_key is not None:
+            self.agent.checkpoints.discard(self.checkpoint_key)
+        report = self.chunker.report()
+        self.span.set(chunks=len(self.texts), audio_seconds=report['input_seconds'],
+                      silence_removed_seconds=report['removed_seconds'])
+        self.progress(1.0, f"Transcription complete ({report['removed_seconds']:.0f}s of silence skipped)")
+
+        # Store the final transcription and chunking report in context
+        if self.context is not None:
+            self.context['transcription'] = final_transcription
+            self.context['chunking_report'] = report
+
+        self.result = final_transcription
 
 # Legacy agent definition can be removed 
\ No newline at end of file
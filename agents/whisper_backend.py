@@ -0,0 +1,106 @@
+import math
+import os
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .audio_stream import SAMPLE_RATE
+
+# Loaded pipelines shared by every backend instance: (model, device) -> (pipeline, lock)
+_PIPELINES = {}
+_PIPELINES_LOCK = threading.Lock()
+
+def cgroup_cpu_quota(root="/sys/fs/cgroup"):
+    """CPUs allowed by the container's cgroup CPU quota, or None if unlimited or unknown
+
+    Reads cgroup v2 (cpu.max), falling back to cgroup v1
+    (cpu.cfs_quota_us / cpu.cfs_period_us).
+    """
+    try:
+        with open(os.path.join(root, "cpu.max")) as f:
+            quota, period = f.read().split()[:2]
+        if quota == "max":
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(os.path.join(root, "cpu", "cpu.cfs_quota_us")) as f:
+            quota = int(f.read())
+        with open(os.path.join(root, "cpu", "cpu.cfs_period_us")) as f:
+            period = int(f.read())
+    except (OSError, ValueError):
+        return None
+    if quota <= 0 or period <= 0:
+        return None
+    return quota / period
+
+def available_cores():
+    """CPU cores this process may use: its affinity, capped at the cgroup CPU quota
+
+    Docker --cpus and Cloud Run limit CPU with a quota that affinity
+    doesn't reflect, so torch would otherwise start a thread per host core.
+    """
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    quota = cgroup_cpu_quota()
+    if quota is not None:
+        cores = min(cores, max(1, math.ceil(quota)))
+    return cores
+
+class LocalWhisperBackend:
+    """Transcribe chunks on this machine with a Whisper model from transformers
+
+    Each chunk is split into Whisper's 30-second windows, which are decoded
+    in batches of batch_size. The model is loaded once per process on first
+    use and shared, and inference is serialized because torch already uses
+    all num_threads cores for a single batch.
+    """
+
+    def __init__(self, model_name="openai/whisper-small", batch_size=8, num_threads=None, device="cpu"):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads or available_cores()
+        self.device = device
+
+    def _pipeline(self):
+        """Return the shared ASR pipeline and its lock, loading the model the first time"""
+        key = (self.model_name, self.device)
+        with _PIPELINES_LOCK:
+            if key not in _PIPELINES:
+                try:
+                    import torch
+                    from transformers import pipeline
+                except ImportError as e:
+                    raise RuntimeError(
+                        "The local transcription backend needs torch and transformers "
+                        f"(pip install -r requirements.txt): {str(e)}"
+                    )
+                torch.set_num_threads(self.num_threads)
+                asr = pipeline(
+                    "automatic-speech-recognition",
+                    model=self.model_name,
+                    device=self.device,
+                    chunk_length_s=30
+                )
+                _PIPELINES[key] = (asr, threading.Lock())
+            return _PIPELINES[key]
+
+    def transcribe(self, pcm):
+        """Transcribe one chunk of 16 kHz mono 16-bit PCM and return its text"""
+        if np is None:
+            raise RuntimeError("The local transcription backend needs numpy")
+        samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+        asr, lock = self._pipeline()
+        with lock:
+            result = asr(
+                {"raw": samples, "sampling_rate": SAMPLE_RATE},
+                batch_size=self.batch_size,
+                generate_kwargs={"task": "transcribe"}
+            )
+        return result["text"].strip()
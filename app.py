@@ -1,5 +1,4 @@
 import streamlit as st
-import tempfile
 import os
 from pydub import AudioSegment
 import io
@@ -7,8 +6,19 @@ import shutil
 from openai import OpenAI
 from dotenv import load_dotenv
 from datetime import datetime
-import glob
 from agents.orchestrator import Orchestrator
+from agents.transcription_cache import TranscriptionCache
+from agents.checkpoints import TranscriptionCheckpoints
+from agents.scheduler import RateLimitScheduler, parse_limits
+from agents.whisper_backend import LocalWhisperBackend
+from agents.telemetry import configure_from_env
+from agents.medical_summary_agent import MedicalSummaryAgent, summary_cache_key
+from agents.combined_agent import summary_source_keys
+from agents.jobs import JobManager
+from agents.library import RecordingLibrary, find_artifacts
+from agents.artifacts import (save_transcription, save_conversation, save_summary, save_summary_record,
+                              load_markdown_file, load_artifact)
+from agents.streaming import stream_text
 
 # Load environment variables from .env file
 load_dotenv()
@@ -27,11 +37,94 @@ if not shutil.which('ffmpeg'):
 # Get API key from environment variable
 api_key = os.getenv("OPENAI_API_KEY")
 
-# Initialize OpenAI client with API key
-client = OpenAI(api_key=api_key)
-
-# Initialize orchestrator with OpenAI client
-orchestrator = Orchestrator(client)
+# Number of audio chunks transcribed in parallel
+transcription_workers = int(os.getenv("TRANSCRIPTION_WORKERS", "4"))
+
+@st.cache_resource
+def start_telemetry():
+    """Span log and /metrics endpoint, once per process (off unless configured)"""
+    return configure_from_env()
+
+@st.cache_resource
+def get_scheduler():
+    """Per-model request/token budgets shared by every API call on this instance"""
+    return RateLimitScheduler(parse_limits(os.getenv("OPENAI_RATE_LIMITS")))
+
+@st.cache_resource
+def get_client():
+    """One OpenAI client (and connection pool) shared by all sessions, rate-limit scheduled"""
+    return get_scheduler().client(OpenAI(api_key=api_key))
+
+@st.cache_resource
+def get_transcription_cache():
+    """Chunk transcripts are cached by audio content so re-uploads are free"""
+    return TranscriptionCache(
+        cache_dir=os.getenv("TRANSCRIPTION_CACHE_DIR", "cache/transcriptions"),
+        max_bytes=int(os.getenv("TRANSCRIPTION_CACHE_MB", "50")) * 1024 * 1024
+    )
+
+@st.cache_resource
+def get_transcription_checkpoints():
+    """Finished chunks of unfinished transcriptions, so failed jobs resume"""
+    return TranscriptionCheckpoints(
+        os.getenv("TRANSCRIPTION_CHECKPOINT_DIR", "cache/checkpoints"),
+        max_age_seconds=float(os.getenv("TRANSCRIPTION_CHECKPOINT_DAYS", "7")) * 24 * 60 * 60
+    )
+
+@st.cache_resource
+def get_transcription_backend():
+    """Local Whisper model when TRANSCRIPTION_BACKEND=local, otherwise None (use the API)"""
+    if os.getenv("TRANSCRIPTION_BACKEND", "openai") != "local":
+        return None
+    threads = os.getenv("WHISPER_THREADS")
+    return LocalWhisperBackend(
+        model_name=os.getenv("WHISPER_MODEL", "openai/whisper-small"),
+        batch_size=int(os.getenv("WHISPER_BATCH_SIZE", "8")),
+        num_threads=int(threads) if threads else None
+    )
+
+def create_orchestrator():
+    """Create an orchestrator sharing the client, transcription cache and checkpoints"""
+    return Orchestrator(
+        get_client(),
+        transcription_workers=transcription_workers,
+        transcription_cache=get_transcription_cache(),
+        context_max_bytes=int(os.getenv("CONTEXT_MAX_MB", "5")) * 1024 * 1024,
+        transcription_checkpoints=get_transcription_checkpoints(),
+        transcription_backend=get_transcription_backend(),
+        transcription_upload_format=os.getenv("TRANSCRIPTION_UPLOAD_FORMAT")
+    )
+
+@st.cache_resource
+def get_library():
+    """Recording index shared by all sessions, synced with the audio folder once"""
+    library = RecordingLibrary(db_path=os.getenv("LIBRARY_DB", "library.db"), audio_dir="audio")
+    library.sync()
+    return library
+
+@st.cache_resource
+def get_job_manager():
+    """Background workers shared by all sessions on this instance"""
+    return JobManager(
+        create_orchestrator,
+        max_workers=int(os.getenv("JOB_WORKERS", "2")),
+        on_stage_complete=save_job_result,
+        pipeline=os.getenv("PIPELINE_CONVERSATION", "1") != "0",
+        combined=os.getenv("COMBINED_GENERATION", "0") == "1"
+    )
+
+def get_session_orchestrator():
+    """Orchestrator owned by the current browser session, freed with it"""
+    if 'orchestrator' not in st.session_state:
+        st.session_state.orchestrator = create_orchestrator()
+    return st.session_state.orchestrator
+
+# Initialize OpenAI client
+start_telemetry()
+client = get_client()
+
+# Number of recordings shown per sidebar page
+RECORDINGS_PER_PAGE = 20
 
 def update_progress(progress_bar, progress, status=""):
     progress_bar.progress(progress, text=status)
@@ -49,84 +142,23 @@ def convert_to_wav(audio_bytes):
         st.error(f"Error converting audio: {str(e)}")
         return None
 
-def split_audio(audio_segment):
-    """Split audio into 5-minute chunks"""
-    chunk_length_ms = 5 * 60 * 1000  # 5 minutes in milliseconds
-    chunks = []
-    duration_ms = len(audio_segment)
-    
-    # Split into 5-minute chunks
-    for i in range(0, duration_ms, chunk_length_ms):
-        chunk = audio_segment[i:i + chunk_length_ms]
-        # Convert to mono and set sample rate to reduce file size
-        chunk = chunk.set_channels(1).set_frame_rate(16000)
-        chunks.append(chunk)
-    
-    return chunks
-
 def transcribe_audio(audio_bytes, progress_bar):
-    try:
-        # Convert input audio to AudioSegment
-        audio = AudioSegment.from_mp3(io.BytesIO(audio_bytes))
-        update_progress(progress_bar, 0.1, "Converting audio...")
-        
-        # Convert to mono and set sample rate to reduce file size
-        audio = audio.set_channels(1).set_frame_rate(16000)
-        
-        # Split into chunks
-        chunks = split_audio(audio)
-        total_chunks = len(chunks)
-        
-        # Process each chunk
-        full_transcription = []
-        
-        for i, chunk in enumerate(chunks):
-            # Convert chunk to WAV
-            wav_io = io.BytesIO()
-            chunk.export(wav_io, format="wav")
-            wav_io.seek(0)
-            
-            # Save to temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
-                temp_file.write(wav_io.getvalue())
-                temp_file_path = temp_file.name
-
-            try:
-                # Transcribe chunk
-                with open(temp_file_path, "rb") as audio_file:
-                    transcription = client.audio.transcriptions.create(
-                        model="whisper-1",
-                        file=audio_file,
-                        response_format="text"
-                    )
-                    full_transcription.append(transcription)
-            except Exception as chunk_error:
-                st.error(f"Error processing chunk {i+1}: {str(chunk_error)}")
-                continue
-            finally:
-                # Clean up temporary file
-                os.remove(temp_file_path)
-            
-            # Update progress (allocate 70% of the progress bar to transcription)
-            progress = 0.1 + (0.7 * (i + 1) / total_chunks)
-            update_progress(progress_bar, progress, f"Transcribing audio... ({i+1}/{total_chunks})")
-        
-        if not full_transcription:
-            st.error("No chunks were successfully transcribed")
-            return None
-            
-        # Combine all transcriptions
-        final_transcription = " ".join(full_transcription)
-        return final_transcription
-        
-    except Exception as e:
-        st.error(f"Error transcribing audio: {str(e)}")
+    # Decode and transcribe chunk by chunk through the transcription agent
+    # (allocate 80% of the progress bar to transcription)
+    result = get_session_orchestrator().transcription_agent.transcribe(
+        audio_bytes,
+        lambda progress, text: update_progress(progress_bar, progress * 0.8, text)
+    )
+    
+    if not result or result.startswith("Error"):
+        st.error(f"Error transcribing audio: {result}")
         return None
+    
+    return result
 
 def convert_to_conversation(text, progress_bar):
     try:
         message_placeholder = st.empty()
-        full_response = ""
         
         update_progress(progress_bar, 0.8, "Generating conversation...")
         
@@ -158,11 +190,8 @@ def convert_to_conversation(text, progress_bar):
             stream=True
         )
         
-        # Process the streaming response
-        for chunk in stream:
-            if chunk.choices[0].delta.content is not None:
-                full_response += chunk.choices[0].delta.content
-                message_placeholder.markdown(full_response + "▌")
+        # Process the streaming response, re-rendering at a fixed frame rate
+        full_response = stream_text(stream, lambda partial: message_placeholder.markdown(partial + "▌"))
         
         # Display final response
         message_placeholder.markdown(full_response)
@@ -173,89 +202,25 @@ def convert_to_conversation(text, progress_bar):
         return None
 
 def extract_medical_info(text, progress_bar):
+    """Stream a typed medical summary into the page and return it (None on error)"""
     try:
         message_placeholder = st.empty()
-        full_response = ""
         
         update_progress(progress_bar, 0.9, "Generating medical summary...")
         
-        # Create streaming response
-        stream = client.chat.completions.create(
-            model="o3-mini",
-            messages=[
-                {"role": "system", "content": """
-                You are a medical documentation specialist. Extract and organize the following information from the conversation in a detailed, structured format:
-
-                1. Medications:
-                   - Name of each medication
-                   - Dosage prescribed
-                   - Frequency of administration
-                   - Duration of treatment
-                   - Route of administration
-
-                2. Treatment Plan:
-                   - Prescribed treatments/procedures
-                   - Treatment schedule
-                   - Treatment duration
-                   - Special instructions
-
-                3. Side Effects:
-                   - Reported side effects
-                   - Potential side effects discussed
-                   - Warnings given
-
-                4. Effectiveness:
-                   - Reported effectiveness of current/previous treatments
-                   - Expected outcomes
-                   - Follow-up requirements
-
-                5. Important Notes:
-                   - Any specific warnings
-                   - Contraindications
-                   - Drug interactions
-                   - Lifestyle modifications
-
-                Format the information clearly with headers and bullet points. If any information is not mentioned in the conversation, indicate 'Not discussed' for that section.
-                Only include information that was explicitly mentioned in the conversation - do not make assumptions or add information not present in the transcript.
-                """},
-                {"role": "user", "content": text}
-            ],
-            stream=True  # Enable streaming
-        )
-        
-        # Process the streaming response without displaying intermediate results
-        for chunk in stream:
-            if chunk.choices[0].delta.content is not None:
-                full_response += chunk.choices[0].delta.content
-        
-        # Format the markdown properly
-        # Ensure headers have space after # and lists have proper spacing
-        formatted_response = ""
-        for line in full_response.split('\n'):
-            # Fix headers (ensure space after #)
-            if line.startswith('#') and not line.startswith('# '):
-                line = line.replace('#', '# ', 1)
-            
-            # Fix nested lists (ensure proper indentation)
-            if line.strip().startswith('-') or line.strip().startswith('*'):
-                if line.strip() != line:  # It's indented
-                    # Make sure indentation is consistent (use 4 spaces)
-                    indent_level = len(line) - len(line.lstrip())
-                    line = ' ' * indent_level + '- ' + line.strip()[1:].strip()
-                else:
-                    line = '- ' + line.strip()[1:].strip()
-            
-            formatted_response += line + '\n'
+        # Sections appear as soon as they are parsed from the streamed JSON
+        summary = MedicalSummaryAgent(client).generate_structured(
+            text, lambda partial: message_placeholder.markdown(partial.to_markdown() + "▌"))
         
-        # Only display the final response once at the end
+        # Display final response
         update_progress(progress_bar, 1.0, "Complete!")
-        message_placeholder.markdown(formatted_response)
-        return formatted_response
+        message_placeholder.markdown(summary.to_markdown())
+        return summary
     except Exception as e:
         st.error(f"Error extracting medical information: {str(e)}")
         return None
 
-def save_uploaded_file(uploaded_file):
+def save_uploaded_file(uploaded_file, timestamp=None):
     """Save uploaded file to audio folder with timestamp"""
     # Create audio directory if it doesn't exist
     audio_dir = "audio"
@@ -266,7 +231,7 @@ def save_uploaded_file(uploaded_file):
     file_extension = os.path.splitext(uploaded_file.name)[1]
     
     # Create filename with timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
     original_filename = os.path.splitext(uploaded_file.name)[0]
     new_filename = f"{original_filename}_{timestamp}{file_extension}"
     
@@ -277,34 +242,16 @@ def save_uploaded_file(uploaded_file):
     with open(file_path, "wb") as f:
         f.write(uploaded_file.getvalue())
     
+    # Index it so the sidebar sees it without rescanning the folder
+    get_library().add(file_path)
+    
     return file_path
 
-def list_audio_files():
-    """List all audio files in the audio directory"""
-    if not os.path.exists("audio"):
-        return []
-    return sorted(glob.glob("audio/*.mp3"), key=os.path.getmtime, reverse=True)
-
-def format_filename(filepath):
-    """Format filename for display"""
-    filename = os.path.basename(filepath)
-    name, _ = os.path.splitext(filename)
-    # Split by underscore and remove timestamp
-    parts = name.split('_')[:-2]  # Assuming format: name_YYYYMMDD_HHMMSS
-    return ' '.join(parts).title()
-
-def get_file_date(filepath):
-    """Get formatted date from filename"""
-    filename = os.path.basename(filepath)
-    timestamp = filename.split('_')[-2:]  # Get YYYYMMDD_HHMMSS
-    if len(timestamp) >= 2:
-        datetime_str = f"{timestamp[0]}_{timestamp[1]}"
-        try:
-            file_date = datetime.strptime(datetime_str, "%Y%m%d_%H%M%S")
-            return file_date.strftime("%b %d, %Y %I:%M %p")
-        except:
-            return "Date unknown"
-    return "Date unknown"
+def format_recording_date(recorded_at):
+    """Format an indexed ISO timestamp for display"""
+    if not recorded_at:
+        return "Date unknown"
+    return datetime.fromisoformat(recorded_at).strftime("%b %d, %Y %I:%M %p")
 
 def get_or_create_session_state():
     if 'file_just_uploaded' not in st.session_state:
@@ -313,84 +260,26 @@ def get_or_create_session_state():
         st.session_state.selected_audio = None
     if 'current_summary' not in st.session_state:
         st.session_state.current_summary = None
+    if 'current_job' not in st.session_state:
+        st.session_state.current_job = None
+    if 'playing_audio' not in st.session_state:
+        st.session_state.playing_audio = None
+    if 'library_page' not in st.session_state:
+        st.session_state.library_page = 0
     # Clear summaries when switching files
     if 'last_file' not in st.session_state:
         st.session_state.last_file = None
 
-def save_transcription(transcription, original_filename, timestamp):
-    """Save transcription to transcriptions folder"""
-    # Create transcriptions directory if it doesn't exist
-    transcriptions_dir = "transcriptions"
-    if not os.path.exists(transcriptions_dir):
-        os.makedirs(transcriptions_dir)
-    
-    # Create filename with just the date (not time)
-    date_only = timestamp.split('_')[0]  # Get YYYYMMDD part
-    new_filename = f"{original_filename}_{date_only}.md"
-    file_path = os.path.join(transcriptions_dir, new_filename)
-    
-    # Save the transcription with metadata
-    with open(file_path, "w", encoding='utf-8') as f:
-        f.write(f"# Transcription: {original_filename}\n")
-        f.write(f"Date: {datetime.strptime(date_only, '%Y%m%d').strftime('%B %d, %Y')}\n\n")
-        f.write("## Content\n\n")
-        f.write(transcription)
-    
-    return file_path
-
-def save_conversation(conversation, original_filename, timestamp):
-    """Save conversation to conversations folder"""
-    # Create conversations directory if it doesn't exist
-    conversations_dir = "conversations"
-    if not os.path.exists(conversations_dir):
-        os.makedirs(conversations_dir)
-    
-    # Create filename with just the date (not time)
-    date_only = timestamp.split('_')[0]  # Get YYYYMMDD part
-    new_filename = f"{original_filename}_{date_only}.md"
-    file_path = os.path.join(conversations_dir, new_filename)
-    
-    # Save the conversation with metadata
-    with open(file_path, "w", encoding='utf-8') as f:
-        f.write(f"# Conversation: {original_filename}\n")
-        f.write(f"Date: {datetime.strptime(date_only, '%Y%m%d').strftime('%B %d, %Y')}\n\n")
-        f.write("## Dialogue\n\n")
-        f.write(conversation)
-    
-    return file_path
-
 def find_associated_files(audio_filename):
-    """Find associated transcription and conversation files"""
-    # Get the original filename without the timestamp
-    filename = os.path.basename(audio_filename)
-    original_name = filename.split('_')[0]  # Get the part before first underscore
-    
-    # Get just the date from the audio filename
-    date_only = filename.split('_')[-2]  # Get YYYYMMDD part
-    
-    # Create the base filename that matches our saved files
-    base_filename = f"{original_name}_{date_only}"
-    
-    # Look for matching files with .md extension
-    transcription_path = os.path.join("transcriptions", f"{base_filename}.md")
-    conversation_path = os.path.join("conversations", f"{base_filename}.md")
-    
-    # Check if files exist
-    trans_exists = os.path.exists(transcription_path)
-    conv_exists = os.path.exists(conversation_path)
-    
-    return {
-        'transcription': transcription_path if trans_exists else None,
-        'conversation': conversation_path if conv_exists else None
-    }
-
-def load_markdown_file(filepath):
-    """Load and return contents of a markdown file"""
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return f.read()
-    except Exception as e:
-        return None
+    """Find associated transcription, conversation and summary files"""
+    recording = get_library().get(audio_filename)
+    if recording is not None:
+        return {
+            'transcription': recording['transcription_path'],
+            'conversation': recording['conversation_path'],
+            'summary': recording['summary_path']
+        }
+    return find_artifacts(audio_filename)
 
 def delete_recording(audio_file):
     """Delete recording and its associated files"""
@@ -401,6 +290,7 @@ def delete_recording(audio_file):
         # Delete audio file
         if os.path.exists(audio_file):
             os.remove(audio_file)
+        get_library().remove(audio_file)
             
         # Delete transcription if exists
         if associated_files['transcription'] and os.path.exists(associated_files['transcription']):
@@ -410,6 +300,13 @@ def delete_recording(audio_file):
         if associated_files['conversation'] and os.path.exists(associated_files['conversation']):
             os.remove(associated_files['conversation'])
             
+        # Delete summary (and its JSON record) if exists
+        if associated_files['summary'] and os.path.exists(associated_files['summary']):
+            os.remove(associated_files['summary'])
+            record_path = os.path.splitext(associated_files['summary'])[0] + ".json"
+            if os.path.exists(record_path):
+                os.remove(record_path)
+            
         # Clean up session state
         if 'current_summary' in st.session_state:
             st.session_state.current_summary = None
@@ -418,18 +315,137 @@ def delete_recording(audio_file):
         if 'selected_audio' in st.session_state:
             st.session_state.selected_audio = None
             
-        # Clear any summary keys for this file
-        summary_key = f"summary_{audio_file}"
-        if summary_key in st.session_state:
-            del st.session_state[summary_key]
-            
         return True
     except Exception as e:
         st.error(f"Error deleting files: {str(e)}")
         return False
 
+def save_job_result(job, stage, result):
+    """Persist finished job stages next to the recording (runs on a worker thread)"""
+    metadata = job['metadata']
+    if stage == "transcription":
+        path = save_transcription(result, metadata['original_filename'], metadata['timestamp'])
+    elif stage == "conversation":
+        path = save_conversation(result, metadata['original_filename'], metadata['timestamp'])
+    elif stage == "summary":
+        # Keyed by what actually generated it (summary agent or combined request)
+        source = job['results'].get('conversation') or job['results']['transcription']
+        source_key = job['results'].get('summary_key') or summary_cache_key(source)
+        path = save_summary(result, metadata['original_filename'], metadata['timestamp'], source_key)
+        if job['results'].get('summary_record') is not None:
+            save_summary_record(job['results']['summary_record'], metadata['original_filename'],
+                                metadata['timestamp'], source_key)
+    else:
+        return
+    get_library().set_artifact(metadata['audio_path'], stage, path)
+
+def submit_recording_job(audio_bytes, saved_file_path, original_filename, timestamp):
+    """Queue background processing for a saved recording and return the job ID"""
+    # Reuse anything already saved for this recording
+    results = {}
+    associated_files = find_associated_files(saved_file_path)
+    for kind in ("transcription", "conversation"):
+        if associated_files[kind]:
+            content = load_artifact(kind, associated_files[kind])
+            if content:
+                results[kind] = content
+    if associated_files['summary'] and results.get('conversation'):
+        # Only if generated from this conversation (or its transcript) with the current prompt and model
+        summary = load_artifact('summary', associated_files['summary'],
+                                summary_source_keys(results['conversation'], results.get('transcription')))
+        if summary:
+            results['summary'] = summary
+
+    return get_job_manager().submit(
+        audio_bytes,
+        original_filename,
+        results=results,
+        metadata={
+            'original_filename': original_filename,
+            'timestamp': timestamp,
+            'audio_path': saved_file_path
+        }
+    )
+
+def recording_name_parts(audio_path):
+    """Split a saved recording's name_YYYYMMDD_HHMMSS filename into (name, timestamp)"""
+    parts = os.path.splitext(os.path.basename(audio_path))[0].split('_')
+    return '_'.join(parts[:-2]), '_'.join(parts[-2:])
+
+def resubmit_recording(audio_path):
+    """Queue a saved recording again, keeping its saved artifacts and checkpoints"""
+    original_filename, timestamp = recording_name_parts(audio_path)
+    with open(audio_path, "rb") as f:
+        audio_bytes = f.read()
+    return submit_recording_job(audio_bytes, audio_path, original_filename, timestamp)
+
+def render_job(job_id):
+    """Show status and (partial) results of a background job"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        st.info("This job is no longer available. Select a recording from the sidebar.")
+        return
+
+    if job['status'] == "failed":
+        st.error(job['message'])
+        # Finished chunks were checkpointed, so running again only redoes the rest
+        if st.button("Resume", key=f"resume_{job_id}"):
+            st.session_state.current_job = resubmit_recording(job['metadata']['audio_path'])
+            st.rerun()
+    elif job['status'] != "done":
+        st.progress(job['progress'], text=job['message'])
+        waiting = get_scheduler().queue_depth()
+        if waiting:
+            st.caption(f"{waiting} API requests waiting for rate-limit budget")
+
+    tab1, tab2, tab3 = st.tabs(["Transcription", "Conversation", "Medical Summary"])
+    results = job['results']
+
+    with tab1:
+        st.header("Transcription")
+        if results.get('transcription'):
+            st.markdown(results['transcription'])
+        else:
+            st.info("Transcription in progress...")
+
+    with tab2:
+        st.header("Conversation")
+        if results.get('conversation'):
+            st.markdown(results['conversation'])
+        else:
+            st.info("Waiting for transcription...")
+
+    with tab3:
+        st.header("Medical Summary")
+        if results.get('summary'):
+            st.markdown(results['summary'])
+            if job['status'] == "done":
+                st.download_button(
+                    label="Download Summary",
+                    data=results['summary'],
+                    file_name="medical_summary.txt",
+                    mime="text/plain",
+                    key=f"download_{job_id}"
+                )
+        else:
+            st.info("Waiting for conversation...")
+
+    # Once the job settles, rerun the whole app so the sidebar picks up new files
+    if job['status'] in ("done", "failed") and st.session_state.get('polling_job') == job_id:
+        st.session_state.polling_job = None
+        st.rerun()
+
+def show_job(job_id):
+    """Render a job, polling for updates only while it is still running"""
+    job = get_job_manager().get(job_id)
+    running = job is not None and job['status'] in ("queued", "running")
+    if running:
+        st.session_state.polling_job = job_id
+    st.fragment(render_job, run_every=1.0 if running else None)(job_id)
+
 def process_audio_file(audio_bytes, progress_bar, operation_type="transcription", use_existing_transcription=False, transcription_text=None):
     """Process audio file with progress updates"""
+    orchestrator = get_session_orchestrator()
     # Create a proper progress callback function
     def make_progress_callback(base_progress=0, scale=1.0):
         def callback(progress, text):
@@ -478,11 +494,20 @@ def main():
     uploaded_file = st.sidebar.file_uploader("Upload New MP3", type=["mp3"], 
                                            on_change=lambda: setattr(st.session_state, 'file_just_uploaded', True))
 
-    # If a file was just uploaded, save it and rerun
+    # If a file was just uploaded, save it, queue processing and rerun
     if st.session_state.file_just_uploaded:
         if uploaded_file is not None:
             # Save the uploaded file
-            saved_file_path = save_uploaded_file(uploaded_file)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            saved_file_path = save_uploaded_file(uploaded_file, timestamp)
+            st.session_state.current_job = submit_recording_job(
+                uploaded_file.getvalue(),
+                saved_file_path,
+                os.path.splitext(uploaded_file.name)[0],
+                timestamp
+            )
+            st.session_state.selected_audio = None
+            get_session_orchestrator().reset_context()
             st.session_state.file_just_uploaded = False  # Reset the flag
             st.rerun()  # Rerun the app to update the sidebar
         
@@ -492,93 +517,98 @@ def main():
     # List existing files
     st.sidebar.subheader("Previous Recordings")
     
-    # Get list of audio files
-    audio_files = list_audio_files()
+    # Search and paginate the recording index instead of scanning the folder
+    search = st.sidebar.text_input("Search recordings", key="library_search",
+                                   on_change=lambda: setattr(st.session_state, 'library_page', 0))
+    library = get_library()
+    total = library.count(search)
+    pages = max(1, -(-total // RECORDINGS_PER_PAGE))
+    page = min(st.session_state.library_page, pages - 1)
+    recordings = library.list(offset=page * RECORDINGS_PER_PAGE, limit=RECORDINGS_PER_PAGE, search=search)
     
+    # Custom CSS for the audio containers (emitted once, not per file)
+    st.sidebar.markdown("""
+    <style>
+    .audio-container {
+        background-color: #1E1E1E;
+        border-radius: 10px;
+        padding: 10px;
+        margin: 10px 0;
+    }
+    .file-name {
+        color: #FFFFFF;
+        font-size: 16px;
+        margin-bottom: 5px;
+    }
+    .file-date {
+        color: #888888;
+        font-size: 12px;
+    }
+    .waveform {
+        background: linear-gradient(90deg, #4CAF50 0%, #2196F3 100%);
+        height: 40px;
+        border-radius: 5px;
+        margin: 5px 0;
+    }
+    </style>
+    """, unsafe_allow_html=True)
+
     # Display audio files with custom styling
-    for audio_file in audio_files:
+    for recording in recordings:
+        audio_file = recording['path']
         with st.sidebar.container():
-            # Custom CSS for the audio container
-            st.markdown("""
-            <style>
-            .audio-container {
-                background-color: #1E1E1E;
-                border-radius: 10px;
-                padding: 10px;
-                margin: 10px 0;
-            }
-            .file-name {
-                color: #FFFFFF;
-                font-size: 16px;
-                margin-bottom: 5px;
-            }
-            .file-date {
-                color: #888888;
-                font-size: 12px;
-            }
-            .waveform {
-                background: linear-gradient(90deg, #4CAF50 0%, #2196F3 100%);
-                height: 40px;
-                border-radius: 5px;
-                margin: 5px 0;
-            }
-            </style>
-            """, unsafe_allow_html=True)
-
             # Create a custom container for each audio file
             st.markdown(f"""
             <div class="audio-container">
-                <div class="file-name">{format_filename(audio_file)}</div>
-                <div class="file-date">{get_file_date(audio_file)}</div>
+                <div class="file-name">{recording['display_name']}</div>
+                <div class="file-date">{format_recording_date(recording['recorded_at'])}</div>
                 <div class="waveform"></div>
             </div>
             """, unsafe_allow_html=True)
 
             try:
-                # Audio player with better error handling
-                with open(audio_file, 'rb') as f:
-                    audio_bytes = f.read()
-                    audio = AudioSegment.from_mp3(io.BytesIO(audio_bytes))
-                    wav_io = io.BytesIO()
-                    audio.export(wav_io, format='wav')
-                    wav_io.seek(0)
-                    
-                    # Create two columns for the buttons
-                    col1, col2 = st.columns([3, 1])
+                # Create two columns for the buttons
+                col1, col2 = st.columns([3, 1])
+                
+                with col1:
+                    # Only the recording being played gets a player; it streams the
+                    # original MP3 without decoding or re-encoding it
+                    if st.session_state.playing_audio == audio_file:
+                        st.audio(audio_file, format='audio/mpeg')
+                    elif st.button("▶ Play", key=f"play_{audio_file}"):
+                        st.session_state.playing_audio = audio_file
+                        st.rerun()
                     
-                    with col1:
-                        # Display audio player
-                        st.audio(wav_io, format='audio/wav')
-                        
-                        # Check if files exist before showing the load button
-                        associated_files = find_associated_files(audio_file)
-                        has_files = associated_files['transcription'] is not None or associated_files['conversation'] is not None
-                        
-                        # Add a button to load the file content
-                        button_label = f"Load {format_filename(audio_file)}"
-                        if has_files:
-                            if st.button(button_label, key=f"btn_{audio_file}"):
-                                st.session_state.selected_audio = audio_file
-                                st.rerun()
-                        else:
-                            # Disabled button with tooltip
-                            st.button(
-                                button_label, 
-                                key=f"btn_{audio_file}", 
-                                disabled=True,
-                                help="No transcription or conversation available yet"
-                            )
+                    # Check if files exist before showing the load button
+                    has_files = recording['transcription_path'] is not None or recording['conversation_path'] is not None
                     
-                    with col2:
-                        # Add delete button
-                        if st.button("🗑️", key=f"del_{audio_file}", 
-                                   help="Delete recording and associated files"):
-                            if delete_recording(audio_file):
-                                st.success("Recording deleted")
-                                # Clear selected audio if it was the deleted one
-                                if st.session_state.selected_audio == audio_file:
-                                    st.session_state.selected_audio = None
-                                st.rerun()
+                    # Add a button to load the file content
+                    button_label = f"Load {recording['display_name']}"
+                    if has_files:
+                        if st.button(button_label, key=f"btn_{audio_file}"):
+                            st.session_state.selected_audio = audio_file
+                            st.session_state.current_job = None
+                            get_session_orchestrator().reset_context()
+                            st.rerun()
+                    else:
+                        # Disabled button with tooltip
+                        st.button(
+                            button_label, 
+                            key=f"btn_{audio_file}", 
+                            disabled=True,
+                            help="No transcription or conversation available yet"
+                        )
+                
+                with col2:
+                    # Add delete button
+                    if st.button("🗑️", key=f"del_{audio_file}", 
+                               help="Delete recording and associated files"):
+                        if delete_recording(audio_file):
+                            st.success("Recording deleted")
+                            # Clear selected audio if it was the deleted one
+                            if st.session_state.selected_audio == audio_file:
+                                st.session_state.selected_audio = None
+                            st.rerun()
 
             except Exception as e:
                 st.error(f"Unable to play audio file. Error: {str(e)}")
@@ -586,144 +616,23 @@ def main():
             # Add a subtle separator
             st.markdown("<hr style='margin: 5px 0; opacity: 0.2;'>", unsafe_allow_html=True)
 
-    # Main content area
-    if uploaded_file is not None:
-        try:
-            # Get the bytes once and reuse
-            audio_bytes = uploaded_file.getvalue()
-            
-            # Get original filename and timestamp
-            original_filename = os.path.splitext(uploaded_file.name)[0]
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            
-            # Create the file path that matches how it was saved in the sidebar
-            saved_file_path = os.path.join("audio", f"{original_filename}_{timestamp}.mp3")
-            
-            # Create tabs
-            tab1, tab2, tab3 = st.tabs(["Transcription", "Conversation", "Medical Summary"])
-            
-            # Check for existing files first
-            associated_files = find_associated_files(saved_file_path)
-            
-            # Transcription tab
-            with tab1:
-                st.header("Transcription")
-                if associated_files['transcription']:
-                    content = load_markdown_file(associated_files['transcription'])
-                    if content:
-                        transcription = content.split("## Content\n\n")[-1]
-                        # Store in orchestrator context
-                        orchestrator.context['transcription'] = transcription
-                    st.markdown(content)
-                else:
-                    # Only transcribe if no existing file
-                    progress_bar = st.progress(0, text="Starting transcription...")
-                    
-                    def make_progress_callback(base_progress=0, scale=1.0):
-                        def callback(progress, text):
-                            if progress_bar and hasattr(progress_bar, 'progress'):
-                                update_progress(progress_bar, base_progress + (progress * scale), text)
-                        return callback
-                    
-                    # Use the progress callback
-                    result = orchestrator.process_transcription(
-                        audio_bytes, 
-                        make_progress_callback(0, 1.0)
-                    )
-                    
-                    if result:
-                        if result.startswith("Error"):
-                            st.error(result)  # Display the detailed error message
-                        else:
-                            transcription_path = save_transcription(result, original_filename, timestamp)
-                            content = load_markdown_file(transcription_path)
-                            if content:
-                                transcription = content.split("## Content\n\n")[-1]
-                                # Store in orchestrator context
-                                orchestrator.context['transcription'] = transcription
-                            st.markdown(content)
-            
-            # Conversation tab
-            with tab2:
-                st.header("Conversation")
-                if associated_files['conversation']:
-                    content = load_markdown_file(associated_files['conversation'])
-                    if content:
-                        st.markdown(content)
-                else:
-                    # Check if we have transcription in context
-                    if 'transcription' not in orchestrator.context:
-                        st.error("Please generate a transcription first")
-                        return
+    # Page navigation
+    if pages > 1:
+        col1, col2, col3 = st.sidebar.columns([1, 2, 1])
+        with col1:
+            if st.button("◀", key="library_prev", disabled=page == 0):
+                st.session_state.library_page = page - 1
+                st.rerun()
+        with col2:
+            st.caption(f"Page {page + 1} of {pages} ({total} recordings)")
+        with col3:
+            if st.button("▶", key="library_next", disabled=page >= pages - 1):
+                st.session_state.library_page = page + 1
+                st.rerun()
 
-                    progress_bar = st.progress(0, text="Starting...")
-                    message_placeholder = st.empty()
-                    
-                    def streaming_callback(progress, text):
-                        if text.endswith("▌"):
-                            message_placeholder.markdown(text[:-1], unsafe_allow_html=True)
-                        else:
-                            update_progress(progress_bar, 0.4 + (progress * 0.6), text)
-                    
-                    # Use transcription from context
-                    result = orchestrator.process_conversation(
-                        orchestrator.context['transcription'],
-                        streaming_callback
-                    )
-                    
-                    if result and not result.startswith("Error"):
-                        conversation_path = save_conversation(result, original_filename, timestamp)
-                        message_placeholder.markdown(result)
-                    else:
-                        st.error(f"Failed to generate conversation: {result}")
-                    
-                    progress_bar.empty()
-            
-            # Medical Summary tab
-            with tab3:
-                st.header("Medical Summary")
-                
-                # Clear summary if we switched files
-                current_file = audio_file  # or saved_file_path depending on context
-                if st.session_state.last_file != current_file:
-                    if 'current_summary' in st.session_state:
-                        st.session_state.current_summary = None
-                    st.session_state.last_file = current_file
-                
-                # Generate button
-                if st.button("Generate Medical Summary", key=f"gen_summary_{current_file}"):
-                    content = None
-                    progress_bar = st.progress(0, text="Starting...")
-                    
-                    # Try to get conversation first, then transcription
-                    if associated_files['conversation']:
-                        content = load_markdown_file(associated_files['conversation'])
-                        if content:
-                            content = content.split("## Dialogue\n\n")[-1]
-                    elif associated_files['transcription']:
-                        content = load_markdown_file(associated_files['transcription'])
-                        if content:
-                            content = content.split("## Content\n\n")[-1]
-                    
-                    if content:
-                        # Store the result in session state but don't display it again here
-                        st.session_state.current_summary = extract_medical_info(content, progress_bar)
-                    else:
-                        st.error("No content available for summary generation")
-                
-                # Display current summary if available
-                if st.session_state.current_summary:
-                    # We don't need to render it again since extract_medical_info already did
-                    st.download_button(
-                        label="Download Summary",
-                        data=st.session_state.current_summary,
-                        file_name="medical_summary.txt",
-                        mime="text/plain",
-                        key=f"download_{current_file}"
-                    )
-
-        except Exception as e:
-            st.error(f"Error processing file: {str(e)}")
+    # Main content area
+    if st.session_state.current_job is not None:
+        show_job(st.session_state.current_job)
     elif st.session_state.selected_audio is not None:
         try:
             audio_file = st.session_state.selected_audio
@@ -743,6 +652,10 @@ def main():
                         st.markdown(content)
                 else:
                     st.info("No transcription available")
+                    # Picks up from the last checkpointed chunk if an earlier run was interrupted
+                    if st.button("Transcribe recording", key=f"transcribe_{audio_file}"):
+                        st.session_state.current_job = resubmit_recording(audio_file)
+                        st.rerun()
             
             # Conversation tab
             with tab2:
@@ -758,36 +671,39 @@ def main():
             with tab3:
                 st.header("Medical Summary")
                 
-                # Store summary in session state to prevent regeneration
-                summary_key = f"summary_{audio_file}"
-                if summary_key not in st.session_state:
-                    st.session_state[summary_key] = None
+                # Summarize the conversation if there is one, otherwise the transcription
+                conversation = transcription = None
+                if associated_files['conversation']:
+                    conversation = load_artifact('conversation', associated_files['conversation'])
+                if associated_files['transcription']:
+                    transcription = load_artifact('transcription', associated_files['transcription'])
+                content = conversation or transcription
+                
+                # A saved summary is served from disk while the text, prompt and model are unchanged
+                cache_key = summary_cache_key(content) if content else None
+                summary = None
+                if cache_key and associated_files['summary']:
+                    summary = load_artifact('summary', associated_files['summary'],
+                                            summary_source_keys(conversation, transcription))
                 
-                # Generate button with unique key
-                if st.button("Generate Medical Summary", key=f"gen_summary_{audio_file}"):
-                    content = None
-                    progress_bar = st.progress(0, text="Starting...")
-                    
-                    # Try to get conversation first, then transcription
-                    if associated_files['conversation']:
-                        content = load_markdown_file(associated_files['conversation'])
-                        if content:
-                            content = content.split("## Dialogue\n\n")[-1]
-                    elif associated_files['transcription']:
-                        content = load_markdown_file(associated_files['transcription'])
-                        if content:
-                            content = content.split("## Content\n\n")[-1]
-                    
+                if summary:
+                    st.markdown(summary)
+                elif st.button("Generate Medical Summary", key=f"gen_summary_{audio_file}"):
                     if content:
-                        # Store the result in session state - extract_medical_info will display it once
-                        st.session_state[summary_key] = extract_medical_info(content, progress_bar)
+                        progress_bar = st.progress(0, text="Starting...")
+                        # extract_medical_info displays the summary as it streams
+                        record = extract_medical_info(content, progress_bar)
+                        if record:
+                            summary = record.to_markdown()
+                            original_filename, timestamp = recording_name_parts(audio_file)
+                            path = save_summary(summary, original_filename, timestamp, cache_key)
+                            save_summary_record(record, original_filename, timestamp, cache_key)
+                            get_library().set_artifact(audio_file, 'summary', path)
                 
-                # Display summary if available
-                if st.session_state[summary_key]:
-                    # We don't need to display the summary again since extract_medical_info already did
+                if summary:
                     st.download_button(
                         label="Download Summary",
-                        data=st.session_state[summary_key],
+                        data=summary,
                         file_name="medical_summary.txt",
                         mime="text/plain",
                         key=f"download_{audio_file}"
@@ -0,0 +1,241 @@
+"""
+Headless bulk processing of recordings, without the Streamlit UI.
+
+Transcribes each recording, formats the conversation and (optionally)
+generates the medical summary, writing the same transcriptions/ and
+conversations/ files as the app (summaries go to summaries/, as Markdown
+and as typed JSON records for exports). Recordings
+whose outputs already exist are skipped, so an interrupted run can simply be
+started again.
+
+Usage (from the repository root):
+    python batch.py recordings/
+    python batch.py "audio/*.mp3" --workers 4 --stages transcription conversation
+"""
+import argparse
+import glob
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from dotenv import load_dotenv
+from openai import OpenAI
+
+from agents.artifacts import artifact_path, save_artifact, save_summary_record, load_artifact
+from agents.combined_agent import summary_source_keys
+from agents.audio_stream import probe_duration
+from agents.checkpoints import TranscriptionCheckpoints
+from agents.jobs import STAGES
+from agents.library import ARTIFACT_KINDS, RecordingLibrary, parse_recording_name
+from agents.medical_summary_agent import summary_cache_key
+from agents.orchestrator import Orchestrator
+from agents.scheduler import RateLimitScheduler, PRIORITY_BATCH, parse_limits
+from agents.telemetry import configure_from_env
+from agents.transcription_cache import TranscriptionCache
+from agents.whisper_backend import LocalWhisperBackend
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a", ".mp4", ".ogg", ".flac", ".webm")
+
+def find_recordings(inputs):
+    """Expand directories and glob patterns into a sorted list of audio files"""
+    paths = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            candidates = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            candidates = glob.glob(pattern)
+        paths.update(path for path in candidates
+                     if os.path.isfile(path) and path.lower().endswith(AUDIO_EXTENSIONS))
+    return sorted(paths)
+
+def recording_name(path):
+    """Return (original filename, timestamp) used to name a recording's outputs"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    _, recorded_at = parse_recording_name(path)
+    if recorded_at is not None:
+        # Saved by the app as name_YYYYMMDD_HHMMSS
+        return '_'.join(name.split('_')[:-2]), recorded_at.strftime("%Y%m%d_%H%M%S")
+    modified = datetime.fromtimestamp(os.path.getmtime(path))
+    return name, modified.strftime("%Y%m%d_%H%M%S")
+
+def create_orchestrator_factory():
+    """Build shared client, cache and backend, configured like the app"""
+    scheduler = RateLimitScheduler(parse_limits(os.getenv("OPENAI_RATE_LIMITS")))
+    client = scheduler.client(OpenAI(api_key=os.getenv("OPENAI_API_KEY")), priority=PRIORITY_BATCH)
+    cache = TranscriptionCache(
+        cache_dir=os.getenv("TRANSCRIPTION_CACHE_DIR", "cache/transcriptions"),
+        max_bytes=int(os.getenv("TRANSCRIPTION_CACHE_MB", "50")) * 1024 * 1024
+    )
+    checkpoints = TranscriptionCheckpoints(
+        os.getenv("TRANSCRIPTION_CHECKPOINT_DIR", "cache/checkpoints"),
+        max_age_seconds=float(os.getenv("TRANSCRIPTION_CHECKPOINT_DAYS", "7")) * 24 * 60 * 60
+    )
+    backend = None
+    if os.getenv("TRANSCRIPTION_BACKEND", "openai") == "local":
+        threads = os.getenv("WHISPER_THREADS")
+        backend = LocalWhisperBackend(
+            model_name=os.getenv("WHISPER_MODEL", "openai/whisper-small"),
+            batch_size=int(os.getenv("WHISPER_BATCH_SIZE", "8")),
+            num_threads=int(threads) if threads else None
+        )
+
+    def factory():
+        # A fresh orchestrator (and context) per recording
+        return Orchestrator(
+            client,
+            transcription_workers=int(os.getenv("TRANSCRIPTION_WORKERS", "4")),
+            transcription_cache=cache,
+            transcription_checkpoints=checkpoints,
+            transcription_backend=backend,
+            transcription_upload_format=os.getenv("TRANSCRIPTION_UPLOAD_FORMAT")
+        )
+    return factory
+
+def update_library(library, path, original_filename, timestamp):
+    """Point the app's recording index at the files saved for a recording
+
+    Only recordings in the library's audio folder are indexed; the app
+    trusts the index, so without this batch results would not show up.
+    """
+    if library is None:
+        return
+    audio_path = os.path.join(library.audio_dir, os.path.basename(path))
+    if not (os.path.exists(audio_path) and os.path.samefile(audio_path, path)):
+        return
+    if library.get(audio_path) is None:
+        library.add(audio_path)
+    for kind in ARTIFACT_KINDS:
+        saved = artifact_path(kind, original_filename, timestamp)
+        if os.path.exists(saved):
+            library.set_artifact(audio_path, kind, saved)
+
+def process_recording(path, stages, orchestrator_factory, log, combined=False, library=None):
+    """Run the missing stages for one recording and return a result record"""
+    original_filename, timestamp = recording_name(path)
+    results = {}
+    for stage in stages:
+        existing = artifact_path(stage, original_filename, timestamp)
+        if not os.path.exists(existing):
+            continue
+        if stage == "summary":
+            # Regenerate summaries made from other text or with an older prompt or model
+            keys = summary_source_keys(results.get('conversation'), results.get('transcription'))
+            if keys:
+                results[stage] = load_artifact(stage, existing, keys)
+        else:
+            results[stage] = load_artifact(stage, existing)
+
+    record = {'path': path, 'status': "skipped", 'audio_seconds': 0.0, 'error': None}
+    missing = [stage for stage in stages if not results.get(stage)]
+    if not missing:
+        # Saved by an earlier run, which may not have indexed them
+        update_library(library, path, original_filename, timestamp)
+        return record
+
+    orchestrator = orchestrator_factory()
+    progress = lambda value, text: None
+    combined_summary = None
+    try:
+        for stage in missing:
+            if stage == "transcription":
+                with open(path, "rb") as f:
+                    result = orchestrator.process_transcription(f.read(), progress)
+            elif stage == "conversation" and combined and "summary" in missing:
+                # One request for both; the summary is saved on its own turn below
+                result, combined_summary = orchestrator.process_combined(results['transcription'], progress, progress)
+            elif stage == "conversation":
+                result = orchestrator.process_conversation(results['transcription'], progress)
+            else:
+                source = results.get('conversation') or results['transcription']
+                result = combined_summary or orchestrator.process_summary(source, progress)
+
+            if not result or result.startswith("Error"):
+                raise RuntimeError(result or f"{stage.title()} returned no result")
+            results[stage] = result
+            source_key = None
+            if stage == "summary":
+                # Keyed by what actually generated it (summary agent or combined request)
+                source_key = (orchestrator.context.get('summary_key')
+                              or summary_cache_key(results.get('conversation') or results['transcription']))
+                # Typed summary as JSON, so exports need not parse the Markdown
+                summary_record = orchestrator.context.get('summary_record')
+                if summary_record is not None:
+                    save_summary_record(summary_record, original_filename, timestamp, source_key)
+            save_artifact(stage, result, original_filename, timestamp, source_key)
+            log(f"  {os.path.basename(path)}: {stage} done")
+    except Exception as e:
+        record.update(status="failed", error=str(e))
+        return record
+    finally:
+        # Index whatever was saved, including stages finished before a failure
+        update_library(library, path, original_filename, timestamp)
+
+    record['status'] = "processed"
+    report = orchestrator.context.get('chunking_report')
+    if report:
+        record['audio_seconds'] = report['input_seconds']
+    else:
+        record['audio_seconds'] = probe_duration(path) or 0.0
+    return record
+
+def print_report(records, elapsed):
+    """Summarize counts and throughput of a run"""
+    processed = [record for record in records if record['status'] == "processed"]
+    failed = [record for record in records if record['status'] == "failed"]
+    skipped = len(records) - len(processed) - len(failed)
+    audio_minutes = sum(record['audio_seconds'] for record in processed) / 60
+    wall_minutes = elapsed / 60
+
+    print()
+    print(f"Processed {len(processed)}, skipped {skipped}, failed {len(failed)} in {elapsed:.1f}s")
+    if processed and elapsed > 0:
+        print(f"  {len(processed) / (elapsed / 3600):.1f} files per hour")
+        print(f"  {audio_minutes:.1f} audio minutes, {audio_minutes / wall_minutes:.2f} audio minutes per wall-clock minute")
+    for record in failed:
+        print(f"  failed: {record['path']}: {record['error']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe and summarize a batch of recordings")
+    parser.add_argument("inputs", nargs="+", help="Directories or glob patterns of audio files")
+    parser.add_argument("--workers", type=int, default=2, help="Recordings processed in parallel")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES),
+                        help="Stages to run (default: all)")
+    parser.add_argument("--combined", action="store_true",
+                        help="Generate conversation and summary from one request per recording")
+    args = parser.parse_args()
+
+    load_dotenv()
+    configure_from_env()
+    stages = [stage for stage in STAGES if stage in args.stages]
+    if "transcription" not in stages:
+        # Later stages always need the transcription; it is skipped if already saved
+        stages.insert(0, "transcription")
+    recordings = find_recordings(args.inputs)
+    if not recordings:
+        parser.error("no audio files found")
+
+    print(f"{len(recordings)} recordings, {args.workers} workers, stages: {', '.join(stages)}")
+    factory = create_orchestrator_factory()
+    # The app's recording index, so batch results show up as processed there
+    library = RecordingLibrary(db_path=os.getenv("LIBRARY_DB", "library.db"), audio_dir="audio")
+    print_lock = threading.Lock()
+
+    def log(message):
+        with print_lock:
+            print(message, flush=True)
+
+    records = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = [executor.submit(process_recording, path, stages, factory, log, args.combined, library) for path in recordings]
+        for future in as_completed(futures):
+            record = future.result()
+            records.append(record)
+            log(f"[{len(records)}/{len(recordings)}] {record['status']}: {record['path']}")
+    print_report(records, time.perf_counter() - start)
+    return 1 if any(record['status'] == "failed" for record in records) else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,175 @@
+"""
+End-to-end benchmark of the transcription, conversation and summary agents.
+
+Runs the real agents against the local fake OpenAI server
+(benchmarks/fake_openai.py, started in a subprocess so its work isn't
+counted) on synthetic recordings, and reports per stage: wall-clock latency,
+time to the first streamed update, CPU seconds and peak RSS of this process.
+Needs ffmpeg, like the app.
+
+Usage (from the repository root):
+    python -m benchmarks.agents_benchmark --minutes 5 30 60 --latency 0.3 --tokens-per-second 300 --error-rate 0.02
+    python -m benchmarks.agents_benchmark --minutes 5 30 60 --latency 0.3 --tokens-per-second 300 --combined
+"""
+import argparse
+import io
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+from openai import OpenAI
+
+from agents.combined_agent import CombinedAgent
+from agents.conversation_agent import ConversationAgent
+from agents.medical_summary_agent import MedicalSummaryAgent
+from agents.scheduler import RateLimitScheduler
+from agents.transcription_agent import TranscriptionAgent
+from benchmarks.preprocess_benchmark import synthetic_segment
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def current_rss():
+    """Resident set size of this process in bytes, or None where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        return None
+
+class StageMeter:
+    """Measure wall time, CPU time and peak RSS while a stage runs"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.first_update = None
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            rss = current_rss()
+            if rss is not None:
+                self.peak_rss = max(self.peak_rss, rss)
+
+    def mark_update(self):
+        """Record the first streamed output of the stage"""
+        if self.first_update is None:
+            self.first_update = time.perf_counter() - self._start
+
+    def __enter__(self):
+        self.peak_rss = current_rss() or 0
+        self._cpu = resource.getrusage(resource.RUSAGE_SELF)
+        self._start = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._start
+        self._stop.set()
+        self._sampler.join()
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        self.cpu_seconds = (usage.ru_utime - self._cpu.ru_utime) + (usage.ru_stime - self._cpu.ru_stime)
+        if current_rss() is None:
+            # No /proc: fall back to the lifetime peak (kilobytes on Linux, bytes on macOS)
+            scale = 1 if sys.platform == "darwin" else 1024
+            self.peak_rss = usage.ru_maxrss * scale
+        return False
+
+def start_fake_server(args):
+    """Run the fake API in a subprocess and return (process, base_url)"""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_openai", "--port", "0",
+         "--latency", str(args.latency), "--tokens-per-second", str(args.tokens_per_second),
+         "--error-rate", str(args.error_rate)],
+        stdout=subprocess.PIPE, text=True
+    )
+    line = process.stdout.readline()
+    if not line:
+        raise RuntimeError("Fake OpenAI server failed to start")
+    return process, line.split(" on ")[-1].strip()
+
+def wav_bytes(minutes):
+    """Synthetic stereo 44.1 kHz recording encoded as WAV"""
+    buffer = io.BytesIO()
+    synthetic_segment(minutes).export(buffer, format="wav")
+    return buffer.getvalue()
+
+def run_stages(client, audio_bytes, combined=False):
+    """Run transcription, conversation and summary; return (stage, meter) pairs"""
+    measured = []
+
+    transcription_agent = TranscriptionAgent(client)
+    with StageMeter() as meter:
+        text = transcription_agent.transcribe(audio_bytes, lambda progress, message: None)
+    measured.append(("transcription", meter))
+    if text.startswith("Error"):
+        raise RuntimeError(text)
+
+    if combined:
+        # Conversation and summary from one request, as with COMBINED_GENERATION=1
+        combined_agent = CombinedAgent(client)
+        with StageMeter() as meter:
+            def on_progress(progress, message):
+                if message.endswith("▌"):
+                    meter.mark_update()
+            dialogue, summary = combined_agent.generate(text, on_progress, on_progress)
+        measured.append(("combined", meter))
+        if dialogue.startswith("Error") or summary is None:
+            raise RuntimeError(dialogue if dialogue.startswith("Error") else "No summary section in reply")
+        return measured
+
+    conversation_agent = ConversationAgent(client)
+    with StageMeter() as meter:
+        def on_progress(progress, message):
+            if message.endswith("▌"):
+                meter.mark_update()
+        dialogue = conversation_agent.generate_conversation(text, on_progress)
+    measured.append(("conversation", meter))
+    if dialogue.startswith("Error"):
+        raise RuntimeError(dialogue)
+
+    summary_agent = MedicalSummaryAgent(client)
+    with StageMeter() as meter:
+        summary = summary_agent.generate_summary(dialogue)
+    measured.append(("summary", meter))
+    if summary.startswith("Error"):
+        raise RuntimeError(summary)
+    return measured
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the agents against a local fake OpenAI API")
+    parser.add_argument("--minutes", type=float, nargs="+", default=[5, 30, 60],
+                        help="Synthetic recording lengths to benchmark")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake API latency per request (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0,
+                        help="Fake streaming speed (0 = as fast as possible)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake requests failing")
+    parser.add_argument("--combined", action="store_true",
+                        help="Generate conversation and summary with one request")
+    args = parser.parse_args()
+
+    server, base_url = start_fake_server(args)
+    try:
+        # Same scheduled client as the app, with limits high enough not to throttle
+        scheduler = RateLimitScheduler(default_limit=(100000, 10 ** 9))
+        client = scheduler.client(OpenAI(base_url=base_url, api_key="benchmark"))
+
+        print(f"{'minutes':>8} {'stage':<14} {'latency (s)':>11} {'first (s)':>10} {'cpu (s)':>8} {'peak RSS MB':>12}")
+        for minutes in args.minutes:
+            audio_bytes = wav_bytes(minutes)
+            for stage, meter in run_stages(client, audio_bytes, args.combined):
+                first = f"{meter.first_update:.2f}" if meter.first_update is not None else "-"
+                print(f"{minutes:>8g} {stage:<14} {meter.seconds:>11.2f} {first:>10} "
+                      f"{meter.cpu_seconds:>8.2f} {meter.peak_rss / 1e6:>12.1f}")
+            del audio_bytes
+        if scheduler.rate_limited:
+            print(f"\n{scheduler.rate_limited} requests were rate limited and retried")
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Local stand-in for the parts of the OpenAI API the agents use.
+
+Serves /v1/audio/transcriptions and /v1/chat/completions (streaming and
+non-streaming) with configurable latency, streaming speed and error rate,
+so the agents can be benchmarked without network access or API cost.
+
+Usage (from the repository root):
+    python -m benchmarks.fake_openai --port 8765 --latency 0.2 --tokens-per-second 200 --error-rate 0.02
+
+Point a client at it with OpenAI(base_url="http://127.0.0.1:8765/v1", api_key="test").
+"""
+import argparse
+import json
+from email.parser import BytesParser
+from email.policy import HTTP
+import random
+import re
+import struct
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from agents.audio_stream import probe_duration
+from agents.combined_agent import DIALOGUE_MARKER, SUMMARY_MARKER
+
+WORDS_PER_MINUTE = 150  # Speech rate used to size fake transcripts
+# JSON-mode reply in the shape MedicalSummaryAgent asks for
+SUMMARY = json.dumps({
+    "medications": [
+        {"name": "Amoxicillin", "dosage": "500 mg", "frequency": "three times daily",
+         "duration": "7 days", "route": "oral"}
+    ],
+    "treatment_plan": {"treatments": ["Antibiotic course"], "schedule": None, "duration": "7 days",
+                       "special_instructions": ["Take with food"]},
+    "side_effects": {"reported": ["Persistent cough for two weeks"], "potential": ["Nausea"], "warnings": []},
+    "effectiveness": {"reported": [], "expected_outcomes": ["Cough resolves within a week"],
+                      "follow_up": ["Return in 2 weeks if symptoms persist"]},
+    "notes": {"warnings": [], "contraindications": [], "drug_interactions": [], "lifestyle_modifications": []}
+}, indent=2)
+
+def uploaded_file(body, content_type):
+    """Return the bytes of the file part of a multipart/form-data request"""
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body)
+    for part in message.iter_parts():
+        if part.get_filename():
+            return part.get_payload(decode=True)
+    return b""
+
+def audio_seconds(data):
+    """Duration of an uploaded audio file (WAV parsed directly, other formats via ffprobe)"""
+    if len(data) < 44 or not data.startswith(b"RIFF"):
+        return probe_duration(data) or 0.0
+    channels, sample_rate = struct.unpack_from("<HI", data, 22)
+    bits = struct.unpack_from("<H", data, 34)[0]
+    data_size = struct.unpack_from("<I", data, 40)[0]
+    bytes_per_second = sample_rate * channels * bits // 8
+    return data_size / bytes_per_second if bytes_per_second else 0.0
+
+def fake_transcript(seconds, rng):
+    """Plausible sentences at a normal speaking rate"""
+    words = ["the", "patient", "reports", "a", "cough", "for", "two", "weeks", "and", "mild",
+             "fever", "taking", "amoxicillin", "500", "mg", "three", "times", "daily"]
+    count = int(seconds / 60 * WORDS_PER_MINUTE)
+    sentences = []
+    while count > 0:
+        length = min(count, rng.randint(6, 14))
+        sentences.append(" ".join(rng.choice(words) for _ in range(length)).capitalize() + ".")
+        count -= length
+    return " ".join(sentences)
+
+def fake_dialogue(text):
+    """Echo the prompt as alternating Doctor/Patient turns, one sentence each"""
+    sentences = [s for s in re.split(r"(?<=[.!?])\s+", text.strip()) if s]
+    speakers = ("Doctor", "Patient")
+    return "\n\n".join(f"{speakers[i % 2]}: {sentence}" for i, sentence in enumerate(sentences))
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Set on the server class by serve()
+    latency = 0.0
+    tokens_per_second = 0.0
+    error_rate = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _maybe_fail(self):
+        """Return True after sending a random 429 or 500"""
+        if random.random() >= self.error_rate:
+            return False
+        if random.random() < 0.5:
+            self._send(429, json.dumps({"error": {"message": "Rate limit reached", "type": "requests"}}),
+                       headers={"retry-after-ms": "200"})
+        else:
+            self._send(500, json.dumps({"error": {"message": "Internal error", "type": "server_error"}}))
+        return True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latency)
+        if self._maybe_fail():
+            return
+        rng = random.Random(len(body))
+        if self.path.endswith("/audio/transcriptions"):
+            audio = uploaded_file(body, self.headers.get("Content-Type", ""))
+            self._send(200, fake_transcript(audio_seconds(audio), rng), content_type="text/plain")
+        elif self.path.endswith("/chat/completions"):
+            self._chat(json.loads(body))
+        else:
+            self._send(404, json.dumps({"error": {"message": f"Unknown path {self.path}"}}))
+
+    def _chat(self, request):
+        messages = request.get("messages", [])
+        system = " ".join(m["content"] for m in messages if m["role"] == "system")
+        user = messages[-1]["content"] if messages else ""
+        # Conversation prompts ask for a dialogue; anything else gets the summary
+        if SUMMARY_MARKER in system:
+            text = f"{DIALOGUE_MARKER}\n{fake_dialogue(user)}\n{SUMMARY_MARKER}\n{SUMMARY}"
+        elif "dialogue" in system.lower():
+            text = fake_dialogue(user)
+        else:
+            text = SUMMARY
+        prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(text) // 4,
+                 "total_tokens": prompt_tokens + len(text) // 4}
+
+        if not request.get("stream"):
+            self._send(200, json.dumps({
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+                "model": request.get("model", ""),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": text}}],
+                "usage": usage
+            }))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        tokens = re.findall(r"\S+\s*|\s+", text)
+        delay = 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+        for token in tokens:
+            self._event({
+                "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": request.get("model", ""),
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+            })
+            if delay:
+                time.sleep(delay)
+        self._chunk(b"data: [DONE]\n\n")
+        self._chunk(b"")
+
+    def _event(self, payload):
+        self._chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+    def _chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+def serve(port=8765, latency=0.0, tokens_per_second=0.0, error_rate=0.0):
+    """Create the fake API server (call serve_forever() on the result)"""
+    handler = type("Handler", (FakeOpenAIHandler,), {
+        "latency": latency,
+        "tokens_per_second": tokens_per_second,
+        "error_rate": error_rate
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI API for benchmarks")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each response starts")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0,
+                        help="Streaming speed (0 = as fast as possible)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with 429/500")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.latency, args.tokens_per_second, args.error_rate)
+    print(f"Fake OpenAI API on http://127.0.0.1:{server.server_address[1]}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
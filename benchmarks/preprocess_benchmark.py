@@ -0,0 +1,93 @@
+"""
+Micro-benchmark for audio preprocessing: legacy pydub path vs NumPy path.
+
+The pydub path mirrors the old pipeline: whole-file set_frame_rate/set_channels,
+then split_audio re-converting every 5-minute chunk, and per-frame audioop RMS.
+The NumPy path does one vectorized downmix/resample, slices chunks as views and
+computes frame energy in one pass.
+
+Usage (from the repository root):
+    python -m benchmarks.preprocess_benchmark --minutes 10 60 120
+"""
+import argparse
+import time
+
+try:
+    import audioop
+except ImportError:
+    import pyaudioop as audioop
+
+import numpy as np
+from pydub import AudioSegment
+
+from agents.audio_preprocess import segment_blocks, frame_levels
+from agents.audio_stream import SAMPLE_RATE, SAMPLE_WIDTH
+
+CHUNK_MS = 5 * 60 * 1000
+FRAME_BYTES = int(SAMPLE_RATE * 0.03) * SAMPLE_WIDTH  # 30 ms analysis frames
+
+def synthetic_segment(minutes, frame_rate=44100, channels=2):
+    """Build a stereo 44.1 kHz recording of speech-like tone bursts and noise"""
+    rng = np.random.default_rng(0)
+    pattern_frames = frame_rate * 10
+    t = np.arange(pattern_frames, dtype=np.float32) / frame_rate
+    # 10-second pattern: 7 seconds of modulated tone, 3 seconds of quiet noise
+    voiced = np.sin(2 * np.pi * 180 * t) * np.sin(2 * np.pi * 3 * t) * 8000
+    voiced[int(frame_rate * 7):] = 0
+    pattern = voiced + rng.normal(0, 50, pattern_frames).astype(np.float32)
+    pattern = np.repeat(pattern[:, None], channels, axis=1).astype("<i2").ravel()
+
+    total_frames = int(minutes * 60 * frame_rate)
+    repeats = -(-total_frames // pattern_frames)
+    samples = np.tile(pattern, repeats)[:total_frames * channels]
+    return AudioSegment(data=samples.tobytes(), sample_width=2, frame_rate=frame_rate, channels=channels)
+
+def pydub_path(segment):
+    """Legacy preprocessing: pydub conversions and per-frame audioop RMS"""
+    audio = segment.set_frame_rate(SAMPLE_RATE).set_channels(1)
+    total = 0
+    frames = 0
+    for i in range(0, len(audio), CHUNK_MS):
+        chunk = audio[i:i + CHUNK_MS].set_channels(1).set_frame_rate(SAMPLE_RATE)
+        pcm = chunk.raw_data
+        count = len(pcm) // FRAME_BYTES
+        frames += len([audioop.rms(pcm[j * FRAME_BYTES:(j + 1) * FRAME_BYTES], SAMPLE_WIDTH)
+                       for j in range(count)])
+        total += len(pcm)
+    return total, frames
+
+def numpy_path(segment):
+    """NumPy preprocessing: vectorized downmix/resample and frame energy"""
+    total = 0
+    frames = 0
+    for block in segment_blocks(segment, block_seconds=CHUNK_MS // 1000):
+        count = len(block) // FRAME_BYTES
+        frames += len(frame_levels(block, FRAME_BYTES, count))
+        total += len(block)
+    return total, frames
+
+def timed(function, segment):
+    start = time.perf_counter()
+    result = function(segment)
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare pydub and NumPy audio preprocessing")
+    parser.add_argument("--minutes", type=float, nargs="+", default=[10, 60, 120],
+                        help="Synthetic recording lengths to benchmark")
+    args = parser.parse_args()
+
+    print(f"{'minutes':>8} {'pydub (s)':>10} {'numpy (s)':>10} {'speedup':>8} {'output MB':>10}")
+    for minutes in args.minutes:
+        segment = synthetic_segment(minutes)
+        pydub_seconds, (pydub_bytes, _) = timed(pydub_path, segment)
+        numpy_seconds, (numpy_bytes, _) = timed(numpy_path, segment)
+        print(f"{minutes:>8g} {pydub_seconds:>10.2f} {numpy_seconds:>10.2f} "
+              f"{pydub_seconds / numpy_seconds:>7.1f}x {numpy_bytes / 1e6:>10.1f}")
+        # Output lengths can differ by a few samples between resamplers
+        if abs(pydub_bytes - numpy_bytes) > SAMPLE_RATE * SAMPLE_WIDTH:
+            print(f"  warning: output sizes differ ({pydub_bytes} vs {numpy_bytes} bytes)")
+        del segment
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Compare upload formats for transcription chunks: payload size, encode time and quality.
+
+Each format in audio_stream.UPLOAD_FORMATS is encoded from the same chunk
+of 16 kHz mono PCM, decoded again and compared with the original by
+log-spectral distance over the speech band (lower is better; under ~2 dB is
+hard to hear). With --transcribe, every payload is also sent to the
+transcription API and its transcript scored by word error rate against the
+WAV transcript, as a direct proxy for accuracy. Needs ffmpeg with libopus
+and libmp3lame.
+
+Usage (from the repository root):
+    python -m benchmarks.upload_format_benchmark --input visit.mp3
+    python -m benchmarks.upload_format_benchmark --input visit.mp3 --transcribe
+    python -m benchmarks.upload_format_benchmark --transcribe --base-url http://127.0.0.1:8765/v1
+"""
+import argparse
+import io
+import os
+import time
+
+import numpy as np
+
+from agents.audio_stream import SAMPLE_RATE, UPLOAD_FORMATS, audio_upload, stream_pcm
+from benchmarks.preprocess_benchmark import synthetic_segment
+
+FRAME = 400  # 25 ms analysis frames
+HOP = 160  # 10 ms hop
+
+def load_chunk(path, seconds):
+    """First `seconds` of a recording (or a synthetic one) as 16 kHz mono PCM"""
+    if path is None:
+        return synthetic_segment(seconds / 60, frame_rate=SAMPLE_RATE, channels=1).raw_data
+    windows = stream_pcm(path, seconds)
+    try:
+        return next(windows)
+    finally:
+        windows.close()
+
+def spectrogram(samples):
+    """Log power spectrogram in dB (frames x bins)"""
+    count = 1 + (len(samples) - FRAME) // HOP
+    frames = np.lib.stride_tricks.as_strided(
+        samples, shape=(count, FRAME), strides=(samples.strides[0] * HOP, samples.strides[0]))
+    power = np.abs(np.fft.rfft(frames * np.hanning(FRAME), axis=1)) ** 2
+    return 10 * np.log10(power + 1e-6)
+
+def align(reference, decoded, max_shift=SAMPLE_RATE // 10):
+    """Shift decoded to undo codec delay, using cross-correlation of the first seconds"""
+    window = slice(0, min(len(reference), len(decoded), SAMPLE_RATE * 5))
+    a = reference[window]
+    b = decoded[window]
+    shifts = range(-max_shift, max_shift + 1, 4)
+    best = max(shifts, key=lambda s: float(np.dot(a[max(0, -s):len(a) - max(0, s)],
+                                                  b[max(0, s):len(b) - max(0, -s)])))
+    return decoded[best:] if best > 0 else np.concatenate([np.zeros(-best, dtype=decoded.dtype), decoded])
+
+def log_spectral_distance(reference_pcm, decoded_pcm):
+    """Mean log-spectral distance (dB) between two PCM signals over frames with speech energy"""
+    reference = np.frombuffer(reference_pcm, dtype="<i2").astype(np.float32)
+    decoded = align(reference, np.frombuffer(decoded_pcm, dtype="<i2").astype(np.float32))
+    length = min(len(reference), len(decoded))
+    ref_spec = spectrogram(reference[:length])
+    dec_spec = spectrogram(decoded[:length])
+    # Ignore near-silent frames, where any codec's noise floor dominates
+    voiced = ref_spec.max(axis=1) > ref_spec.max() - 60
+    difference = ref_spec[voiced] - dec_spec[voiced]
+    return float(np.mean(np.sqrt(np.mean(difference ** 2, axis=1))))
+
+def word_error_rate(reference, hypothesis):
+    """Word-level edit distance divided by the reference length"""
+    ref = reference.lower().split()
+    hyp = hypothesis.lower().split()
+    previous = list(range(len(hyp) + 1))
+    for i, word in enumerate(ref, 1):
+        current = [i]
+        for j, other in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (word != other)))
+        previous = current
+    return previous[-1] / max(1, len(ref))
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare transcription upload formats")
+    parser.add_argument("--input", help="Recording to take the chunk from (default: synthetic audio)")
+    parser.add_argument("--seconds", type=float, default=300, help="Chunk length in seconds")
+    parser.add_argument("--formats", nargs="+", choices=sorted(UPLOAD_FORMATS), default=list(UPLOAD_FORMATS))
+    parser.add_argument("--transcribe", action="store_true", help="Also transcribe each payload and report WER vs WAV")
+    parser.add_argument("--model", default="gpt-4o-mini-transcribe")
+    parser.add_argument("--base-url", help="API base URL, e.g. the fake server from benchmarks.fake_openai")
+    args = parser.parse_args()
+
+    pcm = load_chunk(args.input, args.seconds)
+    client = None
+    if args.transcribe:
+        from openai import OpenAI
+        client = OpenAI(base_url=args.base_url, api_key=os.getenv("OPENAI_API_KEY", "benchmark"))
+
+    formats = ["wav"] + [name for name in args.formats if name != "wav"]
+    wav_size = None
+    wav_text = None
+    print(f"{'format':<6} {'size KB':>9} {'vs WAV':>7} {'encode (s)':>11} {'LSD (dB)':>9} {'API (s)':>8} {'WER':>6}")
+    for name in formats:
+        started = time.perf_counter()
+        filename, upload, content_type = audio_upload(pcm, name)
+        encode_seconds = time.perf_counter() - started
+        payload = upload.getvalue()
+        wav_size = wav_size or len(payload)
+
+        decoded = pcm if name == "wav" else b"".join(stream_pcm(payload, args.seconds + 5))
+        lsd = log_spectral_distance(pcm, decoded)
+
+        api_seconds = wer = "-"
+        if client is not None:
+            started = time.perf_counter()
+            text = client.audio.transcriptions.create(
+                model=args.model, file=(filename, io.BytesIO(payload), content_type),
+                response_format="text")
+            api_seconds = f"{time.perf_counter() - started:.2f}"
+            wav_text = wav_text if wav_text is not None else text
+            wer = f"{word_error_rate(wav_text, text):.3f}"
+
+        print(f"{name:<6} {len(payload) / 1024:>9.0f} {wav_size / len(payload):>6.1f}x {encode_seconds:>11.3f} "
+              f"{lsd:>9.2f} {api_seconds:>8} {wer:>6}")
+
+if __name__ == "__main__":
+    main()
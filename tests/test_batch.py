@@ -0,0 +1,100 @@
+import os
+
+import pytest
+
+pytest.importorskip("dotenv")
+
+import batch
+from agents.artifacts import SOURCE_KEY, artifact_path, load_summary_record, summary_record_path
+from agents.combined_agent import combined_cache_key
+from agents.library import ARTIFACT_KINDS, RecordingLibrary
+from agents.medical_summary_agent import summary_cache_key
+from agents.summary_model import MedicalSummary, Medication
+
+class StubOrchestrator:
+    """Orchestrator returning canned results, recording which stages ran"""
+
+    def __init__(self):
+        self.context = {'chunking_report': {'input_seconds': 90.0}}
+        self.calls = []
+
+    def process_transcription(self, audio_bytes, progress_callback):
+        self.calls.append("transcription")
+        return "Doctor asks about the cough."
+
+    def process_conversation(self, text, progress_callback):
+        self.calls.append("conversation")
+        return "Doctor: How is the cough?"
+
+    def process_summary(self, text, progress_callback):
+        self.calls.append("summary")
+        summary = MedicalSummary(medications=[Medication(name="Amoxicillin")]).complete()
+        self.context['summary_record'] = summary
+        return summary.to_markdown()
+
+    def process_combined(self, text, conversation_callback, summary_callback):
+        self.calls.append("combined")
+        conversation = self.process_conversation(text, conversation_callback)
+        summary = self.process_summary(conversation, summary_callback)
+        self.context['summary_key'] = combined_cache_key(text)
+        return conversation, summary
+
+def test_process_recording_saves_summary_and_record(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "visit_20250101_120000.wav"
+    path.write_bytes(b"RIFF")
+    orchestrator = StubOrchestrator()
+
+    record = batch.process_recording(str(path), batch.STAGES, lambda: orchestrator, lambda message: None)
+
+    assert record['status'] == "processed", record['error']
+    assert record['audio_seconds'] == 90.0
+    assert orchestrator.calls == ["transcription", "conversation", "summary"]
+    key = summary_cache_key("Doctor: How is the cough?")
+    assert os.path.exists(artifact_path('summary', "visit", "20250101_120000"))
+    saved = load_summary_record(summary_record_path("visit", "20250101_120000"), key)
+    assert saved == orchestrator.context['summary_record']
+
+def test_process_recording_skips_current_outputs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "visit_20250101_120000.wav"
+    path.write_bytes(b"RIFF")
+    batch.process_recording(str(path), batch.STAGES, StubOrchestrator, lambda message: None)
+
+    orchestrator = StubOrchestrator()
+    record = batch.process_recording(str(path), batch.STAGES, lambda: orchestrator, lambda message: None)
+
+    assert record['status'] == "skipped"
+    assert orchestrator.calls == []
+
+def test_combined_summary_is_keyed_by_the_combined_request(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "visit_20250101_120000.wav"
+    path.write_bytes(b"RIFF")
+    batch.process_recording(str(path), batch.STAGES, StubOrchestrator, lambda message: None, combined=True)
+
+    with open(artifact_path('summary', "visit", "20250101_120000"), encoding="utf-8") as f:
+        saved_key = SOURCE_KEY.search(f.read()).group(1)
+    assert saved_key == combined_cache_key("Doctor asks about the cough.")
+
+    orchestrator = StubOrchestrator()
+    record = batch.process_recording(str(path), batch.STAGES, lambda: orchestrator, lambda message: None,
+                                     combined=True)
+    assert record['status'] == "skipped"
+
+def test_process_recording_indexes_artifacts_in_the_library(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("audio")
+    path = os.path.join("audio", "visit_20250101_120000.mp3")
+    with open(path, "wb") as f:
+        f.write(b"ID3")
+    library = RecordingLibrary(db_path="library.db", audio_dir="audio")
+    library.sync()
+
+    record = batch.process_recording(path, batch.STAGES, StubOrchestrator, lambda message: None, library=library)
+    library.sync()
+
+    assert record['status'] == "processed"
+    row = library.get(path)
+    for kind in ARTIFACT_KINDS:
+        assert row[f"{kind}_path"] == artifact_path(kind, "visit", "20250101_120000")
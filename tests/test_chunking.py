@@ -0,0 +1,64 @@
+import numpy as np
+
+from agents.chunking import SilenceChunker
+
+RATE = 16000
+
+def tone(seconds, amplitude=8000):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * 440 * t)).astype("<i2").tobytes()
+
+def silence(seconds):
+    return bytes(int(seconds * RATE) * 2)
+
+def chunk_all(pcm, chunker, piece_bytes=RATE):
+    chunks = []
+    for start in range(0, len(pcm), piece_bytes):
+        chunks.extend(chunker.feed(pcm[start:start + piece_bytes]))
+    chunks.extend(chunker.flush())
+    return chunks
+
+def seconds(chunk):
+    return len(chunk) / (RATE * 2)
+
+def test_cuts_in_the_pause_nearest_the_target():
+    pcm = tone(8) + silence(0.6) + tone(2.5) + silence(0.6) + tone(10)
+    chunker = SilenceChunker(target_seconds=10, search_seconds=3, strip_silence=False)
+
+    chunks = chunk_all(pcm, chunker)
+
+    # Pauses are centred at 8.3s and 11.4s; the second is nearer 10s
+    assert abs(seconds(chunks[0]) - 11.4) < 0.1
+    assert b"".join(chunks) == pcm
+
+def test_falls_back_to_the_quietest_frame_without_a_pause():
+    pcm = tone(11.5) + tone(0.1, amplitude=50) + tone(10)
+    chunker = SilenceChunker(target_seconds=10, search_seconds=3, strip_silence=False)
+
+    chunks = chunk_all(pcm, chunker)
+
+    assert 11.4 < seconds(chunks[0]) < 11.7
+    assert b"".join(chunks) == pcm
+
+def test_no_audio_is_lost_across_feed_sizes():
+    pcm = tone(7) + silence(1) + tone(13) + silence(0.5) + tone(4.3)
+    for piece_bytes in (1000, 4321, RATE * 2 * 30):
+        chunker = SilenceChunker(target_seconds=5, search_seconds=2, strip_silence=False)
+        chunks = chunk_all(pcm, chunker, piece_bytes)
+        assert b"".join(chunks) == pcm
+        assert all(seconds(chunk) <= 7 for chunk in chunks[:-1])
+
+def test_long_silence_is_shrunk_and_silent_chunks_dropped():
+    pcm = tone(3) + silence(5) + tone(3) + silence(20)
+    chunker = SilenceChunker(target_seconds=10, search_seconds=2, max_silence_ms=2000, keep_silence_ms=500)
+
+    chunks = chunk_all(pcm, chunker)
+
+    # Cut at 11.5s, in the trailing silence; the 5s gap shrinks to 0.5s
+    assert len(chunks) == 1
+    assert abs(seconds(chunks[0]) - 7.0) < 0.1
+    report = chunker.report()
+    # The trailing 19.5s of silence is cut twice, and neither piece is kept
+    assert report['skipped_chunks'] == 2
+    assert report['input_seconds'] == 31.0
+    assert report['output_seconds'] == round(seconds(chunks[0]), 1)
@@ -0,0 +1,56 @@
+from agents.dialogue import parse_turns, split_transcript, stitch
+
+def _rejoin(segments):
+    """Words of the transcript rebuilt from segments, dropping each overlap"""
+    words = []
+    for segment, overlap in segments:
+        segment_words = segment.split()
+        assert segment_words[:len(overlap.split())] == overlap.split()
+        words.extend(segment_words[len(overlap.split()):])
+    return words
+
+def test_split_transcript_keeps_short_text_whole():
+    assert split_transcript("How are you? Fine, thanks.", max_chars=100) == [("How are you? Fine, thanks.", "")]
+
+def test_split_transcript_splits_at_sentences_with_overlap():
+    text = " ".join(f"Sentence number {i} is here." for i in range(20))
+    segments = split_transcript(text, max_chars=120, overlap_sentences=1)
+
+    assert len(segments) > 1
+    assert all(len(segment) <= 120 for segment, _ in segments)
+    assert all(overlap.endswith(".") for _, overlap in segments[1:])
+    assert _rejoin(segments) == text.split()
+
+def test_split_transcript_splits_unpunctuated_text_at_words():
+    text = " ".join(f"word{i}" for i in range(2000))
+    segments = split_transcript(text, max_chars=1000, overlap_sentences=2)
+
+    assert len(segments) > 1
+    assert all(len(segment) <= 1000 for segment, _ in segments)
+    assert all(overlap for _, overlap in segments[1:])
+    assert _rejoin(segments) == text.split()
+
+def test_stitch_drops_overlap_and_maps_renamed_speakers():
+    parts = [
+        ("Doctor: Any fever?\n\nPatient: No, just the cough.", ""),
+        ("Speaker 2: Any fever?\n\nSpeaker 1: No, just the cough.\n\nSpeaker 2: Since when?\n\nSpeaker 1: Two weeks.",
+         "Any fever? No, just the cough."),
+    ]
+
+    assert parse_turns(stitch(parts)) == [
+        ["Doctor", "Any fever?"],
+        ["Patient", "No, just the cough."],
+        ["Doctor", "Since when?"],
+        ["Patient", "Two weeks."],
+    ]
+
+def test_stitch_merges_a_turn_split_across_the_seam():
+    parts = [
+        ("Doctor: Take one tablet. Twice a day.", ""),
+        ("A: Twice a day. With food please.\n\nB: Okay.", "Twice a day."),
+    ]
+
+    assert parse_turns(stitch(parts)) == [
+        ["Doctor", "Take one tablet. Twice a day. With food please."],
+        ["B", "Okay."],
+    ]
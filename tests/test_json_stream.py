@@ -0,0 +1,61 @@
+import json
+import random
+
+from agents.json_stream import JsonFieldParser
+
+SUMMARY = {
+    "chief_complaint": "Cough for two weeks, worse at night {not a brace} \"quoted\"",
+    "medications": [
+        {"name": "Amoxicillin", "dosage": "500 mg", "frequency": "3x daily"},
+        {"name": "Paracetamol", "dosage": "1 g", "notes": ["as needed", "max 4 g/day"]},
+    ],
+    "allergies": [],
+    "follow_up_days": 14,
+    "smoker": False,
+    "referral": None,
+    "plan": "Rest,\nfluids \\ review in 2 weeks",
+}
+
+def _parse(pieces):
+    fields = []
+    items = []
+    parser = JsonFieldParser(on_field=lambda name, value: fields.append((name, value)),
+                             on_item=lambda name, value: items.append((name, value)))
+    for piece in pieces:
+        parser.feed(piece)
+    return parser, fields, items
+
+def _random_pieces(text, rng):
+    cuts = sorted(rng.sample(range(1, len(text)), rng.randint(1, 40)))
+    return [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+
+def test_fields_and_items_are_the_same_wherever_the_stream_splits():
+    text = "```json\n" + json.dumps(SUMMARY, indent=2) + "\n```"
+    expected_fields = list(SUMMARY.items())
+    expected_items = [("medications", medication) for medication in SUMMARY["medications"]]
+    rng = random.Random(0)
+
+    for _ in range(200):
+        parser, fields, items = _parse(_random_pieces(text, rng))
+        assert parser.done
+        assert fields == expected_fields
+        assert items == expected_items
+
+def test_one_character_at_a_time():
+    parser, fields, _ = _parse(json.dumps(SUMMARY))
+
+    assert parser.done
+    assert dict(fields) == SUMMARY
+
+def test_field_is_reported_as_soon_as_it_closes():
+    parser, fields, items = _parse(['{"chief_complaint": "Cough", "medications": [{"name": "Amox', 'icillin"}, {"na'])
+
+    assert not parser.done
+    assert fields == [("chief_complaint", "Cough")]
+    assert items == [("medications", {"name": "Amoxicillin"})]
+
+def test_text_after_the_object_is_ignored():
+    parser, fields, _ = _parse(['{"follow_up_days": 14}', ' trailing {"ignored": 1}'])
+
+    assert parser.done
+    assert fields == [("follow_up_days", 14)]
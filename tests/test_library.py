@@ -0,0 +1,46 @@
+import os
+import sqlite3
+
+from agents.library import RecordingLibrary
+
+def _save(directory, name):
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(b"ID3")
+    return path
+
+def test_search_matches_wildcards_literally(tmp_path):
+    library = RecordingLibrary(db_path=str(tmp_path / "library.db"), audio_dir=str(tmp_path))
+    for name in ("100% recovery_20250101_120000.mp3", "1000 steps_20250102_120000.mp3",
+                 "back\\pain_20250103_120000.mp3", "Follow Up_20250104_120000.mp3"):
+        library.add(_save(str(tmp_path), name))
+
+    assert [row['display_name'] for row in library.list(search="100%")] == ["100% Recovery"]
+    assert library.count(search="%") == 1
+    assert library.count(search="\\") == 1
+    assert library.count(search="follow") == 1
+    assert library.count(search="") == 4
+
+def test_sync_commits_once(tmp_path, monkeypatch):
+    library = RecordingLibrary(db_path=str(tmp_path / "library.db"), audio_dir=str(tmp_path))
+    stale = _save(str(tmp_path), "old_20250101_120000.mp3")
+    library.add(stale)
+    os.remove(stale)
+    for i in range(5):
+        _save(str(tmp_path), f"visit{i}_20250101_12000{i}.mp3")
+
+    commits = []
+    connect = sqlite3.connect
+
+    class Connection(sqlite3.Connection):
+        def commit(self):
+            commits.append(1)
+            super().commit()
+
+    monkeypatch.setattr(sqlite3, "connect", lambda *args, **kwargs: connect(*args, factory=Connection, **kwargs))
+    library.sync()
+
+    # One read of the index, one write for every change
+    assert len(commits) == 2
+    assert library.get(stale) is None
+    assert library.count() == 5
@@ -0,0 +1,18 @@
+from agents.orchestrator import Orchestrator
+
+def test_pipeline_failure_after_transcription_finished_does_not_hang():
+    orchestrator = Orchestrator(None)
+
+    def transcribe(audio_bytes, progress_callback, context, chunk_callback=None):
+        chunk_callback("Any fever?")
+        return "Any fever?"
+
+    def generate_incremental(chunks, progress_callback, context):
+        # Reads every chunk, including the end of transcription, then fails
+        list(chunks)
+        raise ValueError("bad reply")
+
+    orchestrator.transcription_agent.transcribe = transcribe
+    orchestrator.conversation_agent.generate_incremental = generate_incremental
+
+    assert orchestrator.process_pipeline(b"audio", None) == ("Any fever?", "Error: bad reply")
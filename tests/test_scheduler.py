@@ -0,0 +1,85 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from agents.scheduler import PRIORITY_BATCH, PRIORITY_INTERACTIVE, RateLimitScheduler, _Bucket
+
+def _error(cls, status, headers=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    return cls("error", response=response, body=None)
+
+class FakeClient:
+    """Chat client that raises the queued errors, then answers"""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self.audio = SimpleNamespace(transcriptions=SimpleNamespace(create=self.create))
+
+    def with_options(self, **options):
+        return self
+
+    def create(self, **kwargs):
+        self.calls.append(time.monotonic())
+        if self.errors:
+            raise self.errors.pop(0)
+        return SimpleNamespace(usage=None)
+
+def test_bucket_refills_at_its_rate_up_to_capacity():
+    bucket = _Bucket(60)
+    start = bucket.updated
+    bucket.take(60)
+
+    assert bucket.wait_time(30, start + 10) == pytest.approx(20)
+    assert bucket.wait_time(30, start + 30) == 0
+    bucket.take(30)
+    assert bucket.wait_time(60, start + 1000) == 0
+    assert bucket.level == 60
+
+def test_waiters_are_served_by_priority_then_arrival():
+    scheduler = RateLimitScheduler({"gpt-4": (600, 100000)})
+    scheduler._budget("gpt-4")[0].level = 0
+    order = []
+
+    def acquire(name, priority):
+        scheduler.acquire("gpt-4", 0, priority)
+        order.append(name)
+
+    threads = []
+    for name, priority in (("batch 1", PRIORITY_BATCH), ("batch 2", PRIORITY_BATCH), ("interactive", PRIORITY_INTERACTIVE)):
+        thread = threading.Thread(target=acquire, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        # Queue them one after another, before the first request refills
+        while scheduler.queue_depth() < len(threads) and thread.is_alive():
+            time.sleep(0.001)
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert order == ["interactive", "batch 1", "batch 2"]
+
+def test_rate_limit_pauses_the_model_for_retry_after():
+    scheduler = RateLimitScheduler()
+    raw = FakeClient([_error(openai.RateLimitError, 429, {"retry-after-ms": "200"})])
+    client = scheduler.client(raw)
+
+    client.chat.completions.create(model="gpt-4", messages=[{"role": "user", "content": "Hi"}])
+
+    assert scheduler.rate_limited == 1
+    assert len(raw.calls) == 2
+    assert raw.calls[1] - raw.calls[0] >= 0.19
+
+def test_failed_request_refunds_its_token_estimate():
+    scheduler = RateLimitScheduler({"gpt-4": (500, 60000)})
+    client = scheduler.client(FakeClient([_error(openai.BadRequestError, 400)]))
+
+    with pytest.raises(openai.BadRequestError):
+        client.chat.completions.create(model="gpt-4", messages=[{"role": "user", "content": "x" * 8000}])
+
+    assert scheduler._budget("gpt-4")[1].level == pytest.approx(60000, abs=1)
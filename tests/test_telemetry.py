@@ -0,0 +1,60 @@
+import json
+from types import SimpleNamespace
+
+import agents.conversation_agent as conversation_agent
+import agents.transcription_agent as transcription_agent
+from agents.conversation_agent import ConversationAgent
+from agents.telemetry import Telemetry
+from agents.transcription_agent import TranscriptionAgent
+
+class StubBackend:
+    model_name = "stub"
+
+    def transcribe(self, pcm):
+        return f"{len(pcm)} bytes"
+
+class StubChat:
+    def create(self, **kwargs):
+        message = SimpleNamespace(content="Doctor: " + kwargs["messages"][-1]["content"][-20:])
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+def _configure(tmp_path, monkeypatch):
+    telemetry = Telemetry()
+    telemetry.configure(log_path=str(tmp_path / "spans.jsonl"))
+    for module in (transcription_agent, conversation_agent):
+        monkeypatch.setattr(module, "telemetry", telemetry)
+    return telemetry
+
+def _spans(tmp_path):
+    with open(tmp_path / "spans.jsonl", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def test_chunk_spans_in_worker_threads_keep_their_parent(tmp_path, monkeypatch):
+    telemetry = _configure(tmp_path, monkeypatch)
+    agent = TranscriptionAgent(None, max_workers=3, backend=StubBackend())
+    agent.iter_chunks = lambda audio_bytes, chunker, span: (bytes(3200 * (i + 1)) for i in range(6))
+
+    with telemetry.span("stage.transcription"):
+        chunks = list(agent.iter_transcriptions(b"audio", lambda progress, text: None, None))
+
+    assert len(chunks) == 6
+    spans = _spans(tmp_path)
+    stage = next(span for span in spans if span['span'] == "stage.transcription")
+    chunk_spans = [span for span in spans if span['span'] == "transcription.chunk"]
+    assert len(chunk_spans) == 6
+    assert all(span['parent'] == stage['id'] for span in chunk_spans)
+
+def test_segment_spans_in_worker_threads_keep_their_parent(tmp_path, monkeypatch):
+    telemetry = _configure(tmp_path, monkeypatch)
+    agent = ConversationAgent(SimpleNamespace(chat=SimpleNamespace(completions=StubChat())))
+    agent.segment_chars = 200
+    text = " ".join(f"Sentence number {i} is here." for i in range(40))
+
+    with telemetry.span("stage.conversation"):
+        agent.generate_segmented(text, None)
+
+    spans = _spans(tmp_path)
+    stage = next(span for span in spans if span['span'] == "stage.conversation")
+    segment_spans = [span for span in spans if span['span'] == "conversation.segment"]
+    assert len(segment_spans) > 1
+    assert all(span['parent'] == stage['id'] for span in segment_spans)